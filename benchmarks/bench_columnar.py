@@ -0,0 +1,56 @@
+"""Benchmark columnar snapshot scans against compiled row filters and sorts
+
+Run with:
+
+    python benchmarks/bench_columnar.py [ROWS]
+"""
+import random
+import sys
+import timeit
+
+from pyrsistent import freeze
+
+from steerage.repositories.base import OrderBy
+from steerage.repositories.columns import ColumnarSnapshot
+from steerage.repositories.rows import filter_rows, sort_rows
+
+SCANS = {
+    "3 filters": ([("num", "gte", 1000), ("is_odd", None, True), ("foo", "ne", "bar")], ()),
+    "2 filters, ordered": ([("num", "lt", 900_000), ("created_at", "gt", 0.25)], (OrderBy("created_at", False),)),
+    "ordered by 2 keys": ([], (OrderBy("is_odd", True), OrderBy("num", False))),
+}
+
+
+def row_scan(rows, filters, ordering):
+    """Scan the rows one at a time, as memdb does without a columnar snapshot."""
+    rows = filter_rows(rows, filters)
+    return sort_rows(rows, ordering) if ordering else list(rows)
+
+
+def columnar_scan(snapshot, filters, ordering):
+    """Scan a columnar snapshot, then read the selected rows."""
+    positions, _, _ = snapshot.select(filters, ordering)
+    return list(map(snapshot.rows.__getitem__, positions.tolist()))
+
+
+def main(size: int = 1_000_000) -> None:
+    """Print timings for scanning `size` rows."""
+    rng = random.Random(42)
+    table = freeze(
+        {
+            str(n): {"num": n, "is_odd": bool(n % 2), "foo": f"baz{n % 7}", "created_at": rng.random()}
+            for n in range(size)
+        }
+    )
+    snapshot = ColumnarSnapshot.build(table)
+    build = min(timeit.repeat(lambda: [ColumnarSnapshot.build(table).column(key) for key in table["0"]], number=1))
+
+    print(f"{size} rows | snapshot build {build * 1000:.0f}ms")
+    for name, (filters, ordering) in SCANS.items():
+        rows = min(timeit.repeat(lambda: row_scan(snapshot.rows, filters, ordering), number=1, repeat=3))
+        columnar = min(timeit.repeat(lambda: columnar_scan(snapshot, filters, ordering), number=1, repeat=3))
+        print(f"{name:>20} | rows {rows * 1000:8.1f}ms | columnar {columnar * 1000:8.1f}ms | {rows / columnar:4.1f}x")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
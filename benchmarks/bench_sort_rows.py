@@ -0,0 +1,38 @@
+"""Benchmark top-k row selection against a full multi-pass sort
+
+Run with:
+
+    python benchmarks/bench_sort_rows.py [ROWS]
+"""
+import random
+import sys
+import timeit
+
+from pyrsistent import freeze
+
+from steerage.repositories.base import OrderBy
+from steerage.repositories.rows import sort_rows, top_rows
+
+ORDERINGS = {
+    "created_at desc": (OrderBy("created_at", False),),
+    "created_at asc, num desc": (OrderBy("created_at", True), OrderBy("num", False)),
+    "is_odd asc, num desc": (OrderBy("is_odd", True), OrderBy("num", False)),
+}
+
+
+def main(size: int = 100_000) -> None:
+    """Print timings for selecting a page of rows from `size` rows."""
+    rng = random.Random(42)
+    rows = [freeze({"num": n, "is_odd": bool(n % 2), "created_at": rng.random()}) for n in range(size)]
+    rng.shuffle(rows)
+
+    print(f"{size} rows")
+    for name, ordering in ORDERINGS.items():
+        for stop in (20, 100, 1000):
+            full = min(timeit.repeat(lambda: sort_rows(rows, ordering)[:stop], number=1, repeat=5))
+            top = min(timeit.repeat(lambda: top_rows(rows, ordering, stop), number=1, repeat=5))
+            print(f"{name:>24} | first {stop:>4} | full sort {full * 1000:8.1f}ms | top-k {top * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
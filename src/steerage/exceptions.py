@@ -11,3 +11,7 @@ class MultipleResultsFound(KeyError):
 
 class AlreadyExists(Exception):
     """A record with the primary key (or other unique attribute) already exists."""
+
+
+class WriteConflict(Exception):
+    """A record has been changed by another session since this session read it."""
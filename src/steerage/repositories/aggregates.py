@@ -0,0 +1,108 @@
+"""Aggregate functions for repository queries
+
+Pass aggregates by name to `AbstractBaseQuery.aggregate()`, e.g.:
+
+    await repo.objects.filter(is_active=True).aggregate(total=Sum("amount"), orders=Count())
+
+Each aggregate is computed by the backend where it can be (e.g. as
+`SUM(amount)` in SQL), and otherwise in a single streaming pass over
+the query's records. As in SQL, null values are ignored, and every
+aggregate but `Count` is `None` when there are no values to aggregate.
+"""
+from dataclasses import dataclass
+from typing import Any, ClassVar, Optional
+
+
+@dataclass(frozen=True)
+class Aggregate:
+    """Abstract base class for aggregate functions over a single field
+
+    Subclasses should define `function`, the name of the equivalent SQL
+    function, and the accumulator methods `start()`, `step()` and
+    `finish()`.
+    """
+
+    key: str
+    function: ClassVar[str]
+
+    def start(self) -> Any:
+        """Return the initial state of the accumulator."""
+        return None
+
+    def step(self, state: Any, value: Any) -> Any:  # pragma: nocover
+        """Return the state of the accumulator after adding a (non-null) value."""
+        raise NotImplementedError
+
+    def finish(self, state: Any) -> Any:
+        """Return the result for the final state of the accumulator."""
+        return state
+
+
+@dataclass(frozen=True)
+class Count(Aggregate):
+    """Count the non-null values of a field, or (without a field) all records"""
+
+    key: Optional[str] = None
+    function: ClassVar[str] = "count"
+
+    def start(self) -> int:
+        """Start counting from zero."""
+        return 0
+
+    def step(self, state: int, value: Any) -> int:
+        """Count another value."""
+        return state + 1
+
+
+@dataclass(frozen=True)
+class Sum(Aggregate):
+    """Sum the values of a field"""
+
+    function: ClassVar[str] = "sum"
+
+    def step(self, state: Any, value: Any) -> Any:
+        """Add a value to the running total."""
+        return value if state is None else state + value
+
+
+@dataclass(frozen=True)
+class Min(Aggregate):
+    """Find the smallest value of a field"""
+
+    function: ClassVar[str] = "min"
+
+    def step(self, state: Any, value: Any) -> Any:
+        """Keep the smaller of the value and the smallest so far."""
+        return value if state is None or value < state else state
+
+
+@dataclass(frozen=True)
+class Max(Aggregate):
+    """Find the largest value of a field"""
+
+    function: ClassVar[str] = "max"
+
+    def step(self, state: Any, value: Any) -> Any:
+        """Keep the larger of the value and the largest so far."""
+        return value if state is None or value > state else state
+
+
+@dataclass(frozen=True)
+class Avg(Aggregate):
+    """Average the values of a field"""
+
+    function: ClassVar[str] = "avg"
+
+    def start(self) -> tuple[Any, int]:
+        """Start with a zero total and count."""
+        return 0, 0
+
+    def step(self, state: tuple[Any, int], value: Any) -> tuple[Any, int]:
+        """Add a value to the running total and count."""
+        total, count = state
+        return total + value, count + 1
+
+    def finish(self, state: tuple[Any, int]) -> Optional[float]:
+        """Divide the total by the count."""
+        total, count = state
+        return total / count if count else None
@@ -6,10 +6,12 @@ import operator as op
 from abc import ABC, abstractmethod
 from collections import namedtuple
 from collections.abc import Mapping
+from contextlib import aclosing
 from dataclasses import dataclass, field
 from typing import (
     Any,
     AsyncGenerator,
+    Callable,
     ClassVar,
     Generic,
     Iterable,
@@ -18,6 +20,7 @@ from typing import (
     Type,
     TypeVar,
 )
+from uuid import UUID
 
 import funcy as fn
 from aiostream import StreamEmpty, stream
@@ -25,7 +28,12 @@ from asyncstdlib.builtins import list as alist
 from convoke.configs import BaseConfig
 
 from steerage.exceptions import AlreadyExists, MultipleResultsFound, NotFound
+from steerage.repositories.aggregates import Aggregate
+from steerage.repositories.cursors import decode_cursor, encode_cursor
+from steerage.repositories.loaders import BatchLoader
+from steerage.repositories.predicates import AND, Q
 from steerage.repositories.sessions import AbstractSession
+from steerage.repositories.unitofwork import DELETE, INSERT, UPDATE, UPDATE_ATTRS, UPSERT
 from steerage.types import TEntity, UUIDorStr
 from steerage.uuids import ensure_uuid
 
@@ -40,6 +48,7 @@ CMP_OPERATORS = {
     "startswith": str.startswith,
     "endswith": str.endswith,
     "isnull": lambda a, b: fn.isnone(a) is b,
+    "in": lambda a, b: a in b,
 }
 
 OrderBy = namedtuple("OrderBy", "key ascending")
@@ -59,6 +68,19 @@ class AbstractBaseQuery(ABC, Generic[TEntity]):
 
     entity_class: ClassVar[TEntity]
     max_repr: ClassVar[int] = 3
+    hydration_batch_size: ClassVar[int] = 100
+    # The most values to filter on at once with `__in`, where the backend limits it:
+    max_in_size: ClassVar[Optional[int]] = None
+
+    # The most results to cache on a query as it is iterated over: `None`
+    # caches every result; `0` disables caching. A query whose results
+    # aren't cached is run again as needed.
+    result_cache_size: ClassVar[Optional[int]] = None
+
+    # Compiled once per subclass by `__init_subclass__()`:
+    _prepare_hooks: ClassVar[tuple[tuple[str, str], ...]] = ()
+    _transforms_rows_directly: ClassVar[bool] = True
+    _transforms_attrs_directly: ClassVar[bool] = True
 
     NotFound = NotFound
     MultipleResultsFound = MultipleResultsFound
@@ -71,12 +93,48 @@ class AbstractBaseQuery(ABC, Generic[TEntity]):
         self.offset = 0
         self.limit = None
         self.filters = []
+        self.predicates = []
         self.ordering = ()
+        self.keyset = None
+        self.chunk_size = None
+        self.projection = None
+        self.result_type = "entity"
+        self.grouping = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Find the `prepare_<key>` hooks once, rather than looking them up
+        # for every key of every row. They're bound per batch of rows, as
+        # they may be static or class methods:
+        cls._prepare_hooks = tuple(
+            (name.removeprefix("prepare_"), name)
+            for name in dir(cls)
+            if name.startswith("prepare_") and name != "prepare_data_for_entity" and callable(getattr(cls, name))
+        )
+        cls._transforms_rows_directly = cls.transform_data_to_entity is AbstractBaseQuery.transform_data_to_entity
+        cls._transforms_attrs_directly = (
+            cls.transform_entity_to_data is AbstractBaseQuery.transform_entity_to_data
+            or cls.transform_attrs_to_data is not AbstractBaseQuery.transform_attrs_to_data
+        )
 
     async def select(self) -> AsyncGenerator[TEntity, None]:
-        """Run the selection query and transform the resulting records into `entity_class`."""
+        """Run the selection query and transform the resulting records into `entity_class`.
+
+        Records are transformed in batches of up to `hydration_batch_size`
+        (or the `chunk_size` given to `iterator()`).
+        """
+        batch_size = self.chunk_size or self.hydration_batch_size
+        if self.limit is not None:
+            batch_size = min(self.limit, batch_size)
+        batch = []
         async for row in self.run_selection_query():
-            yield self.transform_data_to_entity(row)
+            batch.append(row)
+            if len(batch) >= batch_size:
+                for result in self.transform_rows_to_results(batch):
+                    yield result
+                batch = []
+        for result in self.transform_rows_to_results(batch):
+            yield result
 
     @abstractmethod
     async def run_selection_query(self) -> AsyncGenerator[Mapping, None]:  # pragma: nocover
@@ -92,9 +150,51 @@ class AbstractBaseQuery(ABC, Generic[TEntity]):
         """Run this insert query against the backend."""
         raise NotImplementedError
 
+    async def insert_many(self, entities: Iterable[TEntity]) -> None:
+        """Run a bulk insert query for the given entities."""
+        data = [self.transform_entity_to_data(entity) for entity in entities]
+        if data:
+            await self.run_insert_many_query(data)
+
+    async def run_insert_many_query(self, data: list[Mapping]) -> None:  # pragma: nocover
+        """Run this bulk insert query against the backend.
+
+        This base implementation inserts each record in turn. Override
+        this in subclass to implement something more efficient for the
+        backend.
+        """
+        for item in data:
+            await self.run_insert_query(item)
+
+    async def upsert(self, entity: TEntity) -> None:
+        """Run the upsert (insert-or-update) query."""
+        self._forget_identities([entity.id])
+        await self.run_upsert_query(self.transform_entity_to_data(entity))
+
+    async def run_upsert_query(self, data: Mapping) -> None:
+        """Run this upsert query against the backend."""
+        await self.run_upsert_many_query([data])
+
+    async def upsert_many(self, entities: Iterable[TEntity]) -> None:
+        """Run a bulk upsert (insert-or-update) query for the given entities."""
+        data = [self.transform_entity_to_data(entity) for entity in entities]
+        if data:
+            self._forget_identities([item["id"] for item in data])
+            await self.run_upsert_many_query(data)
+
+    @abstractmethod
+    async def run_upsert_many_query(self, data: list[Mapping]) -> None:  # pragma: nocover
+        """Run this bulk upsert query against the backend."""
+        raise NotImplementedError
+
     async def update(self, **kwargs) -> int:
-        """Run the update query with the given keyword arguments."""
-        return await self.run_update_query(**kwargs)
+        """Run the update query with the given keyword arguments.
+
+        The arguments are storage-ready data (see
+        `transform_attrs_to_data()`); only the given keys are changed.
+        """
+        self._forget_identities()
+        return await self._as_entity_query().run_update_query(**kwargs)
 
     @abstractmethod
     async def run_update_query(self, **kwargs) -> int:  # pragma: nocover
@@ -103,35 +203,79 @@ class AbstractBaseQuery(ABC, Generic[TEntity]):
 
     async def delete(self, **kwargs) -> int:
         """Run the delete query with the given keyword arguments."""
-        return await self.run_delete_query(**kwargs)
+        self._forget_identities()
+        return await self._as_entity_query().run_delete_query(**kwargs)
 
     @abstractmethod
     async def run_delete_query(self, **kwargs) -> int:  # pragma: nocover
         """Run this delete query against the backend."""
         raise NotImplementedError
 
+    def _forget_identities(self, ids: Optional[list] = None) -> None:
+        """Drop entities that a write may change from the session's identity map and change snapshots.
+
+        Without `ids`, the entities are those matched by this query: those
+        in a primary key filter, or else all of them.
+        """
+        maps = [m for m in (self.session.identity_map, self.session.snapshots) if m]
+        if not maps:
+            return
+        if ids is None:
+            ids, _ = self.split_primary_key_filter()
+        for identities in maps:
+            if ids is None:
+                identities.clear()
+            else:
+                for id in ids:
+                    identities.pop(ensure_uuid(id), None)
+
     async def __aiter__(self) -> AsyncGenerator[TEntity, None]:
-        """Iterate over (and cache) results of the query."""
+        """Iterate over (and cache) results of the query.
+
+        Results are cached only if there are no more than
+        `result_cache_size` of them; otherwise, they are let go as they
+        are yielded, and only the result count is kept.
+        """
         if self._results is None:
+            cache_size = self.result_cache_size
             results_list = []
+            count = 0
             async for result in self.select():
-                results_list.append(result)
+                count += 1
+                if results_list is not None:
+                    if cache_size is not None and count > cache_size:
+                        results_list = None
+                    else:
+                        results_list.append(result)
                 yield result
             self._results = results_list
+            self._count = count
         else:
             for result in self._results:
                 yield result
 
+    def iterator(self, chunk_size: Optional[int] = None) -> AsyncGenerator[TEntity, None]:
+        """Iterate over results of the query without caching them.
+
+        Unlike iterating over the query itself, results are not kept on
+        the query once yielded, so a large result set can be processed
+        in constant memory. If `chunk_size` is given, backends that
+        support it fetch (and results are transformed) that many records
+        at a time.
+        """
+        query = self if chunk_size is None else self.clone(chunk_size=chunk_size)
+        return query.select()
+
     async def run_count(self) -> int:
         """Run a (potentially) simplified query to count results.
 
         This base implementation uses a simplistic algorithm that runs
-        the full query and counts the results. Override this in
-        subclass to implement something more efficient for the
-        backend.
+        the full query and counts the records, without transforming them
+        into entities. Override this in subclass to implement something
+        more efficient for the backend.
         """
         count = 0
-        async for _ in self:
+        async for _ in self.clone(projection=("id",)).run_selection_query():
             count += 1
         return count
 
@@ -144,16 +288,113 @@ class AbstractBaseQuery(ABC, Generic[TEntity]):
                 self._count = len(self._results)
         return self._count
 
+    def group_by(self, *keys: str) -> Self:
+        """Return a copy of this query that aggregates results by the given fields (see `aggregate()`)."""
+        for key in keys:
+            if not self.projection_is_valid(key):
+                raise ValueError("Invalid grouping field: %s" % key)
+        return self.clone(grouping=keys)
+
+    async def aggregate(self, **aggregates: Aggregate) -> dict[str, Any] | list[dict[str, Any]]:
+        """Compute the given aggregates over the query's results, by name.
+
+        e.g. `await query.aggregate(total=Sum("num"), count=Count())`
+        returns `{"total": ..., "count": ...}`. If the query is grouped
+        (see `group_by()`), this instead returns a list of such dicts,
+        one for each group, also holding the group's field values, and
+        ordered by them (nulls first).
+
+        Aggregated and grouped values are storage data, as with filters.
+        """
+        for name, aggregate in aggregates.items():
+            if aggregate.key is not None and not self.projection_is_valid(aggregate.key):
+                raise ValueError("Invalid aggregate field: %s" % aggregate.key)
+            if name in self.grouping:
+                raise ValueError("Aggregate name clashes with a grouping field: %s" % name)
+        results = await self.run_aggregate_query(aggregates)
+        return results if self.grouping else results[0]
+
+    async def run_aggregate_query(self, aggregates: dict[str, Aggregate]) -> list[dict[str, Any]]:
+        """Run a (potentially) simplified query to compute aggregates.
+
+        Returns a dict of aggregate results (and grouping field values)
+        for each group, ordered by the grouping fields, or a single dict
+        if the query is ungrouped.
+
+        This base implementation accumulates the aggregates in a single
+        pass over the query's records, without transforming them into
+        entities. Override this in subclass to implement something more
+        efficient for the backend.
+        """
+        keys = set(self.grouping).union(aggregate.key for aggregate in aggregates.values())
+        keys.discard(None)
+        groups = {} if self.grouping else {(): {name: aggregate.start() for name, aggregate in aggregates.items()}}
+        async for row in self.clone(projection=tuple(keys) or ("id",)).run_selection_query():
+            group = tuple(row[key] for key in self.grouping)
+            if group not in groups:
+                groups[group] = {name: aggregate.start() for name, aggregate in aggregates.items()}
+            states = groups[group]
+            for name, aggregate in aggregates.items():
+                value = True if aggregate.key is None else row[aggregate.key]
+                if value is not None:
+                    states[name] = aggregate.step(states[name], value)
+        return [
+            dict(zip(self.grouping, group))
+            | {name: aggregate.finish(states[name]) for name, aggregate in aggregates.items()}
+            for group, states in sorted(groups.items(), key=lambda item: [(v is not None, v) for v in item[0]])
+        ]
+
+    async def exists(self) -> bool:
+        """Return whether the query has any results, without loading them."""
+        if self._results is not None:
+            return bool(self._results)
+        if self._count is not None:
+            return self._count > 0
+        return await self.slice(0, 1).run_exists()
+
+    async def run_exists(self) -> bool:
+        """Run a (potentially) simplified query to check for any results.
+
+        This base implementation looks for the first record of the
+        query, without transforming it into an entity. Override this in
+        subclass to implement something more efficient for the backend.
+        """
+        async with aclosing(self.clone(projection=("id",)).run_selection_query()) as rows:
+            async for _ in rows:
+                return True
+        return False
+
     def clone(self, **kwargs) -> Self:
         """Return a copy of this queryset with the given keyword arguments overridden."""
         clone = copy.copy(self)
         clone._results = None
         clone._count = None
         clone.filters = self.filters.copy()
+        clone.predicates = self.predicates.copy()
         for key, value in kwargs.items():
             setattr(clone, key, value)
         return clone
 
+    def cache_key(self) -> tuple:
+        """Return a hashable key describing what this query selects.
+
+        Queries with equal keys select the same results from the same
+        stored data. Raises `TypeError` if a filter value is unhashable.
+        """
+        key = (
+            type(self),
+            tuple(self.filters),
+            tuple(self.predicates),
+            self.ordering,
+            self.keyset,
+            self.offset,
+            self.limit,
+            self.projection,
+            self.result_type,
+        )
+        hash(key)
+        return key
+
     def filter_is_valid(self, key: str, operator: str, val: Any) -> bool:
         """Validate the given filter.
 
@@ -165,19 +406,59 @@ class AbstractBaseQuery(ABC, Generic[TEntity]):
         operator_ok = operator is None or operator in CMP_OPERATORS
         return key_ok and operator_ok
 
-    def filter(self, **kwargs) -> Self:
-        """Return a filtered copy of this query."""
-        clone = self.clone()
-        for key, val in kwargs.items():
-            key, *operator = key.split("__")
-            operator = fn.first(operator)
+    def filter(self, *predicates: Q, **kwargs) -> Self:
+        """Return a filtered copy of this query.
 
-            if self.filter_is_valid(key, operator, val):
-                clone.filters.append((key, operator, val))
-            else:
-                raise ValueError("Invalid filter field: %s" % key)
+        Keyword arguments are ANDed lookups, e.g. `num__gt=3`. For OR
+        and NOT, pass `Q` predicates (see `steerage.repositories.predicates`).
+        """
+        clone = self.clone()
+        clone._add_predicate(Q(*predicates, **kwargs))
         return clone
 
+    def _add_predicate(self, predicate: Q) -> None:
+        # Plain ANDed lookups become filters, which backends can use indexes for:
+        if predicate.connector == AND and not predicate.negated:
+            for child in predicate.children:
+                if isinstance(child, Q):
+                    self._add_predicate(child)
+                else:
+                    self.filters.append(self._resolve_lookup(*child))
+        else:
+            self.predicates.append(self._resolve_predicate(predicate))
+
+    def _resolve_predicate(self, predicate: Q) -> Q:
+        children = tuple(
+            self._resolve_predicate(child) if isinstance(child, Q) else self._resolve_lookup(*child)
+            for child in predicate.children
+        )
+        return Q.build(children, predicate.connector, predicate.negated)
+
+    def _resolve_lookup(self, lookup: str, val: Any) -> tuple[str, Optional[str], Any]:
+        key, *operator = lookup.split("__")
+        operator = fn.first(operator)
+
+        if not self.filter_is_valid(key, operator, val):
+            raise ValueError("Invalid filter field: %s" % key)
+        if operator == "in":
+            val = tuple(val)
+        return key, operator, val
+
+    def split_primary_key_filter(self) -> tuple[Optional[list], list]:
+        """Split a primary key lookup out of this query's filters.
+
+        Returns a tuple of `(ids, remaining_filters)`. If the query
+        filters on `id` equality (or membership), `ids` is a list of the
+        primary keys to look up directly; otherwise it is `None`.
+
+        Backends keyed by primary key can use this to avoid scanning.
+        """
+        for index, (key, operator, value) in enumerate(self.filters):
+            if key == "id" and operator in (None, "eq", "in"):
+                ids = list(value) if operator == "in" else [value]
+                return ids, self.filters[:index] + self.filters[index + 1 :]
+        return None, self.filters
+
     def ordering_is_valid(self, key: str) -> bool:
         """Validate the given ordering key.
 
@@ -188,7 +469,14 @@ class AbstractBaseQuery(ABC, Generic[TEntity]):
         return key in self.entity_class.model_fields
 
     def order_by(self, *args) -> Self:
-        """Return a copy of this query sorted by the given ordering keys."""
+        """Return a copy of this query sorted by the given ordering keys.
+
+        Prefix a key with `-` to sort it descending. The in-process
+        backends sort nulls before every other value: first when
+        ascending, and last when descending, as SQLite does. SQL backends
+        keep the database's own null ordering (e.g. PostgreSQL sorts
+        nulls after every other value).
+        """
         ordering = []
 
         for key in args:
@@ -202,9 +490,47 @@ class AbstractBaseQuery(ABC, Generic[TEntity]):
                 raise ValueError("Invalid ordering field: %s" % key)
         return self.clone(ordering=tuple(ordering))
 
+    def after(self, cursor: Optional[str], limit: Optional[int] = None) -> Self:
+        """Return a copy of this ordered query for the page of results following the given cursor.
+
+        This is keyset pagination: rather than skipping `offset` results,
+        backends seek directly to the results that sort after the
+        cursor's ordering key values, so deep pages cost no more than
+        the first. Get the cursor for the next page from the last result
+        of this page with `cursor_for()`; a cursor of `None` selects the
+        first page.
+
+        The ordering should end in a unique key (e.g. `id`), so that
+        every result has a distinct position. Results with null ordering
+        keys are skipped after the first page.
+        """
+        if not self.ordering:
+            raise ValueError("Keyset pagination requires an ordered query")
+        keyset = None
+        if cursor is not None:
+            keyset = decode_cursor(cursor)
+            if len(keyset) != len(self.ordering):
+                raise ValueError("Cursor does not match the query ordering: %r" % cursor)
+        return self.clone(keyset=keyset, offset=0, limit=limit)
+
+    def cursor_for(self, result: TEntity | Mapping) -> str:
+        """Return an opaque cursor token for the results that follow the given result in this query's ordering.
+
+        The result may be an entity, or a dict from `values()` that
+        includes the ordering keys.
+        """
+        if not self.ordering:
+            raise ValueError("Keyset pagination requires an ordered query")
+        get = op.getitem if isinstance(result, Mapping) else getattr
+        return encode_cursor([get(result, key) for key, _ in self.ordering])
+
     async def get(self, **kwargs) -> TEntity:
-        """Return a single query result for the given constraints."""
-        results = await stream.list(stream.take(self.filter(**kwargs), 3))
+        """Return a single query result for the given constraints.
+
+        No more than two results are selected from the backend: enough
+        to tell that there are multiple.
+        """
+        results = await alist(self.filter(**kwargs).slice(0, 2))
         rlen = len(results)
         if rlen == 0:
             raise NotFound()
@@ -214,11 +540,62 @@ class AbstractBaseQuery(ABC, Generic[TEntity]):
             return results[0]
 
     async def first(self) -> TEntity:
-        """Return the first result of the query, or None if there are no results."""
-        try:
-            return await stream.take(self, 1)
-        except StreamEmpty:
-            return None
+        """Return the first result of the query, or None if there are no results.
+
+        Only the first result is selected from the backend.
+        """
+        results = await alist(self.slice(0, 1))
+        return results[0] if results else None
+
+    def projection_is_valid(self, key: str) -> bool:
+        """Validate the given projection field.
+
+        Override this in subclass to customize the behavior to the
+        given model and backend.
+
+        """
+        return key in self.entity_class.model_fields
+
+    def _project(self, fields: tuple[str, ...], result_type: str) -> Self:
+        for key in fields:
+            if not self.projection_is_valid(key):
+                raise ValueError("Invalid projection field: %s" % key)
+        return self.clone(projection=fields or None, result_type=result_type)
+
+    def only(self, *fields: str) -> Self:
+        """Return a copy of this query that only loads the given entity fields.
+
+        The `id` field is always loaded. The resulting entities are
+        constructed without the remaining fields: accessing them raises
+        `AttributeError`, and passing such an entity to the repository's
+        `update()` writes only the loaded fields.
+        """
+        if "id" not in fields:
+            fields = ("id",) + fields
+        return self._project(fields, "entity")
+
+    def values(self, *fields: str) -> Self:
+        """Return a copy of this query that yields dicts of stored data, rather than entities.
+
+        If fields are given, only those fields are loaded.
+        """
+        return self._project(fields, "dict")
+
+    def values_list(self, *fields: str, flat: bool = False) -> Self:
+        """Return a copy of this query that yields tuples of stored data, rather than entities.
+
+        If fields are given, only those fields are loaded, in the given
+        order. With `flat=True`, a single field must be given, and its
+        values are yielded bare, rather than in 1-tuples.
+        """
+        if flat and len(fields) != 1:
+            raise ValueError("values_list(flat=True) requires exactly one field")
+        return self._project(fields, "flat" if flat else "tuple")
+
+    def _as_entity_query(self) -> Self:
+        if self.projection is None and self.result_type == "entity":
+            return self
+        return self.clone(projection=None, result_type="entity")
 
     def none(self) -> Iterable[TEntity]:
         """Return no results."""
@@ -303,18 +680,75 @@ class AbstractBaseQuery(ABC, Generic[TEntity]):
         """Template method: render an Entity as storage-ready data."""
         return entity.model_dump()
 
+    def transform_attrs_to_data(self, attrs: Mapping[str, Any]) -> Mapping[str, Any]:
+        """Template method: render some of an entity's attributes as storage-ready data.
+
+        If you override `transform_entity_to_data()`, override this
+        too, or partial updates will fall back to rendering the whole
+        entity.
+        """
+        return self.entity_class.model_construct(**attrs).model_dump(include=set(attrs))
+
     def transform_data_to_entity(self, data: Mapping) -> TEntity:
         """Template method: construct an entity from prepared entity data."""
         return self.entity_class.model_construct(**self.prepare_data_for_entity(data))
 
+    def transform_rows_to_results(self, rows: list[Mapping]) -> list:
+        """Transform a batch of stored records into query results.
+
+        These are entities, unless the query has been projected with
+        `values()` or `values_list()`.
+        """
+        match self.result_type:
+            case "dict":
+                return rows
+            case "tuple":
+                return [tuple(row.values()) for row in rows]
+            case "flat":
+                return [value for row in rows for value in row.values()]
+            case _:
+                entities = self.transform_rows_to_entities(rows)
+                if self.projection is not None:
+                    # Don't let unloaded fields pass for stored values by holding their defaults:
+                    unloaded = self.entity_class.model_fields.keys() - set(self.projection)
+                    for entity in entities:
+                        for key in unloaded:
+                            entity.__dict__.pop(key, None)
+                return entities
+
+    def transform_rows_to_entities(self, rows: list[Mapping]) -> list[TEntity]:
+        """Construct entities from a batch of stored records.
+
+        This is equivalent to calling `transform_data_to_entity()` on
+        each record, but skips the per-record method dispatch when that
+        template method has not been overridden.
+        """
+        if not self._transforms_rows_directly:
+            return [self.transform_data_to_entity(row) for row in rows]
+        construct = self.entity_class.model_construct
+        if type(self).prepare_data_for_entity is not AbstractBaseQuery.prepare_data_for_entity:
+            prepare = self.prepare_data_for_entity
+            return [construct(**prepare(row)) for row in rows]
+        hooks = self._bind_prepare_hooks()
+        return [construct(**self._prepare_data(row, hooks)) for row in rows]
+
     def prepare_data_for_entity(self, data: Mapping) -> Mapping:
-        """Template method: transform stored data into entity-ready data."""
-        out = {}
-        for key, value in data.items():
-            prepare = getattr(self, f"prepare_{key}", None)
-            if prepare is not None:
-                value = prepare(value, data)
-            out[key] = value
+        """Template method: transform stored data into entity-ready data.
+
+        Each value is passed through the matching `prepare_<key>(value,
+        data)` method, if the query class defines one.
+        """
+        return self._prepare_data(data, self._bind_prepare_hooks())
+
+    def _bind_prepare_hooks(self) -> list[tuple[str, Callable]]:
+        return [(key, getattr(self, name)) for key, name in self._prepare_hooks]
+
+    @staticmethod
+    def _prepare_data(data: Mapping, hooks: list[tuple[str, Callable]]) -> Mapping:
+        out = dict(data)
+        for key, prepare in hooks:
+            if key in out:
+                out[key] = prepare(out[key], data)
         return out
 
 
@@ -361,31 +795,185 @@ class AbstractEntityRepository(ABC, Generic[TEntity]):
         Attempting to insert a second entity with the same primary key
         will raise `AlreadyExists`.
         """
-        return await self.objects.insert(obj)
+        if self.session.buffer_writes:
+            self.session.unit_of_work.add(ensure_uuid(obj.id), INSERT, obj)
+            return
+        await self.objects.insert(obj)
+        self._remember(obj)
+
+    async def insert_many(self, objs: Iterable[TEntity]) -> None:
+        """Insert several entities into the repository at once.
+
+        If any of the entities shares a primary key with a stored
+        entity (or with another entity in the batch), raises
+        `AlreadyExists` with the conflicting primary keys as its
+        arguments, and none of the entities are inserted.
+        """
+        objs = list(objs)
+        if self.session.buffer_writes:
+            self.session.unit_of_work.add_many(((ensure_uuid(obj.id), obj) for obj in objs), INSERT)
+            return
+        await self.objects.insert_many(objs)
+        self._remember(*objs)
+
+    async def upsert(self, obj: TEntity) -> None:
+        """Insert an entity into the repository, or update it if it is already stored."""
+        await self.upsert_many([obj])
+
+    async def upsert_many(self, objs: Iterable[TEntity]) -> None:
+        """Insert or update several entities in the repository at once."""
+        objs = list(objs)
+        if self.session.buffer_writes:
+            self.session.unit_of_work.add_many(((ensure_uuid(obj.id), obj) for obj in objs), UPSERT)
+            return
+        await self.objects.upsert_many(objs)
+        self._remember(*objs)
 
     async def update(self, obj: TEntity) -> None:
         """Update a previously-stored entity record.
 
         Attempting to update an entity that has not already been
         inserted will raise `NotFound`.
+
+        If the session tracks changes, and the entity was loaded (or
+        written) during the session, only the fields that have changed
+        since are written.
         """
-        count = await self.objects.filter(id=obj.id).update(**self.objects.transform_entity_to_data(obj))
+        if self.session.buffer_writes:
+            self.session.unit_of_work.add(ensure_uuid(obj.id), UPDATE, obj)
+            return 1
+        return await self._update(obj)
+
+    async def _update(self, obj: TEntity) -> int:
+        if _get_unloaded_fields(obj):
+            return await self._update_loaded_fields(obj)
+        data = self.objects.transform_entity_to_data(obj)
+        snapshot = self.session.snapshots.get(ensure_uuid(obj.id))
+        if snapshot is not None:
+            # Only write what has changed since the entity was loaded:
+            data = {key: value for key, value in data.items() if key not in snapshot or snapshot[key] != value}
+            if not data:
+                return 1
+        count = await self.objects.filter(id=obj.id).update(**data)
         if count == 0:
             raise self.NotFound()
+        self._remember(obj)
+        return count
+
+    async def _update_loaded_fields(self, obj: TEntity) -> int:
+        # An entity from `only()`: write only the fields that were loaded,
+        # and forget any whole copy of it, rather than remembering this one.
+        if not self.objects._transforms_attrs_directly:
+            raise ValueError("Cannot render the loaded fields of a partial entity apart from the rest: %s" % obj.id)
+        attrs = {key: value for key, value in obj.__dict__.items() if key in type(obj).model_fields}
+        count = await self.objects.filter(id=obj.id).update(**self.objects.transform_attrs_to_data(attrs))
+        if count == 0:
+            raise self.NotFound()
+        id = ensure_uuid(obj.id)
+        self.session.identity_map.pop(id, None)
+        self.session.snapshots.pop(id, None)
         return count
 
     async def get(self, id: UUIDorStr) -> TEntity:
         """Retrieve a previously-stored entity record by primary key.
 
         If the entity does not exist in storage, raises `NotFound`.
+
+        If the session uses an identity map, an entity already loaded
+        during the session is returned without querying storage.
+        Buffered writes to the entity are applied to the result. If the
+        session batches gets, concurrent calls are loaded together.
         """
-        return await self.objects.get(id=ensure_uuid(id))
+        id = ensure_uuid(id)
+        pending = self.session.unit_of_work.get(id)
+        if pending is not None:
+            operation, value = pending
+            if operation == DELETE:
+                raise self.NotFound()
+            elif operation != UPDATE_ATTRS:
+                return value
+        try:
+            entity = self.session.identity_map[id]
+        except KeyError:
+            entity = await self._load(id)
+        if pending is not None:
+            entity = entity.model_copy(update=pending[1], deep=True)
+        return entity
+
+    async def _load(self, id: UUID) -> TEntity:
+        if not self.session.batch_gets:
+            entity = await self.objects.get(id=id)
+            self._remember(entity)
+            return entity
+        if self.session.loader is None:
+            self.session.loader = BatchLoader(self._load_many)
+        try:
+            return await self.session.loader.load(id)
+        except KeyError:
+            raise self.NotFound() from None
+
+    async def get_many(self, ids: Iterable[UUIDorStr]) -> dict[UUID, TEntity]:
+        """Retrieve several previously-stored entity records by primary key.
+
+        Returns a dict of the entities found, keyed by primary key in the
+        order given; primary keys not in storage are left out. Entities
+        are loaded with as few `id__in` queries as the query class's
+        `max_in_size` allows, rather than one query per entity.
+
+        As with `get()`, the identity map (if used) and buffered writes
+        are taken into account.
+        """
+        ids = list(dict.fromkeys(map(ensure_uuid, ids)))
+        found = {}
+        unloaded = []
+        for id in ids:
+            pending = self.session.unit_of_work.get(id)
+            if pending is not None and pending[0] != UPDATE_ATTRS:
+                if pending[0] != DELETE:
+                    found[id] = pending[1]
+            elif id in self.session.identity_map:
+                found[id] = self.session.identity_map[id]
+            else:
+                unloaded.append(id)
+        found.update(await self._load_many(unloaded))
+
+        entities = {}
+        for id in ids:
+            if id in found:
+                pending = self.session.unit_of_work.get(id)
+                if pending is not None and pending[0] == UPDATE_ATTRS:
+                    found[id] = found[id].model_copy(update=pending[1], deep=True)
+                entities[id] = found[id]
+        return entities
+
+    async def _load_many(self, ids: list[UUID]) -> dict[UUID, TEntity]:
+        entities = {}
+        for chunk in self._in_chunks(ids):
+            async for entity in self.objects.filter(id__in=chunk):
+                entities[ensure_uuid(entity.id)] = entity
+        self._remember(*entities.values())
+        return entities
+
+    def _in_chunks(self, ids: list[UUID]) -> list[list[UUID]]:
+        # Split primary keys into chunks small enough for one `id__in` filter:
+        return fn.chunks(self.objects.max_in_size or len(ids) or 1, ids)
+
+    def _remember(self, *objs: TEntity) -> None:
+        if self.session.use_identity_map:
+            for obj in objs:
+                self.session.identity_map[ensure_uuid(obj.id)] = obj
+        if self.session.track_changes:
+            for obj in objs:
+                self.session.snapshots[ensure_uuid(obj.id)] = self.objects.transform_entity_to_data(obj)
 
     async def delete(self, id: UUIDorStr) -> None:
         """Delete a previously-stored entity record by primary key.
 
         If the entity does not exist in storage, this is a no-op.
         """
+        if self.session.buffer_writes:
+            self.session.unit_of_work.add(ensure_uuid(id), DELETE)
+            return
         return await self.objects.filter(id=ensure_uuid(id)).delete()
 
     async def __aenter__(self):
@@ -401,8 +989,29 @@ class AbstractEntityRepository(ABC, Generic[TEntity]):
         del self.session
         self.active = False
 
+    async def flush(self) -> None:
+        """Run the session's buffered writes.
+
+        Pending deletes are run first, then inserts and upserts in
+        batches, then updates. This is called by `commit()`, but may be
+        called earlier, e.g. so that queries see buffered writes.
+        """
+        batches = self.session.unit_of_work.take()
+        for ids in self._in_chunks([id for id, _ in batches[DELETE]]):
+            await self.objects.filter(id__in=ids).delete()
+        for operation, write_many in ((INSERT, self.objects.insert_many), (UPSERT, self.objects.upsert_many)):
+            objs = [obj for _, obj in batches[operation]]
+            await write_many(objs)
+            self._remember(*objs)
+        for _, obj in batches[UPDATE]:
+            await self._update(obj)
+        for id, attrs in batches[UPDATE_ATTRS]:
+            await self._update_attrs(id, attrs)
+
     async def commit(self):
         """Commit queued changes to the repository."""
+        if self.session.unit_of_work:
+            await self.flush()
         await self.session.commit()
 
     async def rollback(self):
@@ -411,6 +1020,9 @@ class AbstractEntityRepository(ABC, Generic[TEntity]):
         This is the default behavior for all repository sessions that
         are not committed.
         """
+        self.session.identity_map.clear()
+        self.session.snapshots.clear()
+        self.session.unit_of_work.clear()
         await self.session.rollback()
 
     async def update_attrs(self, id: UUIDorStr, **kwargs) -> None:
@@ -418,10 +1030,35 @@ class AbstractEntityRepository(ABC, Generic[TEntity]):
 
         Attempting to update an entity that has not already been
         inserted will raise `NotFound`.
+
+        The attributes are written directly, in a single update query,
+        unless the query class can't render them apart from the rest of
+        the entity (see `AbstractBaseQuery.transform_attrs_to_data()`).
         """
-        entity = await self.get(id)
-        entity = entity.model_copy(update=kwargs, deep=True)
-        await self.update(entity)
+        if self.session.buffer_writes:
+            self.session.unit_of_work.add(ensure_uuid(id), UPDATE_ATTRS, kwargs)
+            return
+        await self._update_attrs(id, kwargs)
+
+    async def _update_attrs(self, id: UUIDorStr, attrs: dict[str, Any]) -> None:
+        if not self.objects._transforms_attrs_directly:
+            entity = await self.get(id)
+            entity = entity.model_copy(update=attrs, deep=True)
+            await self._update(entity)
+            return
+        query = self.objects.filter(id=ensure_uuid(id))
+        data = self.objects.transform_attrs_to_data(attrs)
+        if not data:  # No fields to write, but the entity must still exist
+            if not await query.exists():
+                raise self.NotFound()
+            return
+        if await query.update(**data) == 0:
+            raise self.NotFound()
+
+
+def _get_unloaded_fields(entity: TEntity) -> set[str]:
+    """Return the names of the entity's fields that weren't loaded (see `AbstractBaseQuery.only()`)."""
+    return type(entity).model_fields.keys() - entity.__dict__.keys()
 
 
 TRepository = TypeVar("TRepository", bound=AbstractEntityRepository)
@@ -0,0 +1,307 @@
+"""A read-through caching wrapper for entity repositories
+
+Wrap any repository in a `CachedRepository` to serve `get()` and
+repeated queries from an in-process cache:
+
+    ENTRY_CACHE = RepositoryCache(max_entries=10_000, ttl=60, max_bytes=64 * 2**20)
+
+    def get_entry_repository():
+        return CachedRepository(SQLEntryRepository(), ENTRY_CACHE)
+
+The cache outlives any one repository session, so it should be shared
+(e.g. at module level) by every wrapper around the same kind of
+repository. It holds only committed data: entities and results read in
+a session after writing through the wrapper bypass the cache, and the
+written entities (and all cached query results) are invalidated when
+the session commits. Since a session may read from a snapshot taken
+when it began, nothing it reads is cached once the cache has been
+invalidated since then.
+
+Cached entities are shared between sessions, so entity models should
+be immutable (e.g. `ConfigDict(frozen=True)`).
+"""
+import sys
+import time
+from collections import OrderedDict
+from collections.abc import Hashable, Mapping
+from dataclasses import dataclass, field
+from typing import Any, Callable, Generic, Iterable, Optional
+from uuid import UUID
+
+from steerage.repositories.base import AbstractBaseQuery, AbstractEntityRepository
+from steerage.types import TEntity, UUIDorStr
+from steerage.uuids import ensure_uuid
+
+MISSING = object()
+
+
+@dataclass
+class CacheStats:
+    """Running counts of cache lookups and removals"""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+
+class RepositoryCache:
+    """A least-recently-used cache with optional time-to-live and memory budget
+
+    Entries are evicted, least recently used first, to keep to at most
+    `max_entries` entries and (if given) `max_bytes` of estimated size.
+    Entries older than `ttl` seconds (if given) expire.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or estimate_size
+        self.clock = clock
+        self.stats = CacheStats()
+        self.total_bytes = 0
+        # Bumped by every invalidation, so that values read from storage
+        # before an invalidation aren't cached after it:
+        self.version = 0
+        self._entries: OrderedDict[Hashable, tuple[Any, Optional[float], int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Return the cached value for `key`, or `default` if it isn't cached (or has expired)."""
+        try:
+            value, expires_at, _ = self._entries[key]
+        except KeyError:
+            self.stats.misses += 1
+            return default
+        if expires_at is not None and expires_at <= self.clock():
+            self._remove(key)
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, version: Optional[int] = None) -> None:
+        """Cache `value` for `key`, evicting the least recently used entries as necessary.
+
+        If `version` is given, and the cache has been invalidated since
+        it was read from `self.version`, the value is not cached.
+        """
+        if version is not None and version != self.version:
+            return
+        size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        expires_at = None if self.ttl is None else self.clock() + self.ttl
+        self._entries[key] = (value, expires_at, size)
+        self.total_bytes += size
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.total_bytes > self.max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+            self.stats.evictions += 1
+
+    def invalidate(self, keys: Iterable[Hashable]) -> None:
+        """Remove the given keys from the cache."""
+        self.version += 1
+        for key in keys:
+            if key in self._entries:
+                self._remove(key)
+                self.stats.invalidations += 1
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Remove the keys matching `predicate` from the cache."""
+        self.invalidate([key for key in self._entries if predicate(key)])
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        self.invalidate(list(self._entries))
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._entries.pop(key)
+        self.total_bytes -= size
+
+
+def estimate_size(value: Any) -> int:
+    """Estimate the memory used by a value, including the containers and objects it holds."""
+    size = sys.getsizeof(value)
+    if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return size
+    if isinstance(value, Mapping):
+        return size + sum(estimate_size(key) + estimate_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(estimate_size(item) for item in value)
+    if hasattr(value, "__dict__") and not isinstance(value, type):
+        return size + estimate_size(vars(value))
+    return size
+
+
+def _is_query_key(key: Hashable) -> bool:
+    return key[0] == "query"
+
+
+@dataclass(repr=False)
+class CachedRepository(Generic[TEntity]):
+    """A repository wrapper that serves reads from a shared `RepositoryCache`
+
+    Use it as you would the wrapped repository. `get()` reads through
+    the cache, as does `as_list()` for queries built from `objects`.
+    Writes go straight to the wrapped repository; the entities written
+    are invalidated in the cache on `commit()`, along with all cached
+    query results.
+
+    Writes made directly through `objects` (e.g.
+    `objects.filter(...).update(...)`) are not tracked; call
+    `invalidate()` after committing them.
+    """
+
+    repository: AbstractEntityRepository
+    cache: RepositoryCache
+    dirty_ids: set = field(init=False, default_factory=set)
+    # The cache version when the session (or its snapshot) began:
+    snapshot_version: int = field(init=False, default=0)
+
+    @property
+    def objects(self) -> AbstractBaseQuery:
+        """The wrapped repository's base query"""
+        return self.repository.objects
+
+    @property
+    def stats(self) -> CacheStats:
+        """Hit, miss and eviction counts for the cache"""
+        return self.cache.stats
+
+    @property
+    def NotFound(self) -> type[Exception]:
+        """The wrapped repository's `NotFound` exception"""
+        return self.repository.NotFound
+
+    async def __aenter__(self):
+        await self.repository.__aenter__()
+        self.dirty_ids = set()
+        self.snapshot_version = self.cache.version
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.dirty_ids = set()
+        await self.repository.__aexit__(exc_type, exc_val, exc_tb)
+
+    async def get(self, id: UUIDorStr) -> TEntity:
+        """Retrieve an entity by primary key, from the cache if possible."""
+        id = ensure_uuid(id)
+        if self.dirty_ids:
+            # Changes made in this session aren't visible in the cache:
+            return await self.repository.get(id)
+        key = ("get", id)
+        entity = self.cache.get(key)
+        if entity is MISSING:
+            entity = await self.repository.get(id)
+            self.cache.set(key, entity, self.snapshot_version)
+        return entity
+
+    async def get_many(self, ids: Iterable[UUIDorStr]) -> dict[UUID, TEntity]:
+        """Retrieve several entities by primary key, loading only those not in the cache."""
+        ids = list(dict.fromkeys(map(ensure_uuid, ids)))
+        if self.dirty_ids:
+            return await self.repository.get_many(ids)
+        cached = {id: self.cache.get(("get", id)) for id in ids}
+        loaded = await self.repository.get_many([id for id, entity in cached.items() if entity is MISSING])
+        for id, entity in loaded.items():
+            self.cache.set(("get", id), entity, self.snapshot_version)
+        entities = {}
+        for id, entity in cached.items():
+            if entity is MISSING:
+                entity = loaded.get(id, MISSING)
+            if entity is not MISSING:
+                entities[id] = entity
+        return entities
+
+    async def as_list(self, query: AbstractBaseQuery) -> list:
+        """Reify the given query as a list, from the cache if possible.
+
+        Queries with unhashable filter values are not cached.
+        """
+        try:
+            key = ("query", query.cache_key())
+        except TypeError:
+            return await query.as_list()
+        if self.dirty_ids:
+            return await query.as_list()
+        results = self.cache.get(key)
+        if results is MISSING:
+            results = tuple(await query.as_list())
+            self.cache.set(key, results, self.snapshot_version)
+        return list(results)
+
+    async def insert(self, obj: TEntity) -> None:
+        """Insert an entity into the wrapped repository."""
+        self.dirty_ids.add(ensure_uuid(obj.id))
+        await self.repository.insert(obj)
+
+    async def insert_many(self, objs: Iterable[TEntity]) -> None:
+        """Insert several entities into the wrapped repository at once."""
+        objs = list(objs)
+        self.dirty_ids.update(ensure_uuid(obj.id) for obj in objs)
+        await self.repository.insert_many(objs)
+
+    async def upsert(self, obj: TEntity) -> None:
+        """Insert or update an entity in the wrapped repository."""
+        self.dirty_ids.add(ensure_uuid(obj.id))
+        await self.repository.upsert(obj)
+
+    async def upsert_many(self, objs: Iterable[TEntity]) -> None:
+        """Insert or update several entities in the wrapped repository at once."""
+        objs = list(objs)
+        self.dirty_ids.update(ensure_uuid(obj.id) for obj in objs)
+        await self.repository.upsert_many(objs)
+
+    async def update(self, obj: TEntity) -> None:
+        """Update a previously-stored entity in the wrapped repository."""
+        self.dirty_ids.add(ensure_uuid(obj.id))
+        return await self.repository.update(obj)
+
+    async def update_attrs(self, id: UUIDorStr, **kwargs) -> None:
+        """Update the specified keyword attributes for an entity ID in the wrapped repository."""
+        self.dirty_ids.add(ensure_uuid(id))
+        await self.repository.update_attrs(id, **kwargs)
+
+    async def delete(self, id: UUIDorStr) -> None:
+        """Delete an entity from the wrapped repository."""
+        self.dirty_ids.add(ensure_uuid(id))
+        return await self.repository.delete(id)
+
+    async def commit(self) -> None:
+        """Commit queued changes, and invalidate the cached entities (and queries) that they touch."""
+        await self.repository.commit()
+        if self.dirty_ids:
+            self.cache.invalidate(("get", id) for id in self.dirty_ids)
+            self.cache.invalidate_where(_is_query_key)
+            self.dirty_ids = set()
+        self.snapshot_version = self.cache.version
+
+    async def rollback(self) -> None:
+        """Roll back any queued changes."""
+        self.dirty_ids = set()
+        await self.repository.rollback()
+        self.snapshot_version = self.cache.version
+
+    def invalidate(self) -> None:
+        """Remove everything from the cache."""
+        self.cache.clear()
@@ -0,0 +1,181 @@
+"""Columnar snapshots of in-memory tables, for vectorized scans
+
+A `ColumnarSnapshot` holds a committed in-memory table as one NumPy
+array per field, built as each field is first needed, so that filters
+run as vectorized masks and ordering as a single `lexsort`, rather than
+comparing rows one at a time in Python. Only the rows selected are then
+read from the table.
+
+This requires NumPy (`pip install steerage[numpy]`).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from functools import cached_property
+from typing import Any, Optional, Sequence
+
+import numpy as np
+from pyrsistent.typing import PMap
+
+from steerage.repositories.base import OrderBy
+
+# Scalar kinds that can be held in a column, with their dtype and a fill value for nulls.
+# NOTE: bool is a subclass of int, so order matters here.
+# Strings are held as objects: a fixed-width `np.str_` array would take
+# four bytes per character of the longest string, for every row.
+COLUMN_KINDS = {
+    bool: (bool, False),
+    int: (np.int64, 0),
+    float: (np.float64, 0.0),
+    str: (object, ""),
+    datetime: (np.int64, 0),
+}
+
+
+@dataclass(frozen=True, eq=False)
+class Column:
+    """One field of a table snapshot as an array, with a mask of the null values"""
+
+    kind: type
+    values: np.ndarray
+    nulls: np.ndarray
+    aware: bool = False  # For datetimes: whether they are offset-aware
+
+    @classmethod
+    def build(cls, values: list[Any]) -> Optional[Column]:
+        """Build a column from a field's values, or return `None` if they aren't all of one scalar kind."""
+        present = [value for value in values if value is not None]
+        kind = _get_kind(present)
+        if kind is None:
+            return None
+        aware = kind is datetime and present[0].tzinfo is not None
+        if kind is datetime and any((value.tzinfo is not None) is not aware for value in present):
+            return None  # Naive and aware datetimes can't be compared
+        dtype, fill = COLUMN_KINDS[kind]
+        convert = CONVERTERS.get(kind, kind)
+        try:
+            array = np.array([fill if value is None else convert(value) for value in values], dtype=dtype)
+        except OverflowError:  # e.g. integers too big for int64
+            return None
+        nulls = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+        return cls(kind, array, nulls, aware)
+
+    def convert(self, value: Any) -> Any:
+        """Convert a value to compare against the column, raising `TypeError` if it isn't comparable."""
+        kind = _get_kind([value])
+        if kind is not self.kind and not {kind, self.kind} <= NUMERIC_KINDS:
+            raise TypeError("Cannot compare %r with a column of %s" % (value, self.kind.__name__))
+        if kind is datetime and (value.tzinfo is not None) is not self.aware:
+            raise TypeError("Cannot compare naive and aware datetimes")
+        return CONVERTERS[kind](value) if kind in CONVERTERS else value
+
+    def mask(self, operator: Optional[str], value: Any) -> np.ndarray:
+        """Return a mask of the rows matching the filter.
+
+        Raises `TypeError` if the filter can't be vectorized.
+        """
+        present = ~self.nulls
+        match operator:
+            case None | "eq" if value is None:
+                return self.nulls
+            case None | "eq":
+                return present & (self.values == self.convert(value))
+            case "ne" if value is None:
+                return present
+            case "ne":
+                return self.nulls | (self.values != self.convert(value))
+            case "lt" | "lte" | "gt" | "gte":
+                return present & COMPARISONS[operator](self.values, self.convert(value))
+            case "in":
+                mask = present & np.isin(self.values, [self.convert(item) for item in value if item is not None])
+                return mask | self.nulls if None in value else mask
+            case "isnull" if isinstance(value, bool):
+                return self.nulls if value else present
+            case "startswith" | "endswith" if self.kind is str:
+                test, affix = getattr(str, operator), self.convert(value)
+                matches = np.fromiter((test(item, affix) for item in self.values), dtype=bool, count=len(self.values))
+                return present & matches
+        raise TypeError("Cannot vectorize the %r operator" % operator)
+
+    def rank(self, ascending: bool) -> np.ndarray:
+        """Return an integer sort key for each row, with nulls first when ascending (last when descending)."""
+        return self._ranks if ascending else -self._ranks
+
+    @cached_property
+    def _ranks(self) -> np.ndarray:
+        _, ranks = np.unique(self.values, return_inverse=True)
+        return np.where(self.nulls, -1, ranks)
+
+
+NUMERIC_KINDS = {int, float}
+COMPARISONS = {"lt": np.less, "lte": np.less_equal, "gt": np.greater, "gte": np.greater_equal}
+
+
+def _get_kind(values: list[Any]) -> Optional[type]:
+    # The one kind of column that can hold all the values, if any (float columns can also hold ints):
+    types = {type(value) for value in values}
+    for kind in COLUMN_KINDS:
+        if types and all(issubclass(type_, kind) or (kind is float and type_ is int) for type_ in types):
+            return kind
+    return None
+
+
+def _datetime_to_microseconds(value: datetime) -> int:
+    # Microseconds since the epoch (in UTC, for aware datetimes), which sort as the datetimes do:
+    epoch = NAIVE_EPOCH if value.tzinfo is None else AWARE_EPOCH
+    return (value - epoch) // timedelta(microseconds=1)
+
+
+NAIVE_EPOCH = datetime(1970, 1, 1)
+AWARE_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+CONVERTERS = {datetime: _datetime_to_microseconds}
+
+
+@dataclass(frozen=True, eq=False)
+class ColumnarSnapshot:
+    """A committed table snapshot, with its fields as `Column`s built on first use"""
+
+    table: PMap[str, PMap[str, Any]]
+    rows: list[PMap[str, Any]]
+    columns: dict[str, Optional[Column]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, table: PMap[str, PMap[str, Any]]) -> ColumnarSnapshot:
+        """Build a columnar snapshot of the table (without any columns yet)."""
+        return cls(table=table, rows=list(table.values()))
+
+    def column(self, name: str) -> Optional[Column]:
+        """Return the named column, or `None` if the field's values can't be held in one."""
+        try:
+            return self.columns[name]
+        except KeyError:
+            column = self.columns[name] = Column.build([row.get(name) for row in self.rows])
+            return column
+
+    def select(self, filters: Sequence[tuple], ordering: Sequence[OrderBy]) -> tuple[np.ndarray, list, bool]:
+        """Select the positions in `rows` of the rows matching the filters, in order if possible.
+
+        Returns a tuple of `(positions, remaining_filters, ordered)`,
+        where the remaining filters are those that couldn't be
+        vectorized, and `ordered` is true if the positions are sorted by
+        the ordering.
+        """
+        mask = np.ones(len(self.rows), dtype=bool)
+        remaining = []
+        for key, operator, value in filters:
+            column = self.column(key)
+            try:
+                if column is None:
+                    raise TypeError("Cannot vectorize %r" % key)
+                mask &= column.mask(operator, value)
+            except TypeError:
+                remaining.append((key, operator, value))
+        positions = np.flatnonzero(mask)
+
+        columns = [self.column(key) for key, _ in ordering]
+        if not ordering or None in columns:
+            return positions, remaining, False
+        # `lexsort()` sorts by the last key first:
+        ranks = [column.rank(ascending)[positions] for column, (_, ascending) in zip(columns, ordering)]
+        return positions[np.lexsort(ranks[::-1])], remaining, True
@@ -0,0 +1,56 @@
+"""Opaque cursor tokens for keyset pagination"""
+import base64
+import binascii
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Sequence
+from uuid import UUID
+
+# Values that JSON can't represent natively are tagged by type:
+TAGGED_TYPES = {
+    "uuid": (UUID, str, UUID),
+    "datetime": (datetime, datetime.isoformat, datetime.fromisoformat),
+    "date": (date, date.isoformat, date.fromisoformat),
+    "time": (time, time.isoformat, time.fromisoformat),
+    "timedelta": (timedelta, timedelta.total_seconds, lambda value: timedelta(seconds=value)),
+    "decimal": (Decimal, str, Decimal),
+}
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode a sequence of ordering key values as an opaque, URL-safe cursor token."""
+    payload = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token: str) -> tuple[Any, ...]:
+    """Decode a cursor token from `encode_cursor()` back into a tuple of ordering key values.
+
+    Raises `ValueError` if the token is malformed.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if not isinstance(payload, list):
+            raise ValueError("Cursor payload is not a list")
+        return tuple(_decode_value(value) for value in payload)
+    except (binascii.Error, UnicodeDecodeError, TypeError, KeyError, AttributeError, ValueError) as exc:
+        raise ValueError("Invalid cursor: %r" % token) from exc
+
+
+def _encode_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    # NOTE: datetime is a subclass of date, so order matters here.
+    for tag, (type_, encode, _) in TAGGED_TYPES.items():
+        if isinstance(value, type_):
+            return {tag: encode(value)}
+    raise TypeError("Cannot encode %r in a cursor" % value)
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        ((tag, encoded),) = value.items()
+        _, _, decode = TAGGED_TYPES[tag]
+        return decode(encoded)
+    return value
@@ -0,0 +1,63 @@
+"""Coalescing of concurrent lookups into batched loads
+
+A `BatchLoader` collects the keys requested with `load()` during one
+turn of the event loop, and loads them all together with a single call
+to its batch load function, e.g.:
+
+    loader = BatchLoader(repo.get_many)
+    first, second = await asyncio.gather(loader.load(first_id), loader.load(second_id))
+
+makes one call to `repo.get_many([first_id, second_id])`.
+"""
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable, Mapping
+from typing import Any
+
+
+class BatchLoader:
+    """Load values by key, batching the keys requested concurrently
+
+    `load_many` is an async function taking a list of unique keys and
+    returning a mapping of the values found for them; keys missing from
+    the mapping raise `KeyError` from `load()`. If `load_many` fails,
+    every `load()` in the batch raises its exception.
+    """
+
+    def __init__(self, load_many: Callable[[list], Awaitable[Mapping[Hashable, Any]]]):
+        self.load_many = load_many
+        self.queue: dict[Hashable, list[asyncio.Future]] = {}
+        # Hold references to running batches, so they aren't garbage collected:
+        self._batches: set[asyncio.Task] = set()
+
+    async def load(self, key: Hashable) -> Any:
+        """Load the value for `key`, along with any other keys requested in the same turn of the event loop."""
+        loop = asyncio.get_running_loop()
+        if not self.queue:
+            loop.call_soon(self._dispatch)
+        future = loop.create_future()
+        self.queue.setdefault(key, []).append(future)
+        return await future
+
+    def _dispatch(self) -> None:
+        queue, self.queue = self.queue, {}
+        task = asyncio.ensure_future(self._load_batch(queue))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _load_batch(self, queue: dict[Hashable, list[asyncio.Future]]) -> None:
+        try:
+            values = await self.load_many(list(queue))
+        except Exception as exc:
+            for futures in queue.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(exc)
+            return
+        for key, futures in queue.items():
+            for future in futures:
+                if future.done():  # The caller was cancelled
+                    continue
+                if key in values:
+                    future.set_result(values[key])
+                else:
+                    future.set_exception(KeyError(key))
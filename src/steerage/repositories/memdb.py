@@ -1,7 +1,7 @@
 """An ephemeral in-memory implementation of entity storage"""
 from __future__ import annotations
 
-import operator as op
+from bisect import bisect_left, bisect_right
 from collections.abc import Mapping
 from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
@@ -11,37 +11,66 @@ from typing import (
     AsyncGenerator,
     Callable,
     ClassVar,
+    Iterable,
     Type,
     TypeVar,
 )
 
 import funcy as fn
 from convoke.plugins import ABCPluginMount
-from pyrsistent import discard, freeze, thaw
-from pyrsistent.typing import PMap
+from pyrsistent import freeze, pmap, pset
+from pyrsistent.typing import PMap, PSet
 
+from steerage.exceptions import WriteConflict
 from steerage.repositories.base import (
-    CMP_OPERATORS,
     AbstractBaseQuery,
     AbstractEntityRepository,
 )
+from steerage.repositories.rows import filter_rows, project_row, rows_after, sort_rows, thaw_row
 from steerage.repositories.sessions import AbstractSession
+from steerage.repositories.snapshots import (
+    PathLike,
+    SnapshotReader,
+    append_changes,
+    read_changes,
+    truncate_changes,
+    write_snapshot,
+)
 from steerage.types import TEntity
 
 if TYPE_CHECKING:  # pragma: nocover
     from pytest import FixtureRequest
 
+    from steerage.repositories.columns import ColumnarSnapshot
+
 T = TypeVar("T")
 
+HASH_INDEX_OPERATORS = frozenset({None, "eq", "isnull", "in"})
+SORTED_INDEX_OPERATORS = frozenset({None, "eq", "lt", "lte", "gt", "gte", "startswith"})
+EMPTY_INDEXES = pmap()
+EMPTY_KEYS = pset()
+
 
 @dataclass
 class InMemorySession(AbstractSession):
     """Session tracking for an ephemeral in-memory implementation of entity storage
 
+    Each session works on its own snapshot of the database, taken when it
+    begins (and again after each commit or rollback), so it reads its own
+    writes and nobody else's until it commits. Commits are optimistic:
+    the rows the session has written are merged onto the latest
+    committed tables, and `WriteConflict` is raised, committing nothing,
+    if another session has committed changes to any of the same rows in
+    the meantime.
+
     Useful for testing
     """
 
     tables: PMap[str, PMap[str, Any]] = field(default_factory=lambda: Database.tables)
+    indexes: PMap[str, PMap[str, PMap[Any, PSet[str]]]] = field(default_factory=lambda: Database.indexes)
+    base_tables: PMap[str, PMap[str, Any]] = field(default_factory=lambda: Database.tables)
+    versions: PMap[str, int] = field(default_factory=lambda: Database.versions)
+    writes: dict[str, set[str]] = field(init=False, default_factory=dict)
 
     async def begin(self):
         """Begin the session.
@@ -58,12 +87,63 @@ class InMemorySession(AbstractSession):
         pass
 
     async def commit(self) -> None:
-        """Commit proposed changes to the in-memory database."""
-        Database.tables = self.tables
+        """Commit proposed changes to the in-memory database.
+
+        Tables that no other session has committed to since this session's
+        snapshot are committed as they are; otherwise, the written rows are
+        merged onto the latest committed table.
+        """
+        stale = {name for name in self.writes if Database.versions.get(name, 0) != self.versions.get(name, 0)}
+        conflicts = [
+            key
+            for name in stale
+            for key in sorted(self.writes[name])
+            if Database.tables[name].get(key) is not self.base_tables[name].get(key)
+        ]
+        if conflicts:
+            raise WriteConflict(*conflicts)
+
+        tables = Database.tables.evolver()
+        indexes = Database.indexes.evolver()
+        versions = Database.versions.evolver()
+        for name, keys in self.writes.items():
+            if name in stale:
+                changes = [(key, self.tables[name].get(key)) for key in keys]
+                table, table_indexes, _ = apply_changes(Database.tables[name], Database.indexes.get(name), changes)
+            else:
+                table, table_indexes = self.tables[name], self.indexes.get(name)
+            Database.update_sorted_indexes(name, table, keys)
+            tables[name] = table
+            if table_indexes is not None:
+                indexes[name] = table_indexes
+            versions[name] = Database.versions.get(name, 0) + 1
+        Database.tables = tables.persistent()
+        Database.indexes = indexes.persistent()
+        Database.versions = versions.persistent()
+        if Database.changelog_path is not None and self.writes:
+            changes = [
+                (name, key, Database.tables[name].get(key)) for name, keys in self.writes.items() for key in keys
+            ]
+            append_changes(Database.changelog_path, changes)
+        self._take_snapshot()
 
     async def rollback(self) -> None:
         """Roll back and forget proposed changes."""
-        self.tables = Database.tables
+        self._take_snapshot()
+
+    def write(self, table_name: str, changes: Iterable[tuple[str, PMap[str, Any] | None]]) -> None:
+        """Apply a batch of row changes (`None` to delete) to the session's table and indexes."""
+        table, indexes, keys = apply_changes(self.tables[table_name], self.indexes.get(table_name), changes)
+        self.tables = self.tables.set(table_name, table)
+        if indexes is not None:
+            self.indexes = self.indexes.set(table_name, indexes)
+        self.writes.setdefault(table_name, set()).update(keys)
+
+    def _take_snapshot(self) -> None:
+        self.tables = self.base_tables = Database.tables
+        self.indexes = Database.indexes
+        self.versions = Database.versions
+        self.writes = {}
 
 
 class AbstractInMemoryQuery(AbstractBaseQuery):
@@ -79,41 +159,44 @@ class AbstractInMemoryQuery(AbstractBaseQuery):
         self.validate_constraints(data)
         self._upsert(data)
 
+    async def run_insert_many_query(self, data: list[Mapping]) -> None:
+        """Run a bulk insert query against the backend."""
+        self.validate_many_constraints(data)
+        self._upsert_many(data)
+
+    async def run_upsert_many_query(self, data: list[Mapping]) -> None:
+        """Run a bulk upsert query against the backend."""
+        self._upsert_many(data)
+
     async def run_update_query(self, **kwargs) -> int:
-        """Run this as an update query against the backend."""
-        count = 0
-        async for entity in self:
-            new_entity = entity.model_copy(update=self.prepare_data_for_entity(kwargs))
-            self._upsert(self.transform_entity_to_data(new_entity))
-            count += 1
-        return count
+        """Run this as an update query against the backend.
+
+        Only the given keys are changed in each matching row.
+        """
+        changes = freeze(kwargs)
+        table = self.session.tables[self.table_name]
+        keys = [str(row["id"]) async for row in self.clone(projection=("id",)).run_selection_query()]
+        updates = [(key, table[key].update(changes)) for key in keys if key in table]
+        self._write(updates)
+        return len(updates)
 
     async def run_delete_query(self, **kwargs) -> int:
         """Run this as a deletion query against the backend."""
-        count = 0
-        async for entity in self:
-            self.session.tables = self.session.tables.transform((self.table_name, str(entity.id)), discard)
-            count += 1
-        return count
+        keys = [str(entity.id) async for entity in self]
+        self._write((key, None) for key in keys)
+        return len(keys)
 
     async def run_selection_query(self) -> AsyncGenerator[Mapping, None]:
         """Run this selection query against the in-memory database."""
-        rows = Database.tables[self.table_name].values()
-
-        for key, operator, value in self.filters:
-            op_fn = CMP_OPERATORS[operator]
-            rows = (row for row in rows if op_fn(getattr(row, key), value))
-
-        if self.ordering:
-            # In memory multi-item sort with mixed ascending/descending! Let's go!
-            #
-            # First, sort on the last key:
-            key, ascending = self.ordering[-1]
-            rows = sorted(rows, key=op.itemgetter(key), reverse=not ascending)
-            # Now, sort on preceding keys, from back to front. This works because Python sort is stable.
-            # See https://stackoverflow.com/questions/11993004/
-            for key, ascending in self.ordering[-2::-1]:  # <- reversed slice, penultimate through first
-                rows.sort(key=op.itemgetter(key), reverse=not ascending)
+        rows, filters, ordered = self._get_candidate_rows(self.session.tables[self.table_name], self.session.indexes)
+
+        rows = filter_rows(rows, filters, self.predicates)
+        if self.keyset is not None:
+            rows = rows_after(rows, self.ordering, self.keyset)
+
+        if self.ordering and not ordered:
+            stop = None if self.limit is None else self.offset + self.limit
+            rows = sort_rows(rows, self.ordering, stop)
 
         if self.offset:
             rows = fn.drop(self.offset, rows)
@@ -121,8 +204,12 @@ class AbstractInMemoryQuery(AbstractBaseQuery):
         if self.limit is not None:
             rows = fn.take(self.limit, rows)
 
-        for row in rows:
-            yield thaw(row)
+        if self.projection is None:
+            for row in rows:
+                yield thaw_row(row)
+        else:
+            for row in rows:
+                yield project_row(row, self.projection)
 
     def validate_constraints(self, data: Mapping) -> None:
         """Template method: validate any invariant constraints for the in-memory table.
@@ -132,9 +219,304 @@ class AbstractInMemoryQuery(AbstractBaseQuery):
         if str(data["id"]) in self.session.tables[self.table_name]:
             raise self.AlreadyExists(data["id"])
 
+    def validate_many_constraints(self, data: list[Mapping]) -> None:
+        """Validate invariant constraints for a batch of records.
+
+        Each record is checked with `validate_constraints()`, and the
+        batch is checked for duplicate primary keys. All conflicting
+        primary keys are reported together in a single `AlreadyExists`.
+        """
+        conflicts = []
+        seen = set()
+        for item in data:
+            key = str(item["id"])
+            try:
+                self.validate_constraints(item)
+            except self.AlreadyExists:
+                conflicts.append(item["id"])
+            else:
+                if key in seen:
+                    conflicts.append(item["id"])
+            seen.add(key)
+        if conflicts:
+            raise self.AlreadyExists(*conflicts)
+
+    def _get_candidate_rows(
+        self, table: PMap[str, PMap[str, Any]], indexes: PMap[str, PMap[str, PMap[Any, PSet[str]]]]
+    ) -> tuple[Iterable[PMap[str, Any]], list, bool]:
+        """Narrow the table down to candidate rows using primary keys and indexes.
+
+        Returns a tuple of `(rows, remaining_filters, ordered)`, where
+        `ordered` is true if the rows are already sorted by `self.ordering`.
+        """
+        keys, filters = self._get_hash_index_candidates(indexes)
+        if keys is not None:
+            return (row for row in map(table.get, keys) if row is not None), filters, False
+        if table is not Database.tables[self.table_name]:
+            # Sorted indexes and columnar snapshots are only kept for committed tables:
+            return table.values(), self._get_seek_filters(filters), False
+        snapshot = Database.get_columnar_snapshot(self.table_name)
+        if snapshot is not None:
+            positions, filters, ordered = snapshot.select(self._get_seek_filters(filters), self.ordering)
+            return map(snapshot.rows.__getitem__, positions.tolist()), filters, ordered
+        return self._get_sorted_index_candidates(table, filters)
+
+    def _get_hash_index_candidates(
+        self, indexes: PMap[str, PMap[str, PMap[Any, PSet[str]]]]
+    ) -> tuple[set[str] | None, list]:
+        ids, filters = self.split_primary_key_filter()
+        keys = None if ids is None else {str(id) for id in ids}
+        table_indexes = indexes.get(self.table_name, EMPTY_INDEXES)
+
+        remaining = []
+        for key, operator, value in filters:
+            if key in table_indexes and operator in HASH_INDEX_OPERATORS:
+                if operator == "isnull":
+                    if value is not True:
+                        remaining.append((key, operator, value))
+                        continue
+                    value = None
+                index = table_indexes[key]
+                try:
+                    if operator == "in":
+                        matches = set().union(*(index.get(item, EMPTY_KEYS) for item in value))
+                    else:
+                        matches = index.get(value, EMPTY_KEYS)
+                except TypeError:  # Unhashable value; fall back to scanning
+                    remaining.append((key, operator, value))
+                    continue
+                if keys is None:
+                    keys = matches
+                else:
+                    if len(matches) < len(keys):
+                        keys, matches = matches, keys
+                    keys = {k for k in keys if k in matches}
+            else:
+                remaining.append((key, operator, value))
+
+        return keys, remaining
+
+    def _get_sorted_index_candidates(
+        self, table: PMap[str, PMap[str, Any]], filters: list
+    ) -> tuple[Iterable[PMap[str, Any]], list, bool]:
+        indexed_fields = Database.sorted_indexes.get(self.table_name, ())
+        order_key = self.ordering[0].key if self.ordering else None
+        filters = self._get_seek_filters(filters)
+        if order_key in indexed_fields:
+            name = order_key
+        else:
+            name = fn.first(
+                key
+                for key, operator, value in filters
+                if key in indexed_fields and operator in SORTED_INDEX_OPERATORS and value is not None
+            )
+        index = Database.get_sorted_index(self.table_name, name) if name is not None else None
+        if index is None:
+            return table.values(), filters, False
+
+        start, stop = 0, len(index.keys)
+        remaining = []
+        for key, operator, value in filters:
+            if key == name and operator in SORTED_INDEX_OPERATORS and value is not None:
+                try:
+                    start, stop = index.narrow(operator, value, start, stop)
+                    continue
+                except TypeError:  # Incomparable value; fall back to scanning
+                    pass
+            remaining.append((key, operator, value))
+        narrowed = len(remaining) < len(filters)
+
+        if name != order_key:
+            return map(table.__getitem__, index.keys[start:stop]), remaining, False
+
+        groups = index.walk(start, stop, ascending=self.ordering[0].ascending, nulls=not narrowed)
+        return self._iter_sorted_groups(table, groups), remaining, True
+
+    def _get_seek_filters(self, filters: list) -> list:
+        if self.keyset is not None and self.keyset[0] is not None:
+            # Seek past the cursor on the first ordering key; `rows_after()` settles any ties.
+            key, ascending = self.ordering[0]
+            return filters + [(key, "gte" if ascending else "lte", self.keyset[0])]
+        return filters
+
+    def _iter_sorted_groups(
+        self, table: PMap[str, PMap[str, Any]], groups: Iterable[list[str]]
+    ) -> Iterable[PMap[str, Any]]:
+        """Yield rows for groups of keys that tie on the first ordering key, breaking ties on the rest."""
+        tiebreakers = self.ordering[1:]
+        for group in groups:
+            rows = [table[key] for key in group]
+            if tiebreakers and len(rows) > 1:
+                rows = sort_rows(rows, tiebreakers)
+            yield from rows
+
     def _upsert(self, data: Mapping) -> None:
-        data = freeze(data)
-        self.session.tables = self.session.tables.transform((self.table_name, str(data["id"])), data)
+        self._write([(str(data["id"]), freeze(data))])
+
+    def _upsert_many(self, data: list[Mapping]) -> None:
+        self._write((str(item["id"]), freeze(item)) for item in data)
+
+    def _write(self, changes: Iterable[tuple[str, PMap[str, Any] | None]]) -> None:
+        self.session.write(self.table_name, changes)
+
+
+def apply_changes(
+    table: PMap[str, PMap[str, Any]],
+    indexes: PMap[str, PMap[Any, PSet[str]]] | None,
+    changes: Iterable[tuple[str, PMap[str, Any] | None]],
+) -> tuple[PMap[str, PMap[str, Any]], PMap[str, PMap[Any, PSet[str]]] | None, list[str]]:
+    """Apply a batch of row changes (`None` to delete) to a table and its hash indexes.
+
+    Returns a tuple of `(table, indexes, keys)`, where `keys` are the
+    keys of the rows actually changed.
+    """
+    evolver = table.evolver()
+    keys = []
+    for key, row in changes:
+        old_row = evolver[key] if key in evolver else None
+        if old_row is None and row is None:
+            continue
+        if indexes:
+            indexes = _update_indexes(indexes, key, old_row, row)
+        if row is not None:
+            evolver[key] = row
+        else:
+            evolver.remove(key)
+        keys.append(key)
+    return evolver.persistent(), indexes, keys
+
+
+def _update_indexes(
+    indexes: PMap[str, PMap[Any, PSet[str]]], key: str, old_row: PMap[str, Any] | None, new_row: PMap[str, Any] | None
+) -> PMap[str, PMap[Any, PSet[str]]]:
+    """Return a table's hash indexes updated for the row at `key` changing from `old_row` to `new_row`.
+
+    Either row may be `None`, for an insertion or a deletion.
+    """
+    evolver = indexes.evolver()
+    for name, index in indexes.items():
+        old_value = old_row.get(name) if old_row is not None else None
+        new_value = new_row.get(name) if new_row is not None else None
+        if old_row is not None and new_row is not None and old_value == new_value:
+            continue
+        if old_row is not None:
+            remaining = index[old_value].discard(key)
+            index = index.set(old_value, remaining) if remaining else index.discard(old_value)
+        if new_row is not None:
+            index = index.set(new_value, index.get(new_value, EMPTY_KEYS).add(key))
+        evolver[name] = index
+    return evolver.persistent()
+
+
+@dataclass(frozen=True, eq=False)
+class SortedIndex:
+    """A sorted secondary index over one field of a table snapshot
+
+    Row keys are kept in order of the field's value, so that range
+    filters are binary searches, and ordering is a walk of the index.
+    Rows where the field is null are kept aside in `null_keys`.
+    """
+
+    table: PMap[str, PMap[str, Any]]
+    values: list[Any]
+    keys: list[str]
+    null_keys: list[str]
+
+    @classmethod
+    def build(cls, table: PMap[str, PMap[str, Any]], name: str) -> SortedIndex:
+        """Build a sorted index over the named field of the table snapshot."""
+        entries = []
+        null_keys = []
+        for key, row in table.items():
+            value = row.get(name)
+            if value is None:
+                null_keys.append(key)
+            else:
+                entries.append((value, key))
+        entries.sort()
+        return cls(
+            table=table,
+            values=[value for value, _ in entries],
+            keys=[key for _, key in entries],
+            null_keys=null_keys,
+        )
+
+    def update(self, table: PMap[str, PMap[str, Any]], name: str, keys: Iterable[str]) -> SortedIndex:
+        """Return a copy of this index over the named field, for a new table snapshot differing at `keys`.
+
+        Each changed row costs a binary search, rather than re-sorting the
+        whole table. Raises `TypeError` if a new value can't be sorted.
+        """
+        values, index_keys, null_keys = list(self.values), list(self.keys), list(self.null_keys)
+        for key in keys:
+            old_row, new_row = self.table.get(key), table.get(key)
+            old_value = None if old_row is None else old_row.get(name)
+            new_value = None if new_row is None else new_row.get(name)
+            if old_row is not None and new_row is not None and old_value == new_value:
+                continue
+            if old_row is not None:
+                if old_value is None:
+                    null_keys.remove(key)
+                else:
+                    position = self._locate(values, index_keys, old_value, key)
+                    del values[position], index_keys[position]
+            if new_row is not None:
+                if new_value is None:
+                    null_keys.append(key)
+                else:
+                    position = self._locate(values, index_keys, new_value, key)
+                    values.insert(position, new_value)
+                    index_keys.insert(position, key)
+        return SortedIndex(table=table, values=values, keys=index_keys, null_keys=null_keys)
+
+    @staticmethod
+    def _locate(values: list[Any], keys: list[str], value: Any, key: str) -> int:
+        # Entries are sorted by value, then by key:
+        start = bisect_left(values, value)
+        return bisect_left(keys, key, start, bisect_right(values, value, start))
+
+    def narrow(self, operator: str | None, value: Any, start: int, stop: int) -> tuple[int, int]:
+        """Narrow the index positions `start:stop` to those matching the filter."""
+        match operator:
+            case "lt":
+                stop = min(stop, bisect_left(self.values, value))
+            case "lte":
+                stop = min(stop, bisect_right(self.values, value))
+            case "gt":
+                start = max(start, bisect_right(self.values, value))
+            case "gte":
+                start = max(start, bisect_left(self.values, value))
+            case "startswith":
+                start = max(start, bisect_left(self.values, value))
+                if value:
+                    # The first string that sorts after every string with this prefix:
+                    stop = min(stop, bisect_left(self.values, value[:-1] + chr(ord(value[-1]) + 1)))
+            case _:  # None, "eq"
+                start = max(start, bisect_left(self.values, value))
+                stop = min(stop, bisect_right(self.values, value))
+        return start, max(start, stop)
+
+    def walk(self, start: int, stop: int, ascending: bool = True, nulls: bool = True) -> Iterable[list[str]]:
+        """Yield groups of row keys with equal values from positions `start:stop`, in order.
+
+        If `nulls` is true, the keys for null values are included as a
+        first group when ascending, or a final group when descending.
+        """
+        values = self.values
+        if ascending:
+            if nulls and self.null_keys:
+                yield self.null_keys
+            while start < stop:
+                end = bisect_right(values, values[start], start, stop)
+                yield self.keys[start:end]
+                start = end
+        else:
+            while stop > start:
+                begin = bisect_left(values, values[stop - 1], start, stop)
+                yield self.keys[begin:stop]
+                stop = begin
+            if nulls and self.null_keys:
+                yield self.null_keys
 
 
 class Database:
@@ -150,6 +532,13 @@ class Database:
     """
 
     tables: PMap[str, PMap[str, PMap[str, Any]]] = freeze({})
+    indexes: PMap[str, PMap[str, PMap[Any, PSet[str]]]] = freeze({})
+    versions: PMap[str, int] = pmap()
+    changelog_path: PathLike | None = None
+    sorted_indexes: dict[str, set[str]] = {}
+    columnar_tables: set[str] = set()
+    _sorted_index_cache: dict[tuple[str, str], SortedIndex | None] = {}
+    _columnar_cache: dict[str, ColumnarSnapshot] = {}
 
     @classmethod
     def clear(cls) -> None:
@@ -160,6 +549,117 @@ class Database:
 
         """
         cls.tables = freeze({name: {} for name in AbstractInMemoryRepository._get_table_names()})
+        cls.indexes = freeze(
+            {
+                name: {field: {} for field in fields}
+                for name, fields in AbstractInMemoryRepository._get_indexed_fields("indexes").items()
+            }
+        )
+        cls.versions = pmap()
+        cls.changelog_path = None
+        cls.sorted_indexes = AbstractInMemoryRepository._get_indexed_fields("sorted_indexes")
+        cls.columnar_tables = AbstractInMemoryRepository._get_columnar_table_names()
+        cls._sorted_index_cache = {}
+        cls._columnar_cache = {}
+
+    @classmethod
+    def get_sorted_index(cls, table_name: str, name: str) -> SortedIndex | None:
+        """Return the sorted index over a field of the committed table.
+
+        Sorted indexes are built lazily from the committed table
+        snapshot, kept up to date by each commit (see
+        `update_sorted_indexes()`), and only rebuilt on first use after
+        the table is otherwise replaced. If the field's values can't be
+        sorted, return `None`.
+        """
+        table = cls.tables[table_name]
+        cache_key = (table_name, name)
+        try:
+            index = cls._sorted_index_cache[cache_key]
+        except KeyError:
+            pass
+        else:
+            if index is None or index.table is table:
+                return index
+        try:
+            index = SortedIndex.build(table, name)
+        except TypeError:
+            index = None
+        cls._sorted_index_cache[cache_key] = index
+        return index
+
+    @classmethod
+    def update_sorted_indexes(cls, table_name: str, table: PMap[str, PMap[str, Any]], keys: Iterable[str]) -> None:
+        """Update the sorted indexes built over a committed table, for a new snapshot differing at `keys`."""
+        keys = list(keys)
+        for (indexed_table_name, name), index in list(cls._sorted_index_cache.items()):
+            if indexed_table_name == table_name and index is not None and index.table is cls.tables[table_name]:
+                try:
+                    index = index.update(table, name, keys)
+                except TypeError:
+                    index = None
+                cls._sorted_index_cache[table_name, name] = index
+
+    @classmethod
+    def get_columnar_snapshot(cls, table_name: str) -> ColumnarSnapshot | None:
+        """Return the columnar snapshot of the committed table, if the table is columnar.
+
+        Like sorted indexes, snapshots are built lazily from the committed
+        table, and rebuilt on first use after the table changes.
+        """
+        if table_name not in cls.columnar_tables:
+            return None
+        from steerage.repositories.columns import ColumnarSnapshot
+
+        table = cls.tables[table_name]
+        snapshot = cls._columnar_cache.get(table_name)
+        if snapshot is None or snapshot.table is not table:
+            snapshot = cls._columnar_cache[table_name] = ColumnarSnapshot.build(table)
+        return snapshot
+
+    @classmethod
+    def dump(cls, path: PathLike) -> None:
+        """Write the committed tables to a snapshot file (see `steerage.repositories.snapshots`).
+
+        If a change log is being kept, it is emptied, as the snapshot
+        now includes its changes.
+        """
+        write_snapshot(path, cls.tables)
+        if cls.changelog_path is not None:
+            open(cls.changelog_path, "wb").close()
+
+    @classmethod
+    def load(cls, path: PathLike, changelog_path: PathLike | None = None) -> None:
+        """Replace the committed tables with those in a snapshot file.
+
+        Only the tables of registered repositories are decoded, and their
+        hash indexes are rebuilt. If a `changelog_path` is given, the
+        commits logged there since the snapshot are replayed, any torn
+        final record is cut off, and later commits are appended to it.
+        """
+        tables = cls.tables.evolver()
+        with SnapshotReader(path) as snapshot:
+            for name in snapshot.sections.keys() & cls.tables.keys():
+                tables[name] = snapshot.read_table(name)
+        if changelog_path is not None:
+            end = 0
+            for end, changes in read_changes(changelog_path):
+                for name, key, row in changes:
+                    tables[name] = tables[name].discard(key) if row is None else tables[name].set(key, row)
+            truncate_changes(changelog_path, end)
+
+        cls.tables = tables.persistent()
+        cls.indexes = freeze({name: _build_indexes(cls.tables[name], fields) for name, fields in cls.indexes.items()})
+        cls.versions = pmap({name: cls.versions.get(name, 0) + 1 for name in cls.tables})
+        cls.changelog_path = changelog_path
+
+
+def _build_indexes(table: PMap[str, PMap[str, Any]], fields: Iterable[str]) -> dict[str, dict[Any, set[str]]]:
+    indexes = {field: {} for field in fields}
+    for key, row in table.items():
+        for name, index in indexes.items():
+            index.setdefault(row.get(name), set()).add(key)
+    return indexes
 
 
 @dataclass(repr=False)
@@ -171,10 +671,27 @@ class AbstractInMemoryRepository(AbstractEntityRepository, metaclass=ABCPluginMo
     - `table_name` -- the namespace to store entities in
     - `entity_class` -- the concrete entity class that should be used to construct results
     - `query_class` -- the concrete query class that should be used to form queries
+
+    Subclasses may also define:
+
+    - `indexes` -- a tuple of field names to maintain hash indexes for,
+      so that equality and `isnull=True` filters on those fields don't
+      require scanning the whole table
+    - `sorted_indexes` -- a tuple of field names to keep sorted indexes
+      for, so that range and `startswith` filters on those fields are
+      binary searches, and ordering by them doesn't require a full sort
+    - `columnar` -- set to scan the table through a columnar snapshot,
+      so that filters and ordering are vectorized with NumPy (see
+      `steerage.repositories.columns`); best for large, read-mostly
+      tables, as the snapshot is rebuilt after every commit
     """
 
     session: InMemorySession = field(init=False, repr=False)
     table_name: ClassVar[str]
+    indexes: ClassVar[tuple[str, ...]] = ()
+    sorted_indexes: ClassVar[tuple[str, ...]] = ()
+    columnar: ClassVar[bool] = False
+    WriteConflict: ClassVar = WriteConflict
     session_class: ClassVar[Type[InMemorySession]] = InMemorySession
     query_class: ClassVar[Type[AbstractInMemoryQuery]]
     entity_class: ClassVar[Type[TEntity]]
@@ -184,6 +701,19 @@ class AbstractInMemoryRepository(AbstractEntityRepository, metaclass=ABCPluginMo
     def _get_table_names(cls) -> set[str]:
         return {plug.table_name for plug in cls.plugins}
 
+    @classmethod
+    def _get_columnar_table_names(cls) -> set[str]:
+        return {plug.table_name for plug in cls.plugins if plug.columnar}
+
+    @classmethod
+    def _get_indexed_fields(cls, kind: str) -> dict[str, set[str]]:
+        indexed_fields = {}
+        for plug in cls.plugins:
+            fields = getattr(plug, kind)
+            if fields:
+                indexed_fields.setdefault(plug.table_name, set()).update(fields)
+        return indexed_fields
+
 
 def get_memdb_test_repo_builder(repo_class: Type[AbstractInMemoryRepository]) -> Callable:
     """Return a repository builder for the given repo_class.
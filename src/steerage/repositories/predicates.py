@@ -0,0 +1,82 @@
+"""Composable filter predicates for repository queries
+
+Combine `Q` predicates with `&` (and), `|` (or) and `~` (not), and pass
+them to `AbstractBaseQuery.filter()`:
+
+    repo.objects.filter(Q(status="draft") | Q(author_id=me, status__ne="deleted"))
+
+Each backend evaluates the whole predicate in one go, e.g. as a single
+`WHERE` clause in SQL.
+"""
+from typing import Any, Iterator, Union
+
+AND = "and"
+OR = "or"
+
+Filter = tuple[str, Any, Any]
+
+
+class Q:
+    """A filter predicate: a tree of lookups joined by AND or OR, and optionally negated
+
+    Keyword arguments are lookups, as given to `filter()`, e.g.
+    `Q(num__gt=3)`. These, and any positional predicates, are ANDed.
+
+    Once passed through `filter()`, the lookups in a predicate are
+    resolved into `(key, operator, value)` filters.
+
+    Negation matches exactly the records that the predicate does not,
+    including those with null values.
+    """
+
+    __slots__ = ("children", "connector", "negated")
+
+    def __init__(self, *predicates: "Q", **lookups: Any):
+        self.children: tuple[Union["Q", tuple], ...] = predicates + tuple(lookups.items())
+        self.connector = AND
+        self.negated = False
+
+    @classmethod
+    def build(cls, children: tuple, connector: str = AND, negated: bool = False) -> "Q":
+        """Build a predicate directly from its children, connector and negation."""
+        predicate = cls()
+        predicate.children = children
+        predicate.connector = connector
+        predicate.negated = negated
+        return predicate
+
+    def filters(self) -> Iterator[Filter]:
+        """Iterate over the (resolved) filters of this predicate, depth first."""
+        for child in self.children:
+            if isinstance(child, Q):
+                yield from child.filters()
+            else:
+                yield child
+
+    def __and__(self, other: "Q") -> "Q":
+        if not isinstance(other, Q):
+            return NotImplemented
+        return Q.build((self, other), AND)
+
+    def __or__(self, other: "Q") -> "Q":
+        if not isinstance(other, Q):
+            return NotImplemented
+        return Q.build((self, other), OR)
+
+    def __invert__(self) -> "Q":
+        return Q.build(self.children, self.connector, not self.negated)
+
+    def _key(self) -> tuple:
+        return (self.children, self.connector, self.negated)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Q):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        children = f" {self.connector.upper()} ".join(map(repr, self.children))
+        return f"~Q({children})" if self.negated else f"Q({children})"
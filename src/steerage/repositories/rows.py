@@ -0,0 +1,239 @@
+"""Helpers for evaluating queries against rows held in Python
+
+These are shared by the backends that filter and sort records in
+process, rather than handing the query to a database server.
+"""
+import heapq
+import operator as op
+from typing import Any, Callable, Iterable, Mapping, Optional, Sequence
+
+from pyrsistent import pmap, pset, pvector, thaw
+
+from steerage.repositories.base import CMP_OPERATORS, OrderBy
+from steerage.repositories.predicates import AND, OR, Q
+
+MAX_TOP_K = 1000
+"""The largest `offset + limit` for which sorted rows are selected with a bounded heap"""
+
+
+PERSISTENT_TYPES = frozenset({type(pmap()), type(pset()), type(pvector())})
+
+
+def thaw_row(row: Mapping[str, Any]) -> dict[str, Any]:
+    """Convert a frozen row into a dict, thawing only the values that need it.
+
+    This is equivalent to `pyrsistent.thaw(row)` for a row of scalars
+    and persistent containers, but avoids a recursive call per value.
+    """
+    return {key: thaw(value) if type(value) in PERSISTENT_TYPES else value for key, value in row.items()}
+
+
+def project_row(row: Mapping[str, Any], fields: Sequence[str]) -> dict[str, Any]:
+    """Pick the given fields out of a frozen row into a dict, thawing only those values."""
+    out = {}
+    for key in fields:
+        value = row[key]
+        out[key] = thaw(value) if type(value) in PERSISTENT_TYPES else value
+    return out
+
+
+# Python expressions for the operators that have them, to inline into compiled filters:
+OPERATOR_EXPRESSIONS = {
+    None: "{row} == {value}",
+    "eq": "{row} == {value}",
+    "ne": "{row} != {value}",
+    "lt": "{row} < {value}",
+    "lte": "{row} <= {value}",
+    "gt": "{row} > {value}",
+    "gte": "{row} >= {value}",
+    "in": "{row} in {value}",
+    "isnull": "({row} is None) is {value}",
+}
+
+PREDICATE_CONNECTORS = {AND: " and ", OR: " or "}
+
+# Filters are tested cheapest and (typically) most selective first:
+OPERATOR_COSTS = {None: 0, "eq": 0, "in": 1, "isnull": 2, "lt": 3, "lte": 3, "gt": 3, "gte": 3, "ne": 5}
+DEFAULT_OPERATOR_COST = 4
+
+
+def filter_rows(
+    rows: Iterable[Mapping[str, Any]], filters: Sequence[tuple], predicates: Sequence[Q] = ()
+) -> Iterable[Mapping[str, Any]]:
+    """Lazily filter rows by the given `(key, operator, value)` filters, and `Q` predicates."""
+    if not (filters or predicates):
+        return rows
+    return filter(compile_filters(filters, predicates), rows)
+
+
+def compile_filters(filters: Sequence[tuple], predicates: Sequence[Q] = ()) -> Callable[[Mapping[str, Any]], bool]:
+    """Compile filters and predicates into a single function testing a row.
+
+    The filters are ANDed, and tested in order of `OPERATOR_COSTS`, then
+    the predicates. Comparisons are inlined into the function, e.g. the
+    filters `[("num", "gt", 3), ("foo", None, "bar")]` compile to the
+    equivalent of `lambda row: row["foo"] == "bar" and row["num"] > 3`.
+    """
+    compiler = _FilterCompiler()
+    terms = [compiler.filter(*filter) for filter in sorted(filters, key=_get_filter_cost)]
+    terms.extend(compiler.predicate(predicate) for predicate in predicates)
+    return eval(f"lambda row: {' and '.join(terms)}", compiler.namespace)
+
+
+def _get_filter_cost(filter: tuple) -> int:
+    return OPERATOR_COSTS.get(filter[1], DEFAULT_OPERATOR_COST)
+
+
+class _FilterCompiler:
+    # Renders filters as Python expressions, binding their values (and
+    # any operator functions) as names in `namespace`.
+
+    def __init__(self):
+        self.namespace = {}
+
+    def bind(self, value: Any) -> str:
+        name = f"_{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def filter(self, key: str, operator: Optional[str], value: Any) -> str:
+        if operator == "in":
+            try:
+                value = frozenset(value)
+            except TypeError:  # Unhashable values; test membership the slow way
+                pass
+        row = f"row[{key!r}]"
+        try:
+            expression = OPERATOR_EXPRESSIONS[operator]
+        except KeyError:
+            return f"{self.bind(CMP_OPERATORS[operator])}({row}, {self.bind(value)})"
+        return expression.format(row=row, value=self.bind(value))
+
+    def predicate(self, predicate: Q) -> str:
+        terms = [self.predicate(child) if isinstance(child, Q) else self.filter(*child) for child in predicate.children]
+        if terms:
+            expression = PREDICATE_CONNECTORS[predicate.connector].join(f"({term})" for term in terms)
+        else:  # As with `all()` and `any()`
+            expression = str(predicate.connector == AND)
+        return f"not ({expression})" if predicate.negated else f"({expression})"
+
+
+def rows_after(
+    rows: Iterable[Mapping[str, Any]], ordering: Sequence[OrderBy], keyset: Sequence[Any]
+) -> Iterable[Mapping[str, Any]]:
+    """Lazily filter rows to those that sort strictly after the given ordering key values.
+
+    Rows with null ordering keys are skipped, as are all rows if any
+    of the key values are null.
+    """
+    return (row for row in rows if _is_after(row, ordering, keyset))
+
+
+def _is_after(row: Mapping[str, Any], ordering: Sequence[OrderBy], keyset: Sequence[Any]) -> bool:
+    for (key, ascending), bound in zip(ordering, keyset):
+        value = row[key]
+        if value is None or bound is None:
+            return False
+        if value != bound:
+            return value > bound if ascending else value < bound
+    return False
+
+
+def sort_rows(
+    rows: Iterable[Mapping[str, Any]], ordering: Sequence[OrderBy], stop: Optional[int] = None
+) -> list[Mapping[str, Any]]:
+    """Sort rows by the given ordering keys.
+
+    Nulls sort before every other value, so they come first when
+    ascending, and last when descending, as in `AbstractBaseQuery.order_by()`.
+
+    If `stop` is given, only the first `stop` sorted rows are returned.
+    If that is no more than `MAX_TOP_K`, they are selected with a
+    bounded heap, rather than by sorting every row.
+    """
+    if stop is not None and stop <= MAX_TOP_K:
+        return top_rows(rows, ordering, stop)
+
+    # In memory multi-item sort with mixed ascending/descending! Let's go!
+    #
+    # Sort on each key, from back to front. This works because Python sort is stable.
+    # See https://stackoverflow.com/questions/11993004/
+    rows = list(rows)
+    for key, ascending in reversed(ordering):
+        rows = _sort_by(rows, key, ascending)
+    if stop is not None:
+        del rows[stop:]
+    return rows
+
+
+def _sort_by(rows: list[Mapping[str, Any]], key: str, ascending: bool) -> list[Mapping[str, Any]]:
+    get = op.itemgetter(key)
+    try:
+        return sorted(rows, key=get, reverse=not ascending)
+    except TypeError:  # Nulls can't be compared, so sort the other rows, and put the nulls before (or after) them
+        pass
+    nulls = [row for row in rows if get(row) is None]
+    values = sorted((row for row in rows if get(row) is not None), key=get, reverse=not ascending)
+    return nulls + values if ascending else values + nulls
+
+
+def top_rows(rows: Iterable[Mapping[str, Any]], ordering: Sequence[OrderBy], count: int) -> list[Mapping[str, Any]]:
+    """Return the first `count` rows by the given ordering keys, in order.
+
+    Like a (stable) sort, rows that tie keep their original order. The
+    rows are selected with a bounded heap on a single composite key, in
+    O(n log count), rather than O(n log n) for a full sort.
+    """
+    rows = list(rows)
+    reverse = not ordering[0].ascending
+    select = heapq.nlargest if reverse else heapq.nsmallest
+    # Try the cheapest keys first: reversing numbers by negating them,
+    # and leaving nulls be until one is compared with another value.
+    mixed = any(ascending == reverse for _, ascending in ordering)
+    attempts = [{"negate": True}, {}] if mixed else [{}]
+    for options in attempts:
+        try:
+            return select(count, rows, key=compile_sort_key(ordering, reverse, **options))
+        except TypeError:
+            pass
+    return select(count, rows, key=compile_sort_key(ordering, reverse, nulls=True))
+
+
+def compile_sort_key(
+    ordering: Sequence[OrderBy], reverse: bool = False, nulls: bool = False, negate: bool = False
+) -> Callable[[Mapping[str, Any]], tuple]:
+    """Compile ordering keys into a single function returning a row's composite sort key.
+
+    Keys sorting in the other direction from `reverse` are wrapped to
+    invert their order, so one heap or sort handles mixed directions,
+    e.g. the ordering `created_at, -num` compiles to the equivalent of
+    `lambda row: (row["created_at"], _Descending(row["num"]))`. With
+    `negate`, they're negated instead, which is faster, but only works
+    for numbers. With `nulls`, each value is paired with a flag to sort
+    nulls first.
+    """
+    terms = []
+    for key, ascending in ordering:
+        term = f"row[{key!r}]"
+        if nulls:
+            term = f"({term} is not None, {term})"
+        if ascending == reverse:
+            term = f"-{term}" if negate else f"_Descending({term})"
+        terms.append(term)
+    return eval(f"lambda row: ({', '.join(terms)},)", {"_Descending": _Descending})
+
+
+class _Descending:
+    # Wraps a value to sort in reverse order. Tuples compare their items
+    # with `==` until one differs, and then with `<`, as does `heapq`.
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __eq__(self, other: "_Descending") -> bool:
+        return self.value == other.value
+
+    def __lt__(self, other: "_Descending") -> bool:
+        return other.value < self.value
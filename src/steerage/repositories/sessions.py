@@ -1,10 +1,15 @@
 """Abstract session management for repositories"""
 from abc import ABC, abstractmethod
+from collections.abc import Mapping
 from dataclasses import dataclass, field
-from typing import ClassVar, Type
+from typing import Any, ClassVar, Optional, Type
+from uuid import UUID
 
 from convoke.configs import BaseConfig
 
+from steerage.repositories.loaders import BatchLoader
+from steerage.repositories.unitofwork import UnitOfWork
+
 
 @dataclass(repr=False)
 class AbstractSession(ABC):
@@ -21,10 +26,34 @@ class AbstractSession(ABC):
     - commit()
     - rollback()
 
+    Set `use_identity_map` to keep the entities loaded by primary key
+    during the session in `identity_map`, so that repeated lookups of
+    the same entity return it without another query.
+
+    Set `track_changes` to keep a snapshot of the stored data for each
+    entity loaded (or written) by primary key during the session, so
+    that updating the entity writes only the fields that have changed.
+
+    Set `buffer_writes` to queue entity writes made through the
+    repository in `unit_of_work`, rather than running them right away.
+    Queued writes to each entity are merged, and flushed in batches when
+    the session commits.
+
+    Set `batch_gets` to load entities requested by primary key in the
+    same turn of the event loop (e.g. by concurrent `get()` calls)
+    together, in one query, with the session's `loader`.
     """
 
     config: BaseConfig = field(init=False)
+    identity_map: dict[UUID, Any] = field(init=False, default_factory=dict)
+    snapshots: dict[UUID, Mapping[str, Any]] = field(init=False, default_factory=dict)
+    unit_of_work: UnitOfWork = field(init=False, default_factory=UnitOfWork)
+    loader: Optional[BatchLoader] = field(init=False, default=None)
     config_class: ClassVar[Type[BaseConfig]] = BaseConfig
+    use_identity_map: ClassVar[bool] = False
+    track_changes: ClassVar[bool] = False
+    buffer_writes: ClassVar[bool] = False
+    batch_gets: ClassVar[bool] = False
 
     def __post_init__(self):
         self.config = self.config_class()
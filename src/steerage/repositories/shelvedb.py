@@ -3,7 +3,6 @@
 This module is best used for early development when you don't want the
 hassle of a relational database yet.
 """
-import operator as op
 import os
 import shelve
 from collections.abc import Mapping
@@ -22,14 +21,14 @@ from typing import (
 import funcy as fn
 from convoke.configs import BaseConfig, env_field
 from convoke.plugins import ABCPluginMount
-from pyrsistent import discard, freeze, thaw
+from pyrsistent import discard, freeze
 from pyrsistent.typing import PMap, PSet
 
 from steerage.repositories.base import (
-    CMP_OPERATORS,
     AbstractBaseQuery,
     AbstractEntityRepository,
 )
+from steerage.repositories.rows import filter_rows, project_row, rows_after, sort_rows, thaw_row
 from steerage.repositories.sessions import AbstractSession
 from steerage.types import TEntity, UUIDorStr
 
@@ -107,14 +106,32 @@ class AbstractShelveQuery(AbstractBaseQuery):
         self.validate_constraints(key, data)
         self._upsert(key, data)
 
+    async def run_insert_many_query(self, data: list[Mapping]) -> None:
+        """Run a bulk insert query against the backend."""
+        keys = [self._get_key(item["id"]) for item in data]
+        self.validate_many_constraints(keys, data)
+        self._upsert_many(keys, data)
+
+    async def run_upsert_many_query(self, data: list[Mapping]) -> None:
+        """Run a bulk upsert query against the backend."""
+        self._upsert_many([self._get_key(item["id"]) for item in data], data)
+
     async def run_update_query(self, **kwargs) -> int:
-        """Run this as an update query against the backend."""
+        """Run this as an update query against the backend.
+
+        Only the given keys are changed in each matching record.
+        """
+        changes = freeze(kwargs)
+        staged = self.session.data.evolver()
         count = 0
-        async for entity in self:
-            new_entity = entity.model_copy(update=self.prepare_data_for_entity(kwargs))
-            key = self._get_key(new_entity.id)
-            self._upsert(key, new_entity.model_dump())
+        async for row in self.clone(projection=("id",)).run_selection_query():
+            key = self._get_key(row["id"])
+            if key in self.session.deleted_keys:
+                continue
+            record = staged[key] if key in staged else self.session.shelf[key]
+            staged[key] = record.update(changes)
             count += 1
+        self.session.data = staged.persistent()
         return count
 
     async def run_delete_query(self, **kwargs) -> int:
@@ -130,26 +147,24 @@ class AbstractShelveQuery(AbstractBaseQuery):
     async def run_selection_query(self) -> AsyncGenerator[Mapping, None]:
         """Run this selection query against the ShelveDB database.
 
-        NOTE: This query is *extremely* inefficient on large datasets, and
-        should only be used in development.
+        NOTE: Apart from filtering on `id` equality, which is a direct key
+        lookup, this query is *extremely* inefficient on large datasets,
+        and should only be used in development.
         """
-        table_key = f"{self.table_name}:"
-        rows = (row for key, row in self.session.shelf.items() if key.startswith(table_key))
+        ids, filters = self.split_primary_key_filter()
+        if ids is None:
+            table_key = f"{self.table_name}:"
+            rows = (row for key, row in self.session.shelf.items() if key.startswith(table_key))
+        else:
+            rows = (row for row in (self.session.shelf.get(self._get_key(id)) for id in ids) if row is not None)
 
-        for key, operator, value in self.filters:
-            op_fn = CMP_OPERATORS[operator]
-            rows = (row for row in rows if op_fn(getattr(row, key), value))
+        rows = filter_rows(rows, filters, self.predicates)
+        if self.keyset is not None:
+            rows = rows_after(rows, self.ordering, self.keyset)
 
         if self.ordering:
-            # In memory multi-item sort with mixed ascending/descending! Let's go!
-            #
-            # First, sort on the last key:
-            key, ascending = self.ordering[-1]
-            rows = sorted(rows, key=op.itemgetter(key), reverse=not ascending)
-            # Now, sort on preceding keys, from back to front. This works because Python sort is stable.
-            # See https://stackoverflow.com/questions/11993004/
-            for key, ascending in self.ordering[-2::-1]:  # <- reversed slice, penultimate through first
-                rows.sort(key=op.itemgetter(key), reverse=not ascending)
+            stop = None if self.limit is None else self.offset + self.limit
+            rows = sort_rows(rows, self.ordering, stop)
 
         if self.offset:
             rows = fn.drop(self.offset, rows)
@@ -157,8 +172,12 @@ class AbstractShelveQuery(AbstractBaseQuery):
         if self.limit is not None:
             rows = fn.take(self.limit, rows)
 
-        for row in rows:
-            yield thaw(row)
+        if self.projection is None:
+            for row in rows:
+                yield thaw_row(row)
+        else:
+            for row in rows:
+                yield project_row(row, self.projection)
 
     def validate_constraints(self, key: str, data: Mapping[str, Any]) -> None:
         """Template method: validate any invariant constraints for the dbm table.
@@ -168,6 +187,27 @@ class AbstractShelveQuery(AbstractBaseQuery):
         if key in self.session.shelf:
             raise self.AlreadyExists(data["id"])
 
+    def validate_many_constraints(self, keys: list[str], data: list[Mapping[str, Any]]) -> None:
+        """Validate invariant constraints for a batch of records.
+
+        Each record is checked with `validate_constraints()`, and the
+        batch is checked for duplicate primary keys. All conflicting
+        primary keys are reported together in a single `AlreadyExists`.
+        """
+        conflicts = []
+        seen = set()
+        for key, item in zip(keys, data):
+            try:
+                self.validate_constraints(key, item)
+            except self.AlreadyExists:
+                conflicts.append(item["id"])
+            else:
+                if key in seen:
+                    conflicts.append(item["id"])
+            seen.add(key)
+        if conflicts:
+            raise self.AlreadyExists(*conflicts)
+
     def _get_key(self, id: UUIDorStr) -> str:
         return f"{self.table_name}:{id}"
 
@@ -176,6 +216,13 @@ class AbstractShelveQuery(AbstractBaseQuery):
         self.session.data = self.session.data.set(key, data)
         self.session.deleted_keys = self.session.deleted_keys.discard(key)
 
+    def _upsert_many(self, keys: list[str], data: list[Mapping[str, Any]]) -> None:
+        staged = self.session.data.evolver()
+        for key, item in zip(keys, data):
+            staged[key] = freeze(item)
+        self.session.data = staged.persistent()
+        self.session.deleted_keys = self.session.deleted_keys - set(keys)
+
 
 @dataclass
 class AbstractShelveRepository(AbstractEntityRepository, metaclass=ABCPluginMount):
@@ -0,0 +1,173 @@
+"""On-disk snapshots of the in-memory database, for fast warm restarts
+
+A snapshot file holds each table in its own section, so that it can be
+memory-mapped and each table decoded only when it's read:
+
+- a header: `MAGIC`, the format version, and the number of tables
+- a directory: for each table, the length of its name, the offset and
+  length of its section, and the name itself
+- the sections: each table, pickled as a list of `(key, row)` pairs,
+  with the rows as plain dicts, which pickle faster than `PMap`s
+
+A change log is an append-only file of records, one per commit, each a
+pickled list of `(table_name, key, row)` changes, with `None` rows for
+deletions. Each change records the row's committed state, so replaying
+the log over a snapshot is idempotent. Each record is framed by its
+length and CRC-32 checksum (`FRAME`), so that a record torn by a crash
+part way through appending it can be told apart from a corrupt one.
+"""
+import mmap
+import os
+import pickle
+import struct
+import zlib
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+
+from pyrsistent import pmap
+from pyrsistent.typing import PMap
+
+MAGIC = b"STEERAGE"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sHI")
+ENTRY = struct.Struct("<HQQ")
+FRAME = struct.Struct("<II")
+
+PathLike = Union[str, os.PathLike]
+Change = tuple[str, str, Optional[PMap[str, Any]]]
+
+
+class SnapshotFormatError(ValueError):
+    """The file isn't a snapshot, or has an unsupported format version."""
+
+
+class CorruptChangeLogError(ValueError):
+    """A change log record, other than a torn final record, is corrupt."""
+
+
+def write_snapshot(path: PathLike, tables: Mapping[str, PMap[str, PMap[str, Any]]]) -> None:
+    """Write the tables to a snapshot file, atomically replacing any file already at `path`."""
+    names = [name.encode() for name in tables]
+    sections = [
+        pickle.dumps([(key, dict(row)) for key, row in table.items()], protocol=pickle.HIGHEST_PROTOCOL)
+        for table in tables.values()
+    ]
+
+    offset = HEADER.size + sum(ENTRY.size + len(name) for name in names)
+    directory = []
+    for name, section in zip(names, sections):
+        directory.append(ENTRY.pack(len(name), offset, len(section)) + name)
+        offset += len(section)
+
+    temp_path = Path(f"{path}.tmp")
+    with open(temp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(names)))
+        file.writelines(directory)
+        file.writelines(sections)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+class SnapshotReader:
+    """A memory-mapped snapshot file, decoding each table only as it's read
+
+    Use as a context manager, to unmap the file when done:
+
+        with SnapshotReader(path) as snapshot:
+            table = snapshot.read_table("entities")
+    """
+
+    def __init__(self, path: PathLike):
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size < HEADER.size:
+                raise SnapshotFormatError("%s is not a snapshot" % path)
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.sections = self._read_directory(path)
+        except Exception:
+            self.close()
+            raise
+
+    def _read_directory(self, path: PathLike) -> dict[str, tuple[int, int]]:
+        magic, version, count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise SnapshotFormatError("%s is not a snapshot" % path)
+        if version != FORMAT_VERSION:
+            raise SnapshotFormatError("%s has unsupported snapshot format version %d" % (path, version))
+        sections = {}
+        position = HEADER.size
+        for _ in range(count):
+            name_length, offset, length = ENTRY.unpack_from(self._mmap, position)
+            position += ENTRY.size
+            name = self._mmap[position : position + name_length].decode()
+            position += name_length
+            sections[name] = (offset, length)
+        return sections
+
+    def read_table(self, name: str) -> PMap[str, PMap[str, Any]]:
+        """Decode the named table."""
+        offset, length = self.sections[name]
+        with memoryview(self._mmap)[offset : offset + length] as section:
+            rows = pickle.loads(section)
+        return pmap({key: pmap(row) for key, row in rows})
+
+    def close(self) -> None:
+        """Unmap the file."""
+        self._mmap.close()
+
+    def __enter__(self) -> "SnapshotReader":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def append_changes(path: PathLike, changes: list[Change]) -> None:
+    """Append a commit's changes to the change log at `path`."""
+    record = pickle.dumps(changes, protocol=pickle.HIGHEST_PROTOCOL)
+    with open(path, "ab") as file:
+        file.write(FRAME.pack(len(record), zlib.crc32(record)) + record)
+
+
+def read_changes(path: PathLike) -> Iterator[tuple[int, list[Change]]]:
+    """Iterate over the commits recorded in the change log at `path`, if any.
+
+    Each commit's changes are paired with the offset just past its
+    record. A torn final record, from a crash part way through
+    appending it, is ignored: truncate the log to the offset of the
+    last whole record (see `truncate_changes()`) before appending to it
+    again, or later records will be unreadable behind the torn one.
+
+    Raises `CorruptChangeLogError` if any other record fails its
+    checksum, and any error unpickling a whole record.
+    """
+    try:
+        file = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with file:
+        size = os.fstat(file.fileno()).st_size
+        offset = 0
+        while len(header := file.read(FRAME.size)) == FRAME.size:
+            length, checksum = FRAME.unpack(header)
+            record = file.read(length)
+            end = offset + FRAME.size + length
+            if len(record) < length:
+                return  # A torn final record
+            if zlib.crc32(record) != checksum:
+                if end == size:
+                    return  # A torn final record
+                raise CorruptChangeLogError("%s has a corrupt record at offset %d" % (path, offset))
+            yield end, pickle.loads(record)
+            offset = end
+
+
+def truncate_changes(path: PathLike, offset: int) -> None:
+    """Cut the change log at `path` (if any) down to `offset` bytes, discarding any torn record past it."""
+    try:
+        if os.path.getsize(path) > offset:
+            os.truncate(path, offset)
+    except FileNotFoundError:
+        pass
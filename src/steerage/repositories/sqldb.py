@@ -15,16 +15,20 @@ Migrations should be handled by Alembic. You will find an example
 migration setup in `tb.sqldb`.
 
 """
-from collections.abc import Mapping
+import itertools
+import operator as op
+from collections import Counter, OrderedDict
+from collections.abc import Hashable, Mapping
 from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import TYPE_CHECKING, AsyncGenerator, ClassVar, Type, TypeVar
+from typing import TYPE_CHECKING, Any, AsyncGenerator, ClassVar, Iterator, Optional, Type, TypeVar
 
 import pytz
 import sqlalchemy as sa
 from convoke.configs import BaseConfig, env_field
 from convoke.plugins import ABCPluginMount
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
@@ -33,11 +37,13 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 
+from steerage.repositories.aggregates import Aggregate
 from steerage.repositories.base import (
     CMP_OPERATORS,
     AbstractBaseQuery,
     AbstractEntityRepository,
 )
+from steerage.repositories.predicates import AND, Q
 from steerage.repositories.sessions import AbstractSession
 from steerage.types import TEntity
 
@@ -140,6 +146,11 @@ class SQLSession(AbstractSession):
         await self._sa_session.rollback()
 
 
+def _binds_value(operator: str, value: Any) -> bool:
+    # `isnull` and `None` values render as `IS [NOT] NULL`, rather than as a bound parameter:
+    return operator != "isnull" and value is not None
+
+
 class AbstractSQLQuery(AbstractBaseQuery):
     """Abstract base class for implementing repository queries against the in-memory database.
 
@@ -148,6 +159,27 @@ class AbstractSQLQuery(AbstractBaseQuery):
 
     table: ClassVar[sa.Table]
 
+    # Stream selections from a server-side cursor, `fetch_size` rows at a
+    # time, rather than buffering them all. Queries run through
+    # `iterator(chunk_size=...)` always stream.
+    stream_results: ClassVar[bool] = False
+    fetch_size: ClassVar[int] = 1000
+    # Stay well under the bound parameter limits of the common databases (e.g. 999 for older SQLite):
+    max_in_size: ClassVar[Optional[int]] = 500
+
+    # Statements built for each shape of query, shared by all SQL query
+    # classes, and kept to at most `statement_cache_size` entries:
+    statement_cache_size: ClassVar[int] = 500
+    _statement_cache: ClassVar[OrderedDict[tuple, sa.Executable]] = OrderedDict()
+
+    def projection_is_valid(self, key: str) -> bool:
+        """Validate the given projection field.
+
+        Projected fields are selected as table columns, so an entity
+        field stored in a differently named column can't be projected.
+        """
+        return super().projection_is_valid(key) and key in self.table.c
+
     async def run_insert_query(self, data: Mapping) -> None:  # pragma: nocover
         """Run an insert query against the backend."""
         try:
@@ -155,28 +187,79 @@ class AbstractSQLQuery(AbstractBaseQuery):
         except IntegrityError as exc:
             raise self.AlreadyExists from exc
 
+    async def run_insert_many_query(self, data: list[Mapping]) -> None:
+        """Run a bulk insert query against the backend.
+
+        All records are sent in a single `executemany` round trip,
+        wrapped in a savepoint so that a failed batch leaves no partial
+        inserts behind (and leaves the transaction usable).
+        """
+        try:
+            async with self.session._sa_session.begin_nested():
+                await self._execute_sql(sa.insert(self.table), data)
+        except IntegrityError as exc:
+            raise self.AlreadyExists(*(await self._get_conflicting_ids(data))) from exc
+
+    async def run_upsert_many_query(self, data: list[Mapping]) -> None:
+        """Run a bulk upsert query against the backend.
+
+        This compiles to a dialect-specific `INSERT ... ON CONFLICT DO
+        UPDATE`, sent in a single `executemany` round trip.
+        """
+        match self.session._sa_session.bind.dialect.name:
+            case "postgresql":  # pragma: nocover
+                sa_query = postgresql.insert(self.table)
+            case "sqlite":
+                sa_query = sqlite.insert(self.table)
+            case dialect:  # pragma: nocover
+                raise NotImplementedError(f"Upsert is not supported for the {dialect} dialect")
+
+        primary_key = [column.name for column in self.table.primary_key]
+        sa_query = sa_query.on_conflict_do_update(
+            index_elements=primary_key,
+            set_={key: sa_query.excluded[key] for key in data[0] if key not in primary_key},
+        )
+        await self._execute_sql(sa_query, data)
+
+    async def _get_conflicting_ids(self, data: list[Mapping]) -> list:
+        ids = [item["id"] for item in data]
+        duplicates = {id for id, count in Counter(ids).items() if count > 1}
+        stored = await self._execute_sql(sa.select(self.table.c.id).where(self.table.c.id.in_(ids)))
+        return list(duplicates) + [id for id in stored.scalars() if id not in duplicates]
+
     async def run_update_query(self, **kwargs) -> int:
         """Run this as an update query against the backend."""
-        sa_query = sa.update(self.table)
-        sa_query = await self._build_sa_query(sa_query)
-        sa_query = sa_query.values(**kwargs)
+        sa_query = self._get_statement("update", *kwargs)
+        params = self._get_params() | {f"value_{key}": value for key, value in kwargs.items()}
 
-        return (await self._execute_sql(sa_query)).rowcount
+        return (await self._execute_sql(sa_query, params)).rowcount
 
     async def run_delete_query(self, **kwargs) -> int:
         """Run this as a deletion query against the backend."""
-        sa_query = sa.delete(self.table)
-        sa_query = await self._build_sa_query(sa_query)
+        sa_query = self._get_statement("delete")
 
-        return (await self._execute_sql(sa_query)).rowcount
+        return (await self._execute_sql(sa_query, self._get_params())).rowcount
 
     async def run_selection_query(self) -> AsyncGenerator[TEntity, None]:
         """Run this query against a relational database."""
-        sa_query = sa.select(self.table)
-        sa_query = await self._build_sa_query(sa_query)
-
-        for row in await self._execute_sql(sa_query):
-            yield row._asdict()
+        sa_query = self._get_statement("select")
+        params = self._get_params()
+
+        if not (self.stream_results or self.chunk_size):
+            for row in await self._execute_sql(sa_query, params):
+                yield row._asdict()
+            return
+
+        # Fetch rows from a server-side cursor, a partition at a time,
+        # rather than buffering the whole result set on the client:
+        sa_query = sa_query.execution_options(yield_per=self.chunk_size or self.fetch_size)
+        result = await self.session._sa_session.stream(sa_query, params)
+        try:
+            async for partition in result.partitions():
+                for row in partition:
+                    yield row._asdict()
+        finally:
+            await result.close()
 
     async def run_count(self) -> int:
         """Run a (potentially) simplified query to count results.
@@ -186,36 +269,118 @@ class AbstractSQLQuery(AbstractBaseQuery):
         subclass to implement something more efficient for the
         backend.
         """
-        sa_query = sa.select(sa.func.count()).select_from(self.table)
-        sa_query = await self._build_sa_query(sa_query)
+        sa_query = self._get_statement("count")
 
-        result = await self._execute_sql(sa_query)
+        result = await self._execute_sql(sa_query, self._get_params())
         return result.scalar()
 
+    async def run_aggregate_query(self, aggregates: dict[str, Aggregate]) -> list[dict[str, Any]]:
+        """Run an aggregate query (with `GROUP BY`, if grouped) against a relational database."""
+        sa_query = self._get_statement("aggregate", *aggregates.items())
+
+        result = await self._execute_sql(sa_query, self._get_params())
+        return [row._asdict() for row in result]
+
+    async def run_exists(self) -> bool:
+        """Run a `SELECT 1 ... LIMIT 1` query to check for any results."""
+        sa_query = self._get_statement("exists")
+
+        result = await self._execute_sql(sa_query, self._get_params())
+        return result.first() is not None
+
     async def _execute_sql(self, *args, **kwargs):
         return await self.session._sa_session.execute(*args, **kwargs)
 
-    async def _build_sa_query(self, sa_query):
-        if self.filters:
-            filters = []
-            for key, operator, value in self.filters:
-                column = getattr(self.table.c, key)
-                match operator:
-                    case "startswith":
-                        filters.append(column.startswith(value))
-                    case "endswith":
-                        filters.append(column.endswith(value))
-                    case "isnull":
-                        if value is True:
-                            filters.append(column == sa.null())
-                        else:
-                            filters.append(column != sa.null())
-                    case _:
-                        # NOTE: any remaining operators *must* be compatible
-                        # with Column object comparisons, e.g. `op.eq(column, value)`
-                        # being the same as `column == value`:
-                        filters.append(CMP_OPERATORS[operator](column, value))
-            sa_query = sa_query.where(*filters)
+    def _get_statement(self, kind: str, *value_keys: Hashable) -> sa.Executable:
+        """Return the statement for this query, building it only once for each shape of query.
+
+        Filter, keyset, offset and limit values are left as bound
+        parameters (see `_get_params()`), so that queries differing
+        only in their values share the same statement, and SQLAlchemy's
+        compiled form of it.
+        """
+        shape = (
+            type(self),
+            kind,
+            value_keys,
+            self.projection,
+            tuple(self._get_filter_shape(*filter) for filter in self.filters),
+            tuple(self._get_predicate_shape(predicate) for predicate in self.predicates),
+            tuple(self.ordering),
+            self.grouping,
+            self.keyset is not None,
+            bool(self.offset),
+            self.limit is not None,
+        )
+        cache = AbstractSQLQuery._statement_cache
+        try:
+            cache.move_to_end(shape)
+            return cache[shape]
+        except KeyError:
+            pass
+        statement = cache[shape] = self._build_statement(kind, value_keys)
+        if len(cache) > self.statement_cache_size:
+            cache.popitem(last=False)
+        return statement
+
+    def _get_params(self) -> dict[str, Any]:
+        params = {
+            f"filter_{index}": value
+            for index, (_, operator, value) in enumerate(self.filters)
+            if _binds_value(operator, value)
+        }
+        params.update(
+            (f"predicate_{index}", value)
+            for index, (_, operator, value) in enumerate(self._get_predicate_filters())
+            if _binds_value(operator, value)
+        )
+        if self.keyset is not None:
+            params.update((f"keyset_{index}", value) for index, value in enumerate(self.keyset))
+        if self.offset:
+            params["offset"] = self.offset
+        if self.limit is not None:
+            params["limit"] = self.limit
+        return params
+
+    @staticmethod
+    def _get_filter_shape(key: str, operator: str, value) -> tuple:
+        # Values that change the form of the clause (e.g. `IS NULL`) are part of its shape:
+        return (key, operator) if _binds_value(operator, value) else (key, operator, value)
+
+    def _get_predicate_shape(self, predicate: Q) -> tuple:
+        children = tuple(
+            self._get_predicate_shape(child) if isinstance(child, Q) else self._get_filter_shape(*child)
+            for child in predicate.children
+        )
+        return (predicate.connector, predicate.negated, children)
+
+    def _get_predicate_filters(self) -> Iterator[tuple]:
+        # The filters of all predicates, in the order their parameters are numbered:
+        for predicate in self.predicates:
+            yield from predicate.filters()
+
+    def _build_statement(self, kind: str, value_keys: tuple) -> sa.Executable:
+        match kind:
+            case "aggregate":
+                return self._build_aggregate_statement(value_keys)
+            case "select" if self.projection is None:
+                sa_query = sa.select(self.table)
+            case "select":
+                sa_query = sa.select(*(self.table.c[key] for key in self.projection))
+            case "count":
+                sa_query = sa.select(sa.func.count()).select_from(self.table)
+            case "exists":
+                sa_query = sa.select(sa.literal_column("1")).select_from(self.table)
+            case "update":
+                sa_query = sa.update(self.table).values(
+                    {key: sa.bindparam(f"value_{key}", type_=self.table.c[key].type) for key in value_keys}
+                )
+            case _:  # "delete"
+                sa_query = sa.delete(self.table)
+        return self._build_sa_query(sa_query)
+
+    def _build_sa_query(self, sa_query):
+        sa_query = self._build_where_clause(sa_query)
 
         if self.ordering:
             ordering = []
@@ -228,13 +393,107 @@ class AbstractSQLQuery(AbstractBaseQuery):
             sa_query = sa_query.order_by(*ordering)
 
         if self.offset:
-            sa_query = sa_query.offset(self.offset)
+            sa_query = sa_query.offset(sa.bindparam("offset", type_=sa.Integer))
+
+        if self.limit is not None:
+            sa_query = sa_query.limit(sa.bindparam("limit", type_=sa.Integer))
+
+        return sa_query
 
-        if self.limit:
-            sa_query = sa_query.limit(self.limit)
+    def _build_where_clause(self, sa_query):
+        if self.filters:
+            sa_query = sa_query.where(
+                *(self._build_filter_clause(f"filter_{index}", *filter) for index, filter in enumerate(self.filters))
+            )
+
+        if self.predicates:
+            params = (f"predicate_{index}" for index in itertools.count())
+            sa_query = sa_query.where(
+                *(self._build_predicate_clause(predicate, params) for predicate in self.predicates)
+            )
+
+        if self.keyset is not None:
+            sa_query = sa_query.where(self._build_keyset_clause())
 
         return sa_query
 
+    def _build_predicate_clause(self, predicate: Q, params: Iterator[str]):
+        clauses = [
+            self._build_predicate_clause(child, params)
+            if isinstance(child, Q)
+            else self._build_filter_clause(next(params), *child)
+            for child in predicate.children
+        ]
+        if predicate.connector == AND:
+            clause = sa.and_(sa.true(), *clauses)
+        else:
+            clause = sa.or_(sa.false(), *clauses)
+        if predicate.negated:
+            # Match exactly what the predicate doesn't, including where it is NULL (i.e. unknown):
+            return clause.is_not(sa.true())
+        return clause
+
+    def _build_aggregate_statement(self, aggregates: tuple[tuple[str, Aggregate], ...]) -> sa.Select:
+        if self.offset or self.limit is not None:
+            # Aggregate over the slice of records selected:
+            source = self._build_statement("select", ()).subquery()
+        else:
+            source = self.table
+        groups = [source.c[key] for key in self.grouping]
+        columns = [
+            getattr(sa.func, aggregate.function)(*([] if aggregate.key is None else [source.c[aggregate.key]])).label(
+                name
+            )
+            for name, aggregate in aggregates
+        ]
+        sa_query = sa.select(*groups, *columns)
+        if source is self.table:
+            sa_query = self._build_where_clause(sa_query.select_from(self.table))
+        if groups:
+            sa_query = sa_query.group_by(*groups).order_by(*(column.asc().nulls_first() for column in groups))
+        return sa_query
+
+    def _build_filter_clause(self, param: str, key: str, operator: str, value):
+        column = getattr(self.table.c, key)
+        if _binds_value(operator, value):
+            value = sa.bindparam(param, type_=column.type, expanding=operator == "in")
+        match operator:
+            case "startswith":
+                return column.startswith(value)
+            case "endswith":
+                return column.endswith(value)
+            case "isnull":
+                if value is True:
+                    return column == sa.null()
+                else:
+                    return column != sa.null()
+            case "in":
+                return column.in_(value)
+            case _:
+                # NOTE: any remaining operators *must* be compatible
+                # with Column object comparisons, e.g. `op.eq(column, value)`
+                # being the same as `column == value`:
+                return CMP_OPERATORS[operator](column, value)
+
+    def _build_keyset_clause(self):
+        """Compile the keyset cursor into a row-value comparison against the ordering columns."""
+        columns = [getattr(self.table.c, key) for key, _ in self.ordering]
+        bounds = [sa.bindparam(f"keyset_{index}", type_=column.type) for index, column in enumerate(columns)]
+        directions = {ascending for _, ascending in self.ordering}
+        if len(directions) == 1:
+            # e.g. `(created_at, id) < (:created_at, :id)`, which can seek a composite index:
+            compare = op.gt if directions.pop() else op.lt
+            return compare(sa.tuple_(*columns), sa.tuple_(*bounds))
+
+        # Mixed directions can't be compared as a single row value, so expand the comparison, e.g.
+        # `created_at < :created_at OR (created_at = :created_at AND id > :id)`:
+        clauses = []
+        for index, (_, ascending) in enumerate(self.ordering):
+            compare = op.gt if ascending else op.lt
+            ties = [column == bound for column, bound in zip(columns[:index], bounds[:index])]
+            clauses.append(sa.and_(*ties, compare(columns[index], bounds[index])))
+        return sa.or_(*clauses)
+
 
 @dataclass
 class AbstractSQLRepository(AbstractEntityRepository, metaclass=ABCPluginMount):
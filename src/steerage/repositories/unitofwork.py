@@ -0,0 +1,112 @@
+"""Write buffering for repository sessions
+
+A `UnitOfWork` queues a session's entity writes, rather than running
+them right away, merging the writes to each entity as they come in, so
+that only the net change is written when the session is flushed.
+"""
+from collections import defaultdict
+from typing import Any, Iterable, Optional
+from uuid import UUID
+
+from steerage.exceptions import AlreadyExists, NotFound
+
+INSERT = "insert"
+UPSERT = "upsert"
+UPDATE = "update"
+UPDATE_ATTRS = "update_attrs"
+DELETE = "delete"
+
+PendingWrite = tuple[str, Any]
+
+
+class UnitOfWork:
+    """Pending entity writes, merged by primary key
+
+    Each pending write is a tuple of `(operation, value)`, where the
+    value is the entity for inserts, upserts and updates, the
+    attributes for `update_attrs`, and `None` for deletes.
+    """
+
+    def __init__(self):
+        self.pending: dict[UUID, PendingWrite] = {}
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def get(self, id: UUID) -> Optional[PendingWrite]:
+        """Return the pending write for the given primary key, if any."""
+        return self.pending.get(id)
+
+    def add(self, id: UUID, operation: str, value: Any = None) -> None:
+        """Queue a write, merging it with any write already pending for the primary key.
+
+        Raises `AlreadyExists` when inserting an entity with a pending
+        write, and `NotFound` when updating an entity pending deletion.
+        """
+        self.add_many([(id, value)], operation)
+
+    def add_many(self, items: Iterable[tuple[UUID, Any]], operation: str) -> None:
+        """Queue the same kind of write for several primary keys.
+
+        If any of the writes can't be merged, none of them are queued.
+        Conflicting inserts are reported together, with the conflicting
+        primary keys as the arguments of `AlreadyExists`.
+        """
+        merged = {}
+        conflicts = []
+        for id, value in items:
+            try:
+                merged[id] = merge_writes(merged.get(id, self.pending.get(id)), operation, value)
+            except AlreadyExists:
+                conflicts.append(id)
+        if conflicts:
+            raise AlreadyExists(*conflicts)
+        for id, write in merged.items():
+            if write is None:
+                self.pending.pop(id, None)
+            else:
+                self.pending[id] = write
+
+    def take(self) -> dict[str, list[tuple[UUID, Any]]]:
+        """Remove and return all pending writes, grouped by operation in the order they were first queued."""
+        batches = defaultdict(list)
+        for id, (operation, value) in self.pending.items():
+            batches[operation].append((id, value))
+        self.pending = {}
+        return batches
+
+    def clear(self) -> None:
+        """Forget all pending writes."""
+        self.pending = {}
+
+
+def merge_writes(previous: Optional[PendingWrite], operation: str, value: Any) -> Optional[PendingWrite]:
+    """Merge a write into the write already pending for an entity.
+
+    Returns the net write, or `None` if the writes cancel out (an insert
+    followed by a delete).
+    """
+    if previous is None:
+        return operation, value
+    previous_operation, previous_value = previous
+    match operation:
+        case "insert":
+            if previous_operation != DELETE:
+                raise AlreadyExists()
+            return UPSERT, value
+        case "delete":
+            return None if previous_operation == INSERT else (DELETE, None)
+        case _ if previous_operation == DELETE:
+            if operation == UPSERT:
+                return UPSERT, value
+            raise NotFound()
+        case "update_attrs":
+            if previous_operation == UPDATE_ATTRS:
+                return UPDATE_ATTRS, previous_value | value
+            return previous_operation, previous_value.model_copy(update=value, deep=True)
+        case "upsert" if previous_operation != INSERT:
+            return UPSERT, value
+        case _:  # An update or upsert replaces the pending entity, and keeps an insert an insert
+            if previous_operation == UPDATE_ATTRS:
+                return operation, value
+            return previous_operation, value
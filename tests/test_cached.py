@@ -0,0 +1,92 @@
+# ruff: noqa: D100, D101, D102, D103
+import sys
+
+import pytest
+from pydantic import BaseModel
+
+from steerage.repositories.cached import MISSING, RepositoryCache, estimate_size
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def test_it_should_evict_the_least_recently_used_entries():
+    cache = RepositoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, MISSING, 3)
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.evictions) == (3, 1, 1)
+
+
+def test_it_should_expire_entries(clock):
+    cache = RepositoryCache(ttl=10, clock=clock)
+    cache.set("a", 1)
+    clock.now = 9
+    assert cache.get("a") == 1
+    clock.now = 10
+
+    assert cache.get("a", None) is None
+    assert len(cache) == 0
+    assert cache.stats.expirations == 1
+
+
+def test_it_should_keep_to_a_memory_budget():
+    cache = RepositoryCache(max_bytes=100, sizeof=len)
+    cache.set("a", "x" * 40)
+    cache.set("b", "x" * 40)
+    cache.set("a", "x" * 50)
+    assert cache.total_bytes == 90
+    cache.set("c", "x" * 40)
+    cache.set("d", "x" * 101)
+
+    assert list(cache._entries) == ["a", "c"]
+    assert cache.total_bytes == 90
+    assert cache.stats.evictions == 1
+
+
+def test_it_should_invalidate_entries():
+    cache = RepositoryCache()
+    for key in ("a", "b", ("c", 1)):
+        cache.set(key, 1)
+    version = cache.version
+
+    cache.invalidate(["a", "z"])
+    assert "a" not in cache
+    cache.invalidate_where(lambda key: isinstance(key, tuple))
+    assert list(cache._entries) == ["b"]
+    cache.clear()
+    assert len(cache) == 0 and cache.total_bytes == 0
+    assert cache.stats.invalidations == 3
+
+    # Values read before an invalidation are stale:
+    cache.set("a", 1, version)
+    assert "a" not in cache
+    cache.set("a", 1, cache.version)
+    assert "a" in cache
+
+
+class Model(BaseModel):
+    name: str
+    tags: list[str]
+
+
+def test_it_should_estimate_the_size_of_nested_values():
+    model = Model(name="foo", tags=["bar", "baz"])
+
+    assert estimate_size(model) > sys.getsizeof(model) + estimate_size(["bar", "baz"])
+    assert estimate_size({"a": (1, None)}) > sys.getsizeof({"a": (1, None)})
+    assert estimate_size(Model) == sys.getsizeof(Model)
@@ -0,0 +1,159 @@
+# ruff: noqa: D100, D101, D102, D103
+from datetime import datetime, timezone
+
+import pytest
+from pyrsistent import freeze
+
+from steerage.repositories.base import OrderBy
+
+np = pytest.importorskip("numpy")
+
+from steerage.repositories.columns import Column, ColumnarSnapshot  # noqa: E402
+
+NAIVE = datetime(2024, 1, 1)
+AWARE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "values, kind",
+    [
+        ([True, None, False], bool),
+        ([1, None, 3], int),
+        ([1.5, 2, None], float),
+        (["a", None], str),
+        ([NAIVE, None], datetime),
+        ([AWARE, None], datetime),
+    ],
+)
+def test_it_should_build_a_column(values, kind):
+    column = Column.build(values)
+
+    assert column.kind is kind
+    assert column.nulls.tolist() == [value is None for value in values]
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [],
+        [None],
+        [1, "a"],
+        [{"a": 1}],
+        [NAIVE, AWARE],
+        [2**63],
+    ],
+)
+def test_it_should_not_build_a_column_of_mixed_or_unsupported_values(values):
+    assert Column.build(values) is None
+
+
+@pytest.mark.parametrize(
+    "operator, value, expected",
+    [
+        (None, 2, [False, True, False, False]),
+        ("eq", None, [False, False, True, False]),
+        ("ne", 2, [True, False, True, True]),
+        ("ne", None, [True, True, False, True]),
+        ("lt", 3, [True, True, False, False]),
+        ("lte", 3, [True, True, False, True]),
+        ("gt", 1, [False, True, False, True]),
+        ("gte", 2.5, [False, False, False, True]),
+        ("lt", 1.5, [True, False, False, False]),
+        ("in", (1, 3), [True, False, False, True]),
+        ("in", (3, None), [False, False, True, True]),
+        ("isnull", True, [False, False, True, False]),
+        ("isnull", False, [True, True, False, True]),
+    ],
+)
+def test_it_should_mask_matching_values(operator, value, expected):
+    column = Column.build([1, 2, None, 3])
+
+    assert column.mask(operator, value).tolist() == expected
+
+
+@pytest.mark.parametrize(
+    "operator, value, expected",
+    [
+        ("startswith", "ba", [True, True, False, False]),
+        ("endswith", "r", [True, False, False, False]),
+    ],
+)
+def test_it_should_mask_matching_strings(operator, value, expected):
+    column = Column.build(["bar", "baz", "foo", None])
+
+    assert column.mask(operator, value).tolist() == expected
+
+
+def test_it_should_hold_strings_as_objects():
+    column = Column.build(["a" * 1000, "b", None])
+
+    assert column.values.dtype == object
+    assert column.mask("lt", "b").tolist() == [True, False, False]
+    assert column.mask("in", ("b",)).tolist() == [False, True, False]
+    assert np.argsort(column.rank(True), kind="stable").tolist() == [2, 0, 1]
+
+
+def test_it_should_mask_datetimes():
+    column = Column.build([AWARE, None, AWARE.replace(year=2025)])
+
+    assert column.mask("gt", AWARE).tolist() == [False, False, True]
+
+
+@pytest.mark.parametrize(
+    "values, operator, value",
+    [
+        ([1, 2], "lt", "3"),
+        ([1.5, 2.5], "eq", "3"),
+        ([NAIVE], "lt", AWARE),
+        ([1, 2], "startswith", 1),
+        ([1, 2], "isnull", "yes"),
+        (["a"], "contains", "a"),
+    ],
+)
+def test_it_should_fail_to_vectorize(values, operator, value):
+    column = Column.build(values)
+
+    with pytest.raises(TypeError):
+        column.mask(operator, value)
+
+
+def test_it_should_rank_values_with_nulls_first_ascending():
+    column = Column.build([3, None, 1, 3])
+
+    assert np.argsort(column.rank(True), kind="stable").tolist() == [1, 2, 0, 3]
+    assert np.argsort(column.rank(False), kind="stable").tolist() == [0, 3, 2, 1]
+
+
+class TestColumnarSnapshot:
+    @pytest.fixture
+    def snapshot(self):
+        rows = [
+            {"num": 2, "foo": "b", "sub": {"bar": 1}},
+            {"num": 1, "foo": "a", "sub": {"bar": 2}},
+            {"num": 2, "foo": "a", "sub": None},
+            {"num": None, "foo": "c", "sub": {"bar": 1}},
+        ]
+        return ColumnarSnapshot.build(freeze({str(i): row for i, row in enumerate(rows)}))
+
+    def test_it_should_select_rows_in_order(self, snapshot):
+        positions, remaining, ordered = snapshot.select(
+            [("foo", "ne", "c")], [OrderBy("num", False), OrderBy("foo", True)]
+        )
+
+        assert [(snapshot.rows[i]["num"], snapshot.rows[i]["foo"]) for i in positions] == [(2, "a"), (2, "b"), (1, "a")]
+        assert remaining == []
+        assert ordered
+
+    def test_it_should_leave_unvectorizable_filters(self, snapshot):
+        filters = [("sub", None, {"bar": 1}), ("num", "lt", "2"), ("num", "gt", 1)]
+
+        positions, remaining, ordered = snapshot.select(filters, [OrderBy("sub", True)])
+
+        assert sorted(snapshot.rows[i]["foo"] for i in positions) == ["a", "b"]
+        assert remaining == filters[:2]
+        assert not ordered
+
+    def test_it_should_build_columns_once(self, snapshot):
+        assert snapshot.column("num") is snapshot.column("num")
+        assert snapshot.column("sub") is None
+        assert "sub" in snapshot.columns
@@ -0,0 +1,39 @@
+# ruff: noqa: D100, D101, D102, D103
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+
+from steerage.repositories.cursors import decode_cursor, encode_cursor
+
+
+def test_it_should_round_trip_cursor_values():
+    values = (
+        None,
+        True,
+        3,
+        1.5,
+        "foo",
+        UUID("dbe2dff9-122e-4718-924f-710073c33b53"),
+        datetime(2023, 12, 15, 12, 0, tzinfo=timezone.utc),
+        date(2023, 12, 15),
+        time(12, 30),
+        timedelta(hours=1),
+        Decimal("1.10"),
+    )
+    token = encode_cursor(values)
+
+    assert decode_cursor(token) == values
+    assert token.isascii() and "=" not in token
+
+
+def test_it_should_fail_to_encode_an_unsupported_value():
+    with pytest.raises(TypeError):
+        encode_cursor([object()])
+
+
+@pytest.mark.parametrize("token", ["!!!", "bm90IGpzb24", "W3siZm9vIjoxfV0", "eyJmb28iOjF9"])
+def test_it_should_fail_to_decode_a_malformed_cursor(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
@@ -0,0 +1,61 @@
+# ruff: noqa: D100, D101, D102, D103
+import asyncio
+
+import pytest
+
+from steerage.repositories.loaders import BatchLoader
+
+
+class Loads:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def __call__(self, keys):
+        self.batches.append(keys)
+        if self.fail:
+            raise RuntimeError("Boom")
+        return {key: key * 10 for key in keys if key > 0}
+
+
+async def test_it_should_batch_concurrent_loads():
+    load_many = Loads()
+    loader = BatchLoader(load_many)
+
+    results = await asyncio.gather(loader.load(1), loader.load(2), loader.load(1))
+    assert results == [10, 20, 10]
+    assert await loader.load(3) == 30
+
+    assert load_many.batches == [[1, 2], [3]]
+
+
+async def test_it_should_fail_to_load_missing_keys():
+    loader = BatchLoader(Loads())
+
+    results = await asyncio.gather(loader.load(1), loader.load(-1), return_exceptions=True)
+
+    assert results[0] == 10
+    assert isinstance(results[1], KeyError)
+
+
+async def test_it_should_fail_every_load_in_a_failed_batch():
+    loader = BatchLoader(Loads(fail=True))
+
+    results = await asyncio.gather(loader.load(1), loader.load(2), return_exceptions=True)
+
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+
+
+@pytest.mark.parametrize("fail", [False, True])
+async def test_it_should_skip_cancelled_loads(fail):
+    load_many = Loads(fail=fail)
+    loader = BatchLoader(load_many)
+
+    cancelled = asyncio.ensure_future(loader.load(1))
+    loaded = asyncio.ensure_future(loader.load(2))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await asyncio.gather(cancelled, loaded, return_exceptions=True)
+
+    assert load_many.batches == [[1, 2]]
+    assert cancelled.cancelled()
@@ -0,0 +1,46 @@
+# ruff: noqa: D100, D101, D102, D103
+import pytest
+
+from steerage.repositories.predicates import AND, OR, Q
+
+
+def test_it_should_and_lookups_and_predicates():
+    inner = Q(num=1)
+    predicate = Q(inner, foo="bar", num__gt=0)
+
+    assert predicate.children == (inner, ("foo", "bar"), ("num__gt", 0))
+    assert predicate.connector == AND
+    assert not predicate.negated
+
+
+def test_it_should_combine_predicates():
+    first, second = Q(num=1), Q(num=2)
+
+    assert (first & second) == Q.build((first, second), AND)
+    assert (first | second) == Q.build((first, second), OR)
+    assert ~(first | second) == Q.build((first, second), OR, negated=True)
+    assert ~~first == first
+    assert first != second
+    assert first != ("num", 1)
+
+
+def test_it_should_hash_equal_predicates_equally():
+    assert hash(Q(num=1) | Q(num=2)) == hash(Q(num=1) | Q(num=2))
+    assert len({Q(num=1), Q(num=1), Q(num=2)}) == 2
+
+
+def test_it_should_not_combine_with_other_types():
+    with pytest.raises(TypeError):
+        Q(num=1) & ("num", 2)
+    with pytest.raises(TypeError):
+        Q(num=1) | ("num", 2)
+
+
+def test_it_should_iterate_over_filters_depth_first():
+    predicate = Q.build((("a", None, 1), Q.build((("b", "lt", 2), ("c", None, 3)), OR), ("d", None, 4)))
+
+    assert list(predicate.filters()) == [("a", None, 1), ("b", "lt", 2), ("c", None, 3), ("d", None, 4)]
+
+
+def test_it_should_repr():
+    assert repr(~(Q(num=1) | Q(foo="bar"))) == "~Q(Q(('num', 1)) OR Q(('foo', 'bar')))"
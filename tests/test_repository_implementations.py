@@ -1,4 +1,6 @@
 # ruff: noqa: D100, D101, D102, D103
+import asyncio
+from collections import OrderedDict
 from collections.abc import Mapping
 from datetime import datetime, timedelta
 from typing import Any
@@ -14,13 +16,17 @@ from faker import Faker
 from pydantic import BaseModel, ConfigDict, Field
 from pydantic.types import AwareDatetime
 
+from steerage.repositories.aggregates import Avg, Count, Max, Min, Sum
 from steerage.repositories.base import AbstractEntityRepository, AbstractBaseQuery
+from steerage.repositories.cached import CachedRepository, RepositoryCache
 from steerage.repositories.memdb import (
     AbstractInMemoryQuery,
     AbstractInMemoryRepository,
+    SortedIndex,
 )
 from steerage.repositories.memdb import Database as InMemoryDatabase
 from steerage.repositories.memdb import get_memdb_test_repo_builder
+from steerage.repositories.predicates import OR, Q
 from steerage.repositories.shelvedb import (
     AbstractShelveQuery,
     AbstractShelveRepository,
@@ -92,6 +98,31 @@ class InMemoryEntityRepository(AbstractInMemoryRepository):
     table_name: str = "entities"
     entity_class = Entity
     query_class = InMemoryEntityQuery
+    indexes = ("foo", "is_odd", "oddish")
+    sorted_indexes = ("num", "foo", "oddish", "created_at", "sub")
+
+
+class UnindexedInMemoryEntityQuery(InMemoryEntityQuery):
+    table_name: str = "unindexed_entities"
+
+
+class UnindexedInMemoryEntityRepository(InMemoryEntityRepository):
+    table_name: str = "unindexed_entities"
+    query_class = UnindexedInMemoryEntityQuery
+    indexes = ()
+    sorted_indexes = ()
+
+
+class ColumnarInMemoryEntityQuery(InMemoryEntityQuery):
+    table_name: str = "columnar_entities"
+
+
+class ColumnarInMemoryEntityRepository(InMemoryEntityRepository):
+    table_name: str = "columnar_entities"
+    query_class = ColumnarInMemoryEntityQuery
+    indexes = ()
+    sorted_indexes = ()
+    columnar = True
 
 
 class ShelveEntityQuery(AbstractEntityQuery, AbstractShelveQuery):
@@ -131,9 +162,17 @@ class SQLEntityQuery(AbstractEntityQuery, AbstractSQLQuery):
             data["sub_bar"] = sub_bar["bar"]
         return data
 
+    def transform_attrs_to_data(self, attrs: Mapping[str, Any]) -> dict[str, Any]:
+        data = super().transform_attrs_to_data(attrs)
+        if "sub" in data:
+            sub = data.pop("sub")
+            data["sub_bar"] = None if sub is None else sub["bar"]
+        return data
+
     def prepare_data_for_entity(self, data: Mapping) -> Mapping:
-        sub_bar = data.pop("sub_bar")
-        data["sub"] = {"bar": sub_bar}
+        if "sub_bar" in data:
+            sub_bar = data.pop("sub_bar")
+            data["sub"] = {"bar": sub_bar}
         return super().prepare_data_for_entity(data)
 
 
@@ -147,6 +186,8 @@ class SQLEntityRepository(AbstractSQLRepository):
 
 REPO_FACTORIES = [
     get_memdb_test_repo_builder(InMemoryEntityRepository),
+    get_memdb_test_repo_builder(UnindexedInMemoryEntityRepository),
+    get_memdb_test_repo_builder(ColumnarInMemoryEntityRepository),
     get_shelvedb_test_repo_builder(ShelveEntityRepository),
     get_sqldb_test_repo_builder(SQLEntityRepository),
 ]
@@ -208,6 +249,77 @@ class TestEntityRepositoryImplementations:
             with pytest.raises(repo.AlreadyExists):
                 await repo.insert(stored_entity)
 
+    async def test_it_should_insert_many_entities(self, repo: AbstractEntityRepository, entities: list[Entity]):
+        async with repo:
+            await repo.insert_many(entities)
+            await repo.commit()
+
+        async with repo:
+            results = await repo.objects.order_by("num").as_list()
+
+        assert results == entities
+
+    async def test_it_should_happily_insert_no_entities(self, repo: AbstractEntityRepository):
+        async with repo:
+            await repo.insert_many([])
+            await repo.commit()
+
+        async with repo:
+            assert await repo.objects.count() == 0
+
+    async def test_it_should_fail_to_insert_many_with_stored_ids(
+        self, repo: AbstractEntityRepository, stored_entity: Entity, entities: list[Entity]
+    ):
+        async with repo:
+            with pytest.raises(repo.AlreadyExists) as exc_info:
+                await repo.insert_many(entities)
+
+        assert exc_info.value.args == (stored_entity.id,)
+
+    async def test_it_should_fail_to_insert_many_with_duplicate_ids(
+        self, repo: AbstractEntityRepository, entities: list[Entity]
+    ):
+        async with repo:
+            with pytest.raises(repo.AlreadyExists) as exc_info:
+                await repo.insert_many(entities + [entities[2]])
+
+        assert exc_info.value.args == (entities[2].id,)
+
+    async def test_it_should_upsert_a_new_entity(self, repo: AbstractEntityRepository, entity: Entity):
+        async with repo:
+            await repo.upsert(entity)
+            await repo.commit()
+
+        async with repo:
+            result = await repo.get(entity.id)
+
+        assert result == entity
+
+    async def test_it_should_upsert_a_stored_entity(self, repo: AbstractEntityRepository, stored_entity: Entity):
+        entity = stored_entity.model_copy(update={"foo": "blah"})
+        async with repo:
+            await repo.upsert(entity)
+            await repo.commit()
+
+        async with repo:
+            result = await repo.get(stored_entity.id)
+
+        assert result == entity
+
+    async def test_it_should_upsert_many_entities(
+        self, repo: AbstractEntityRepository, stored_entity: Entity, entities: list[Entity]
+    ):
+        entities[0] = stored_entity.model_copy(update={"foo": "blah"})
+        async with repo:
+            await repo.upsert_many(entities)
+            await repo.upsert_many([])
+            await repo.commit()
+
+        async with repo:
+            results = await repo.objects.order_by("num").as_list()
+
+        assert results == entities
+
     async def test_it_should_delete_an_entity(self, repo: AbstractEntityRepository, stored_entity: Entity):
         async with repo:
             await repo.delete(stored_entity.id)
@@ -254,6 +366,140 @@ class TestEntityRepositoryImplementations:
 
         assert result.foo == "blah"
 
+    @pytest.fixture
+    def updates(self, repo, monkeypatch):
+        calls = []
+        update = repo.query_class.update
+
+        async def spy(query, **kwargs):
+            calls.append(kwargs)
+            return await update(query, **kwargs)
+
+        monkeypatch.setattr(repo.query_class, "update", spy)
+        return calls
+
+    async def test_it_should_update_entity_attrs_in_a_single_query(
+        self, repo: AbstractEntityRepository, stored_entity: Entity, identity_map: list, updates: list
+    ):
+        async with repo:
+            await repo.update_attrs(stored_entity.id, foo="blah", sub=SubEntity(bar="banana"))
+            await repo.commit()
+
+        async with repo:
+            result = await repo.get(stored_entity.id)
+
+        assert (result.foo, result.sub) == ("blah", SubEntity(bar="banana"))
+        assert identity_map == [{"id": stored_entity.id}]
+        assert len(updates) == 1
+
+    async def test_it_should_fail_to_update_attrs_of_a_nonexistent_entity(
+        self, repo: AbstractEntityRepository, entity: Entity
+    ):
+        async with repo:
+            with pytest.raises(repo.NotFound):
+                await repo.update_attrs(entity.id, foo="blah")
+
+    @pytest.mark.parametrize("attrs", [{}, {"not_a_field": "blah"}])
+    async def test_it_should_update_no_entity_attrs(
+        self, repo: AbstractEntityRepository, stored_entity: Entity, updates: list, attrs: dict
+    ):
+        async with repo:
+            await repo.update_attrs(stored_entity.id, **attrs)
+            with pytest.raises(repo.NotFound):
+                await repo.update_attrs(EntityFactory.build().id, **attrs)
+            await repo.commit()
+
+        async with repo:
+            assert await repo.get(stored_entity.id) == stored_entity
+        assert updates == []
+
+    async def test_it_should_only_update_changed_fields(
+        self, repo: AbstractEntityRepository, stored_entity: Entity, updates: list, monkeypatch
+    ):
+        monkeypatch.setattr(repo.session_class, "track_changes", True)
+        async with repo:
+            entity = await repo.get(stored_entity.id)
+            entity = entity.model_copy(update={"foo": "blah", "num": 42})
+            await repo.update(entity)
+            # Nothing has changed since the last update:
+            assert await repo.update(entity) == 1
+            await repo.commit()
+
+        async with repo:
+            assert await repo.get(stored_entity.id) == entity
+            await repo.rollback()
+            assert repo.session.snapshots == {}
+
+        assert updates == [{"foo": "blah", "num": 42}]
+
+    @pytest.fixture
+    def buffered(self, repo, monkeypatch):
+        monkeypatch.setattr(repo.session_class, "buffer_writes", True)
+
+    async def test_it_should_buffer_writes_until_commit(
+        self, repo: AbstractEntityRepository, stored_entities: list[Entity], buffered, updates: list
+    ):
+        first, second, third, fourth, fifth, sixth = stored_entities
+        new, newer, newest = EntityFactory.build_batch(3)
+        async with repo:
+            await repo.insert(new)
+            await repo.update_attrs(new.id, foo="blah")
+            await repo.insert_many([newer, newest])
+            await repo.delete(newest.id)
+            assert await repo.update(first.model_copy(update={"foo": "first"})) == 1
+            await repo.update_attrs(first.id, num=10)
+            await repo.update_attrs(second.id, num=20)
+            await repo.update_attrs(second.id, foo="second")
+            await repo.delete(third.id)
+            await repo.insert(third)
+            await repo.upsert(fourth.model_copy(update={"foo": "fourth"}))
+            await repo.delete(fifth.id)
+
+            # Nothing has been written, but reads see the buffered writes:
+            assert updates == []
+            assert await repo.objects.count() == 6
+            assert (await repo.get(new.id)).foo == "blah"
+            assert (await repo.get(second.id)).foo == "second"
+            with pytest.raises(repo.NotFound):
+                await repo.get(fifth.id)
+            await repo.commit()
+
+        async with repo:
+            result = await repo.objects.order_by("num").as_list()
+
+        assert result == [
+            third,
+            fourth.model_copy(update={"foo": "fourth"}),
+            sixth,
+            new.model_copy(update={"foo": "blah"}),
+            newer,
+            first.model_copy(update={"foo": "first", "num": 10}),
+            second.model_copy(update={"foo": "second", "num": 20}),
+        ]
+        assert len(updates) == 2
+
+    async def test_it_should_flush_buffered_writes(
+        self, repo: AbstractEntityRepository, stored_entities: list[Entity], buffered
+    ):
+        async with repo:
+            await repo.update_attrs(stored_entities[0].id, foo="blah")
+            await repo.flush()
+            assert len(repo.session.unit_of_work) == 0
+            await repo.insert(stored_entities[1])
+            with pytest.raises(repo.AlreadyExists):
+                await repo.commit()
+
+    async def test_it_should_roll_back_buffered_writes(
+        self, repo: AbstractEntityRepository, stored_entities: list[Entity], buffered
+    ):
+        async with repo:
+            await repo.delete(stored_entities[0].id)
+            await repo.rollback()
+            assert len(repo.session.unit_of_work) == 0
+
+        async with repo:
+            assert await repo.objects.count() == 6
+
     async def test_it_should_happily_delete_a_nonexistent_entity(self, repo: AbstractEntityRepository, faker: Faker):
         async with repo:
             await repo.delete(faker.uuid4())  # this is a no-op
@@ -272,6 +518,213 @@ class TestEntityRepositoryImplementations:
             with pytest.raises(repo.NotFound):
                 await repo.get(entity.id)
 
+    @pytest.fixture
+    def identity_map(self, repo, monkeypatch):
+        monkeypatch.setattr(repo.session_class, "use_identity_map", True)
+        calls = []
+        get = repo.query_class.get
+
+        async def spy(query, **kwargs):
+            calls.append(kwargs)
+            return await get(query, **kwargs)
+
+        monkeypatch.setattr(repo.query_class, "get", spy)
+        return calls
+
+    async def test_it_should_get_entities_from_the_identity_map(
+        self, repo: AbstractEntityRepository, stored_entity: Entity, identity_map: list
+    ):
+        entity = EntityFactory.build()
+        async with repo:
+            result = await repo.get(stored_entity.id)
+            assert await repo.get(str(stored_entity.id)) is result
+            await repo.insert(entity)
+            assert await repo.get(entity.id) is entity
+
+        assert identity_map == [{"id": stored_entity.id}]
+
+    async def test_it_should_keep_the_identity_map_in_sync_with_writes(
+        self, repo: AbstractEntityRepository, stored_entities: list[Entity], identity_map: list
+    ):
+        first, second, third, *_ = stored_entities
+        async with repo:
+            cached = repo.session.identity_map
+            await repo.get(first.id)
+            await repo.update_attrs(first.id, foo="blah")
+            assert first.id not in cached
+
+            await repo.get(second.id)
+            await repo.delete(second.id)
+            assert second.id not in cached
+
+            await repo.get(third.id)
+            await repo.objects.filter(num__gte=2).update(num=99)
+            assert cached == {}
+
+            await repo.upsert_many([first, third])
+            assert cached == {first.id: first, third.id: third}
+            await repo.objects.upsert(first)
+            assert cached == {third.id: third}
+
+            await repo.rollback()
+            assert cached == {}
+
+        assert identity_map == [{"id": first.id}, {"id": second.id}, {"id": third.id}]
+
+    async def test_it_should_not_use_the_identity_map_by_default(
+        self, repo: AbstractEntityRepository, stored_entity: Entity
+    ):
+        async with repo:
+            await repo.get(stored_entity.id)
+            assert repo.session.identity_map == {}
+
+    async def test_it_should_batch_concurrent_gets(
+        self, repo: AbstractEntityRepository, stored_entities: list[Entity], identity_map: list, monkeypatch
+    ):
+        monkeypatch.setattr(repo.session_class, "batch_gets", True)
+        first, second, third, *_ = stored_entities
+        missing = EntityFactory.build()
+        async with repo:
+            results = await asyncio.gather(
+                repo.get(first.id),
+                repo.get(str(second.id)),
+                repo.get(first.id),
+                repo.get(missing.id),
+                return_exceptions=True,
+            )
+            assert await repo.get(third.id) == third
+            assert repo.session.identity_map.keys() == {first.id, second.id, third.id}
+
+        assert results[:3] == [first, second, first]
+        assert isinstance(results[3], repo.NotFound)
+        # Loaded in batches, rather than one at a time:
+        assert identity_map == []
+
+    async def test_it_should_get_many_entities(
+        self, repo: AbstractEntityRepository, stored_entities: list[Entity], monkeypatch
+    ):
+        monkeypatch.setattr(repo.query_class, "max_in_size", 2)
+        first, second, third, *_ = stored_entities
+        missing = EntityFactory.build()
+        async with repo:
+            result = await repo.get_many([third.id, str(first.id), missing.id, third.id, second.id])
+            assert await repo.get_many([]) == {}
+
+        assert result == {third.id: third, first.id: first, second.id: second}
+        assert list(result) == [third.id, first.id, second.id]
+
+    async def test_it_should_get_many_entities_with_buffered_writes(
+        self, repo: AbstractEntityRepository, stored_entities: list[Entity], buffered, identity_map: list
+    ):
+        first, second, third, fourth, *_ = stored_entities
+        new = EntityFactory.build()
+        async with repo:
+            await repo.get(fourth.id)
+            await repo.insert(new)
+            await repo.update_attrs(first.id, foo="blah")
+            await repo.delete(second.id)
+            result = await repo.get_many([new.id, first.id, second.id, third.id, fourth.id])
+            assert repo.session.identity_map.keys() == {first.id, third.id, fourth.id}
+
+        assert result == {
+            new.id: new,
+            first.id: first.model_copy(update={"foo": "blah"}),
+            third.id: third,
+            fourth.id: fourth,
+        }
+        assert identity_map == [{"id": fourth.id}]
+
+
+class TestCachedRepository:
+    @pytest.fixture
+    def cached(self, repo):
+        return CachedRepository(repo, RepositoryCache())
+
+    async def test_it_should_get_entities_through_the_cache(self, cached, stored_entities):
+        async with cached:
+            assert await cached.get(stored_entities[0].id) == stored_entities[0]
+        async with cached:
+            assert await cached.get(str(stored_entities[0].id)) == stored_entities[0]
+            with pytest.raises(cached.NotFound):
+                await cached.get(EntityFactory.build().id)
+
+        assert (cached.stats.hits, cached.stats.misses) == (1, 2)
+
+    async def test_it_should_get_many_entities_through_the_cache(self, cached, stored_entities):
+        first, second, third, *_ = stored_entities
+        missing = EntityFactory.build()
+        async with cached:
+            assert await cached.get_many([first.id, second.id]) == {first.id: first, second.id: second}
+        async with cached:
+            result = await cached.get_many([third.id, missing.id, first.id])
+            assert result == {third.id: third, first.id: first}
+            await cached.update_attrs(second.id, foo="blah")
+            # Changes made in this session bypass the cache:
+            assert await cached.get_many([first.id]) == {first.id: first}
+
+        assert (cached.stats.hits, cached.stats.misses) == (1, 4)
+
+    async def test_it_should_list_queries_through_the_cache(self, cached, stored_entities):
+        async with cached:
+            assert await cached.as_list(cached.objects.filter(is_odd=True).order_by("num")) == stored_entities[1::2]
+        async with cached:
+            result = await cached.as_list(cached.objects.filter(is_odd=True).order_by("num"))
+            assert result == stored_entities[1::2]
+
+        assert (cached.stats.hits, cached.stats.misses) == (1, 1)
+
+    async def test_it_should_keep_the_cache_on_a_commit_without_writes(self, cached, stored_entities):
+        async with cached:
+            await cached.get(stored_entities[0].id)
+            await cached.commit()
+            assert await cached.get(stored_entities[0].id) == stored_entities[0]
+
+        assert (cached.stats.hits, cached.stats.misses) == (1, 1)
+
+    async def test_it_should_invalidate_written_entities_on_commit(self, cached, stored_entities):
+        first, second, third, fourth, fifth, sixth = stored_entities
+        async with cached:
+            for entity in stored_entities:
+                await cached.get(entity.id)
+            await cached.as_list(cached.objects.order_by("num"))
+
+        new_entity = EntityFactory.build()
+        async with cached:
+            await cached.update_attrs(first.id, foo="blah")
+            await cached.update(second.model_copy(update={"foo": "bleh"}))
+            await cached.delete(third.id)
+            await cached.insert(new_entity)
+            await cached.insert_many([])
+            await cached.upsert(fourth)
+            await cached.upsert_many([fifth])
+            # Changes made in this session bypass the cache:
+            await cached.get(first.id)
+            await cached.as_list(cached.objects.order_by("num"))
+            assert cached.stats.hits == 0
+            await cached.commit()
+
+        assert len(cached.cache) == 1
+        async with cached:
+            assert (await cached.get(first.id)).foo == "blah"
+            assert (await cached.get(second.id)).foo == "bleh"
+            with pytest.raises(cached.NotFound):
+                await cached.get(third.id)
+            assert await cached.get(sixth.id) == sixth
+            result = await cached.as_list(cached.objects.order_by("num"))
+
+        assert result[-1] == new_entity
+
+    async def test_it_should_forget_changes_on_rollback(self, cached, stored_entities):
+        async with cached:
+            await cached.get(stored_entities[0].id)
+            await cached.delete(stored_entities[0].id)
+            await cached.rollback()
+            assert cached.dirty_ids == set()
+        async with cached:
+            assert await cached.get(stored_entities[0].id) == stored_entities[0]
+            cached.invalidate()
+            assert len(cached.cache) == 0
+
 
 class TestConcreteBaseQueryImplementations:
     """Test the concrete AbstractBaseQuery implementations thoroughly.
@@ -301,6 +754,11 @@ class TestConcreteBaseQueryImplementations:
 
         assert all([r.foo == "bar" for r in results])
 
+    async def test_it_should_not_update_entities_deleted_in_the_session(self, repo, stored_entities):
+        async with repo:
+            await repo.delete(stored_entities[0].id)
+            assert await repo.objects.update(foo="blah") == 5
+
     async def test_it_should_delete_entities(self, repo, stored_entities):
         async with repo:
             result = await repo.objects.filter(id=stored_entities[0].id).delete()
@@ -312,6 +770,141 @@ class TestConcreteBaseQueryImplementations:
             results = await repo.objects.all().as_list()
             assert set(results) == set(stored_entities)
 
+    async def test_it_should_filter_entities_by_multiple_filters(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.filter(num__gte=1, num__lt=3, foo__endswith="2")
+
+            assert await aset(query) == {stored_entities[2]}
+
+    async def test_it_should_filter_entities_by_id_and_value(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.filter(foo="baz1", id=stored_entities[1].id)
+            assert await alist(query) == [stored_entities[1]]
+
+            query = repo.objects.filter(foo="baz1", id__eq=stored_entities[2].id)
+            assert await alist(query) == []
+
+    async def test_it_should_filter_entities_in(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.filter(num__in=[1, 3, 99])
+            assert await aset(query) == {stored_entities[1], stored_entities[3]}
+
+            query = repo.objects.filter(foo__in=("baz1", "bar2"), is_odd=True)
+            assert await aset(query) == {stored_entities[1]}
+
+            query = repo.objects.filter(id__in=[stored_entities[0].id, stored_entities[5].id], num__gt=0)
+            assert await aset(query) == {stored_entities[5]}
+
+            query = repo.objects.filter(foo__in=[])
+            assert await alist(query) == []
+
+    async def test_it_should_aggregate_results(self, repo, stored_entities):
+        async with repo:
+            result = await repo.objects.aggregate(
+                total=Sum("num"),
+                lowest=Min("num"),
+                highest=Max("num"),
+                mean=Avg("num"),
+                count=Count(),
+                odd=Count("oddish"),
+            )
+            assert result == {"total": 15, "lowest": 0, "highest": 5, "mean": 2.5, "count": 6, "odd": 3}
+
+            query = repo.objects.filter(num__gt=1).order_by("num").slice(0, 3)
+            assert await query.aggregate(total=Sum("num")) == {"total": 9}
+
+            query = repo.objects.filter(num__gt=5)
+            assert await query.aggregate(total=Sum("num"), mean=Avg("num"), count=Count()) == {
+                "total": None,
+                "mean": None,
+                "count": 0,
+            }
+
+    async def test_it_should_aggregate_grouped_results(self, repo, stored_entities):
+        async with repo:
+            result = await repo.objects.group_by("oddish").aggregate(total=Sum("num"), count=Count())
+            assert result == [{"oddish": None, "total": 6, "count": 3}, {"oddish": True, "total": 9, "count": 3}]
+
+            result = await repo.objects.filter(num__lt=4).group_by("is_odd", "foo").aggregate(highest=Max("num"))
+            assert result == [
+                {"is_odd": False, "foo": "bar0", "highest": 0},
+                {"is_odd": False, "foo": "bar2", "highest": 2},
+                {"is_odd": True, "foo": "baz1", "highest": 1},
+                {"is_odd": True, "foo": "baz3", "highest": 3},
+            ]
+
+            assert await repo.objects.filter(num__gt=5).group_by("is_odd").aggregate(count=Count()) == []
+
+    async def test_it_should_check_whether_results_exist(self, repo, stored_entities):
+        async with repo:
+            assert await repo.objects.filter(num__gte=5).exists() is True
+            assert await repo.objects.filter(num__gt=5).exists() is False
+            assert await repo.objects.order_by("num").slice(5).exists() is True
+            assert await repo.objects.order_by("num").slice(6).exists() is False
+            assert await repo.objects.slice(0, 0).exists() is False
+
+            query = repo.objects.filter(is_odd=True)
+            await query.as_list()
+            assert await query.exists() is True
+            query = repo.objects.filter(num__gt=5)
+            assert await query.count() == 0
+            assert await query.exists() is False
+
+    async def test_it_should_limit_the_results_selected_for_first_and_get(self, repo, stored_entities, monkeypatch):
+        limits = []
+        run_selection_query = repo.query_class.run_selection_query
+
+        def spy(query):
+            limits.append(query.limit)
+            return run_selection_query(query)
+
+        monkeypatch.setattr(repo.query_class, "run_selection_query", spy)
+        async with repo:
+            assert await repo.objects.order_by("-num").first() == stored_entities[-1]
+            assert await repo.objects.order_by("num").slice(0, 0).first() is None
+            assert await repo.objects.get(foo="baz1") == stored_entities[1]
+            with pytest.raises(repo.MultipleResultsFound):
+                await repo.objects.get(is_odd=True)
+
+        assert limits == [1, 0, 2, 2]
+
+    async def test_it_should_filter_entities_by_predicates(self, repo, stored_entities):
+        def nums(entities):
+            return sorted(entity.num for entity in entities)
+
+        async with repo:
+            query = repo.objects.filter(Q(foo="bar0") | Q(num__gte=4, is_odd=True))
+            assert nums(await query.as_list()) == [0, 5]
+
+            query = repo.objects.filter(~(Q(num__lt=2) | Q(num__gt=3)), is_odd=False)
+            assert nums(await query.as_list()) == [2]
+
+            query = repo.objects.filter(Q(num=1) | Q(id__in=[stored_entities[3].id]), Q(is_odd=True))
+            assert nums(await query.as_list()) == [1, 3]
+
+            query = repo.objects.filter(Q(Q(num=1) | Q(num=2), is_odd=False))
+            assert nums(await query.as_list()) == [2]
+
+            assert await repo.objects.filter(Q(num=1) | Q(num=2)).count() == 2
+
+    async def test_it_should_negate_predicates_over_null_values(self, repo, stored_entities):
+        def nums(entities):
+            return sorted(entity.num for entity in entities)
+
+        async with repo:
+            assert nums(await repo.objects.filter(~Q(oddish=True)).as_list()) == [0, 2, 4]
+            assert nums(await repo.objects.filter(~Q(oddish=None)).as_list()) == [1, 3, 5]
+            assert nums(await repo.objects.filter(~Q(oddish__isnull=True, num__gt=1)).as_list()) == [0, 1, 3, 5]
+
+    async def test_it_should_filter_entities_by_empty_predicates(self, repo, stored_entities):
+        async with repo:
+            assert await repo.objects.filter(~Q()).count() == 0
+            assert await repo.objects.filter(Q.build((), OR) | Q(num=1)).count() == 1
+            assert await repo.objects.filter(Q.build((), OR) | Q()).count() == 6
+            assert await repo.objects.filter(Q(num=1) | Q(Q(), Q())).count() == 6
+            assert await repo.objects.filter(~Q(Q(), Q())).count() == 0
+            assert await repo.objects.filter(Q(num=1) | ~Q(Q(), Q())).count() == 1
+
     async def test_it_should_count_results_for_uncached_query(self, repo, stored_entities):
         async with repo:
             query = repo.objects.all()
@@ -438,6 +1031,137 @@ class TestConcreteBaseQueryImplementations:
             # Should cache:
             assert await alist(query) == expected
 
+    async def test_it_should_get_a_slice_ordered_by_mixed_ascending_descending(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.order_by("is_odd", "-num").slice(1, 4)
+            expected = [
+                stored_entities[2],
+                stored_entities[0],
+                stored_entities[5],
+            ]
+            assert await alist(query) == expected
+
+    @pytest.mark.parametrize(
+        "ordering, expected",
+        [
+            (("oddish", "num"), [0, 2, 4, 1, 3, 5]),
+            (("-oddish", "num"), [1, 3, 5, 0, 2, 4]),
+            (("-oddish", "-num"), [5, 3, 1, 4, 2, 0]),
+        ],
+    )
+    async def test_it_should_order_nulls_first_ascending_and_last_descending(
+        self, repo, stored_entities, ordering, expected
+    ):
+        expected = [stored_entities[index] for index in expected]
+        async with repo:
+            assert await alist(repo.objects.order_by(*ordering)) == expected
+            assert await alist(repo.objects.order_by(*ordering).slice(1, 4)) == expected[1:4]
+
+    async def test_it_should_get_values(self, repo, stored_entities):
+        async with repo:
+            result = await repo.objects.filter(num__lt=2).order_by("num").values("foo", "num").as_list()
+
+        assert result == [{"foo": "bar0", "num": 0}, {"foo": "baz1", "num": 1}]
+
+    async def test_it_should_get_all_values(self, repo, stored_entities):
+        async with repo:
+            result = await repo.objects.filter(num=1).values().as_list()
+
+        assert [(row["id"], row["num"]) for row in result] == [(stored_entities[1].id, 1)]
+
+    async def test_it_should_get_a_values_list(self, repo, stored_entities):
+        async with repo:
+            result = await repo.objects.filter(num__lt=2).order_by("num").values_list("num", "foo").as_list()
+
+        assert result == [(0, "bar0"), (1, "baz1")]
+
+    async def test_it_should_get_a_flat_values_list(self, repo, stored_entities):
+        async with repo:
+            result = await repo.objects.order_by("-num").values_list("id", flat=True).as_list()
+
+        assert result == [entity.id for entity in reversed(stored_entities)]
+
+    async def test_it_should_only_load_some_fields(self, repo, stored_entities):
+        async with repo:
+            result = await repo.objects.order_by("num").only("foo").first()
+
+        assert (result.id, result.foo) == (stored_entities[0].id, "bar0")
+        for field in ("num", "created_at", "finished_at"):  # Unloaded, with and without defaults
+            with pytest.raises(AttributeError):
+                getattr(result, field)
+
+        async with repo:
+            result = await repo.objects.order_by("num").only("num", "id").first()
+
+        assert (result.id, result.num) == (stored_entities[0].id, 0)
+
+    async def test_it_should_write_back_only_the_loaded_fields_of_a_projected_entity(self, repo, stored_entities):
+        async with repo:
+            result = await repo.objects.filter(num=1).only("foo", "num").first()
+            await repo.update(result.model_copy(update={"foo": "changed"}))
+            await repo.commit()
+
+        async with repo:
+            assert await repo.get(result.id) == stored_entities[1].model_copy(update={"foo": "changed"})
+            with pytest.raises(repo.NotFound):
+                await repo.update(result.model_copy(update={"id": EntityFactory.build().id}))
+
+    async def test_it_should_update_and_delete_through_a_projected_query(self, repo, stored_entities):
+        async with repo:
+            assert await repo.objects.filter(num__lt=2).only("foo").update(foo="blah") == 2
+            assert await repo.objects.filter(num=5).values_list("id", flat=True).delete() == 1
+            await repo.commit()
+
+        async with repo:
+            result = await repo.objects.order_by("num").as_list()
+
+        expected = [entity.model_copy(update={"foo": "blah"}) for entity in stored_entities[:2]] + stored_entities[2:5]
+        assert result == expected
+
+    async def test_it_should_paginate_by_keyset(self, repo, stored_entities):
+        pages = []
+        async with repo:
+            query = repo.objects.order_by("-created_at", "id")
+            page = await query.after(None, limit=4).as_list()
+            pages.append(page)
+            while page:
+                page = await query.after(query.cursor_for(page[-1]), limit=4).as_list()
+                pages.append(page)
+
+        assert pages == [stored_entities[:4], stored_entities[4:], []]
+
+    async def test_it_should_paginate_by_keyset_with_mixed_ascending_descending(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.order_by("is_odd", "-num")
+            page = await query.after(None, limit=4).as_list()
+            next_page = await query.after(query.cursor_for(page[-1])).as_list()
+
+        assert page == [stored_entities[4], stored_entities[2], stored_entities[0], stored_entities[5]]
+        assert next_page == [stored_entities[3], stored_entities[1]]
+
+    async def test_it_should_paginate_filtered_values_by_keyset(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.filter(num__gt=0).order_by("-num").values("num")
+            page = await query.after(None, limit=2).as_list()
+            next_page = await query.after(query.cursor_for(page[-1]), limit=2).as_list()
+
+        assert page == [{"num": 5}, {"num": 4}]
+        assert next_page == [{"num": 3}, {"num": 2}]
+
+    async def test_it_should_iterate_without_caching(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.order_by("num")
+            assert [entity async for entity in query.iterator()] == stored_entities
+            assert [entity async for entity in query.iterator(chunk_size=4)] == stored_entities
+            assert [entity async for entity in query.slice(1, 3).iterator(chunk_size=4)] == stored_entities[1:3]
+            assert query._results is None
+
+    async def test_it_should_stream_results(self, repo, stored_entities, monkeypatch):
+        monkeypatch.setattr(SQLEntityQuery, "stream_results", True)
+        monkeypatch.setattr(SQLEntityQuery, "fetch_size", 4)
+        async with repo:
+            assert await repo.objects.order_by("num").as_list() == stored_entities
+
     async def test_it_should_get_an_open_slice(self, repo, stored_entities):
         async with repo:
             result = await repo.objects.order_by("num").slice(2).as_list()
@@ -469,6 +1193,24 @@ class TestInMemoryBaseQuery:
         async with builder(request) as repo_inst:
             yield repo_inst
 
+    async def test_it_should_prepare_data_with_static_and_class_method_hooks(self, repo, stored_entities):
+        class HookedQuery(InMemoryEntityQuery):
+            @staticmethod
+            def prepare_foo(value: str, data: Mapping) -> str:
+                return value.upper()
+
+            @classmethod
+            def prepare_num(cls, value: int, data: Mapping) -> int:
+                return -value
+
+        async with repo:
+            query = HookedQuery(session=repo.session)
+            result = await query.filter(num=1).first()
+            prepared = query.prepare_data_for_entity({"foo": "bar", "num": 2})
+
+        assert (result.foo, result.num) == ("BAZ1", -1)
+        assert prepared == {"foo": "BAR", "num": -2}
+
     async def test_it_should_count_results_for_cached_query(self, repo, stored_entities):
         async with repo:
             query = repo.objects
@@ -479,6 +1221,84 @@ class TestInMemoryBaseQuery:
             # Use cached result:
             assert await query.count() == 6
 
+    async def test_it_should_count_no_results(self, repo):
+        async with repo:
+            assert await repo.objects.none().count() == 0
+
+    @pytest.mark.parametrize("cache_size, cached", [(None, True), (6, True), (5, False), (0, False)])
+    async def test_it_should_bound_the_result_cache(self, repo, stored_entities, cache_size, cached):
+        async with repo:
+            query = repo.objects.order_by("num").clone(result_cache_size=cache_size)
+            assert await alist(query) == stored_entities
+            assert (query._results is not None) is cached
+            assert await query.count() == 6
+
+            await repo.delete(stored_entities[0].id)
+            await repo.commit()
+            # Uncached results are selected again:
+            expected = stored_entities if cached else stored_entities[1:]
+            assert await alist(query) == expected
+            assert await query.getitem(0) == expected[0]
+
+    async def test_it_should_not_cache_queries_with_unhashable_filters(self, repo, stored_entities):
+        cached = CachedRepository(repo, RepositoryCache())
+        async with cached:
+            result = await cached.as_list(cached.objects.filter(sub={"bar": "blah"}).order_by("num"))
+            assert result == stored_entities
+        assert len(cached.cache) == 0
+
+    async def test_it_should_fail_to_filter_entities_by_a_bad_predicate(self, repo, stored_entities):
+        async with repo:
+            with pytest.raises(ValueError):
+                repo.objects.filter(Q(num=1) | Q(nope=2))
+
+    async def test_it_should_fail_to_aggregate_bad_fields(self, repo, stored_entities):
+        async with repo:
+            with pytest.raises(ValueError):
+                repo.objects.group_by("nope")
+            with pytest.raises(ValueError):
+                await repo.objects.aggregate(total=Sum("nope"))
+            with pytest.raises(ValueError):
+                await repo.objects.group_by("num").aggregate(num=Count())
+
+    async def test_it_should_update_entity_attrs_through_a_custom_transform(self, repo, stored_entities, monkeypatch):
+        class CustomEntityQuery(InMemoryEntityQuery):
+            def transform_entity_to_data(self, entity: Entity) -> dict[str, Any]:
+                return super().transform_entity_to_data(entity) | {"foo": entity.foo.upper()}
+
+        monkeypatch.setattr(repo, "query_class", CustomEntityQuery)
+        async with repo:
+            await repo.update_attrs(stored_entities[0].id, foo="blah")
+            await repo.commit()
+
+        async with repo:
+            assert (await repo.get(stored_entities[0].id)).foo == "BLAH"
+            # The loaded fields can't be rendered apart from the rest:
+            result = await repo.objects.filter(num=0).only("foo").first()
+            with pytest.raises(ValueError):
+                await repo.update(result)
+
+    async def test_it_should_commit_a_cached_repository_without_writes(self, repo, stored_entities):
+        cached = CachedRepository(repo, RepositoryCache())
+        async with cached:
+            await cached.get(stored_entities[0].id)
+            await cached.commit()
+        assert len(cached.cache) == 1
+
+    async def test_it_should_hydrate_entities_in_batches(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.order_by("num").clone(hydration_batch_size=4)
+            assert await alist(query) == stored_entities
+
+    async def test_it_should_hydrate_entities_with_a_custom_transform(self, repo, stored_entities):
+        class CustomEntityQuery(InMemoryEntityQuery):
+            def transform_data_to_entity(self, data: Mapping) -> Entity:
+                return super().transform_data_to_entity(data).model_copy(update={"foo": "custom"})
+
+        async with repo:
+            query = CustomEntityQuery(session=repo.session).order_by("num")
+            assert [entity.foo for entity in await alist(query)] == ["custom"] * len(stored_entities)
+
     async def test_it_should_fail_to_filter_entities_by_bad_field(self, repo, stored_entities, entity):
         async with repo:
             with pytest.raises(ValueError):
@@ -492,6 +1312,39 @@ class TestInMemoryBaseQuery:
             # Should cache:
             assert await alist(query) == list(reversed(stored_entities))
 
+    async def test_it_should_fail_to_project_bad_fields(self, repo, stored_entities):
+        async with repo:
+            with pytest.raises(ValueError):
+                repo.objects.values("fhqwgds")
+            with pytest.raises(ValueError):
+                repo.objects.values_list("foo", "num", flat=True)
+
+    async def test_it_should_fail_to_paginate_by_keyset_without_ordering(self, repo, stored_entities):
+        async with repo:
+            with pytest.raises(ValueError):
+                repo.objects.after(None, limit=2)
+            with pytest.raises(ValueError):
+                repo.objects.cursor_for(stored_entities[0])
+
+    async def test_it_should_fail_to_paginate_by_a_bad_cursor(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.order_by("num", "id")
+            with pytest.raises(ValueError):
+                query.after("not a cursor!")
+            with pytest.raises(ValueError):
+                query.after(repo.objects.order_by("num").cursor_for(stored_entities[0]))
+
+    async def test_it_should_skip_null_keys_when_paginating_by_keyset(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.order_by("oddish", "num")
+            page = await query.after(None, limit=4).as_list()
+            after_null = await query.after(query.cursor_for(page[-2])).as_list()
+            next_page = await query.after(query.cursor_for(page[-1])).as_list()
+
+        assert page == [stored_entities[0], stored_entities[2], stored_entities[4], stored_entities[1]]
+        assert after_null == []
+        assert next_page == [stored_entities[3], stored_entities[5]]
+
     async def test_it_should_fail_to_order_by_bad_field(self, repo, stored_entities):
         async with repo:
             with pytest.raises(ValueError):
@@ -596,3 +1449,434 @@ class TestInMemoryBaseQuery:
             result = repr(query)
             expected = "<InMemoryEntityQuery [Entity(id=UUID('de509355-5376-5405-a36d-91caed2ba8d1'), foo='bar0', num=0, is_odd=False, oddish=None, sub=SubEntity(bar='blah'), created_at=datetime.datetime(2023, 12, 15, 12, 0, tzinfo=<UTC>), finished_at=None), Entity(id=UUID('8db9b404-f276-5674-8006-12b74a8c62e3'), foo='baz1', num=1, is_odd=True, oddish=True, sub=SubEntity(bar='blah'), created_at=datetime.datetime(2023, 12, 15, 11, 0, tzinfo=<UTC>), finished_at=None), Entity(id=UUID('745da407-8c19-59d1-9a0e-8be54c7ac605'), foo='bar2', num=2, is_odd=False, oddish=None, sub=SubEntity(bar='blah'), created_at=datetime.datetime(2023, 12, 15, 10, 0, tzinfo=<UTC>), finished_at=None), '...(remaining elements truncated)...']>"
             assert result == expected
+
+    async def test_it_should_filter_on_multiple_indexed_fields(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.filter(is_odd=True, oddish__isnull=False, foo__eq="baz3")
+            assert await alist(query) == [stored_entities[3]]
+
+            query = repo.objects.filter(id=stored_entities[3].id, is_odd=True)
+            assert await alist(query) == [stored_entities[3]]
+
+            query = repo.objects.filter(is_odd=True, foo="bar2")
+            assert await alist(query) == []
+
+    async def test_it_should_filter_an_indexed_field_by_unhashable_value(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.filter(foo=["baz1"])
+            assert await alist(query) == []
+
+    async def test_it_should_filter_an_indexed_field_in_unhashable_values(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.filter(foo__in=[["baz1"], "bar2"])
+            assert await alist(query) == [stored_entities[2]]
+
+            query = repo.objects.filter(Q(foo__in=[["baz1"], "bar2"]) | Q(num=5)).order_by("num")
+            assert await alist(query) == [stored_entities[2], stored_entities[5]]
+
+    async def test_it_should_maintain_indexes_on_update_and_delete(self, repo, stored_entities):
+        async with repo:
+            await repo.update_attrs(stored_entities[1].id, foo="blah")
+            await repo.delete(stored_entities[3].id)
+            await repo.delete(stored_entities[3].id)
+            await repo.commit()
+
+        async with repo:
+            assert await alist(repo.objects.filter(foo="baz1")) == []
+            assert await alist(repo.objects.filter(foo="blah")) == [
+                stored_entities[1].model_copy(update={"foo": "blah"})
+            ]
+            assert await aset(repo.objects.filter(is_odd=True)) == {
+                stored_entities[5],
+                stored_entities[1].model_copy(update={"foo": "blah"}),
+            }
+
+    async def test_it_should_roll_back_indexes(self, repo, stored_entities):
+        async with repo:
+            await repo.update_attrs(stored_entities[1].id, foo="blah")
+            await repo.rollback()
+
+        async with repo:
+            assert await alist(repo.objects.filter(foo="baz1")) == [stored_entities[1]]
+            assert await alist(repo.objects.filter(foo="blah")) == []
+
+    async def test_it_should_filter_sorted_index_ranges(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.filter(num__gt=0, num__lte=3, foo__startswith="baz")
+            assert await aset(query) == {stored_entities[1], stored_entities[3]}
+
+            query = repo.objects.filter(num__gte=2, num__lt=4, is_odd=False)
+            assert await aset(query) == {stored_entities[2]}
+
+            query = repo.objects.filter(num=4)
+            assert await aset(query) == {stored_entities[4]}
+
+            query = repo.objects.filter(foo__startswith="")
+            assert await aset(query) == set(stored_entities)
+
+            query = repo.objects.filter(num__gt=1).order_by("-created_at")
+            assert await alist(query) == stored_entities[2:]
+
+    async def test_it_should_order_by_a_sorted_index_with_nulls(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.order_by("oddish", "num")
+            expected = stored_entities[0::2] + stored_entities[1::2]
+            assert await alist(query) == expected
+
+            query = repo.objects.order_by("-oddish", "-num")
+            assert await alist(query) == list(reversed(expected))
+
+            query = repo.objects.filter(num__lt=3).order_by("oddish", "num")
+            assert await alist(query) == [stored_entities[0], stored_entities[2], stored_entities[1]]
+
+            query = repo.objects.filter(oddish__gte=True).order_by("-oddish", "num").slice(1, 2)
+            assert await alist(query) == [stored_entities[3]]
+
+    async def test_it_should_walk_a_sorted_index_for_a_slice(self, repo, stored_entities):
+        async with repo:
+            query = repo.objects.filter(is_odd=False).order_by("-num").slice(0, 2)
+            assert await alist(query) == [stored_entities[4], stored_entities[2]]
+
+            query = repo.objects.order_by("-num").slice(1, 3)
+            assert await alist(query) == [stored_entities[4], stored_entities[3]]
+
+    async def test_it_should_fail_to_compare_sorted_index_values(self, repo, stored_entities):
+        async with repo:
+            with pytest.raises(TypeError):
+                await alist(repo.objects.filter(num__lt="3"))
+
+    async def test_it_should_rebuild_sorted_indexes_after_commit(self, repo, stored_entities):
+        async with repo:
+            assert await alist(repo.objects.order_by("num").slice(0, 1)) == [stored_entities[0]]
+            await repo.update_attrs(stored_entities[0].id, num=99)
+            await repo.commit()
+            assert await alist(repo.objects.order_by("num").slice(0, 1)) == [stored_entities[1]]
+
+    async def test_it_should_update_sorted_indexes_on_commit(self, repo, stored_entities, monkeypatch):
+        def rebuild(*args):
+            raise AssertionError("The sorted index should be updated, not rebuilt")
+
+        fields = ("num", "foo", "oddish", "created_at")
+        new_entity = EntityFactory.build(num=-2)
+        async with repo:
+            for field in fields:
+                await alist(repo.objects.order_by(field))
+            await repo.update_attrs(stored_entities[0].id, oddish=True, num=-1)
+            await repo.update_attrs(stored_entities[1].id, oddish=None, foo="bar1")
+            await repo.delete(stored_entities[2].id)
+            await repo.delete(stored_entities[4].id)
+            await repo.insert(new_entity)
+            monkeypatch.setattr(SortedIndex, "build", rebuild)
+            await repo.commit()
+
+            table = InMemoryDatabase.tables["entities"]
+            for field in fields:
+                index = InMemoryDatabase.get_sorted_index("entities", field)
+                assert index.table is table
+                assert list(zip(index.values, index.keys)) == sorted(
+                    (row[field], key) for key, row in table.items() if row[field] is not None
+                )
+                assert sorted(index.null_keys) == sorted(key for key, row in table.items() if row[field] is None)
+
+            result = await alist(repo.objects.order_by("oddish", "num"))
+        assert [entity.id for entity in result] == [
+            new_entity.id,
+            stored_entities[1].id,
+            stored_entities[0].id,
+            stored_entities[3].id,
+            stored_entities[5].id,
+        ]
+
+    async def test_it_should_rebuild_sorted_indexes_after_a_load(self, repo, stored_entities, tmp_path):
+        async with repo:
+            assert await alist(repo.objects.order_by("num").slice(0, 1)) == [stored_entities[0]]
+        InMemoryDatabase.dump(tmp_path / "snapshot")
+        InMemoryDatabase.load(tmp_path / "snapshot")
+        async with repo:
+            await repo.update_attrs(stored_entities[1].id, num=-1)
+            await repo.commit()
+            result = await alist(repo.objects.order_by("num").slice(0, 2))
+        assert [entity.id for entity in result] == [stored_entities[1].id, stored_entities[0].id]
+
+    async def test_it_should_drop_a_sorted_index_on_unsortable_values(self, repo, stored_entities):
+        async with repo:
+            # Equal values sort fine, until they differ:
+            assert InMemoryDatabase.get_sorted_index("entities", "sub") is not None
+            await repo.update_attrs(stored_entities[0].id, sub=SubEntity(bar="banana"))
+            await repo.commit()
+
+        assert InMemoryDatabase.get_sorted_index("entities", "sub") is None
+
+    async def test_it_should_not_build_a_sorted_index_on_unsortable_values(self, repo, stored_entities):
+        async with repo:
+            await repo.update_attrs(stored_entities[0].id, sub=SubEntity(bar="banana"))
+            await repo.commit()
+
+        assert InMemoryDatabase.get_sorted_index("entities", "sub") is None
+        # Should cache:
+        assert InMemoryDatabase.get_sorted_index("entities", "sub") is None
+
+
+class TestInMemorySession:
+    @pytest.fixture
+    async def repo(self, request):
+        builder = get_memdb_test_repo_builder(InMemoryEntityRepository)
+        async with builder(request) as repo_inst:
+            yield repo_inst
+
+    @pytest.fixture
+    def other_repo(self, repo):
+        return InMemoryEntityRepository()
+
+    async def test_it_should_read_its_own_writes_only(self, repo, other_repo, entity):
+        async with repo, other_repo:
+            await repo.insert(entity)
+
+            assert await repo.objects.filter(foo=entity.foo).first() == entity
+            assert await alist(repo.objects.order_by("num")) == [entity]
+            assert await other_repo.objects.first() is None
+
+            await repo.commit()
+            assert await other_repo.objects.first() is None
+
+        async with other_repo:
+            assert await other_repo.objects.first() == entity
+
+    async def test_it_should_not_cache_reads_from_a_snapshot_older_than_the_cache(
+        self, repo, other_repo, stored_entities
+    ):
+        cache = RepositoryCache()
+        cached, other_cached = CachedRepository(repo, cache), CachedRepository(other_repo, cache)
+        entity = stored_entities[0]
+        async with cached:
+            query = cached.objects.filter(num=0)
+            async with other_cached:
+                await other_cached.update_attrs(entity.id, foo="blah")
+                await other_cached.commit()
+
+            # This session still reads from its snapshot, from before the commit:
+            assert await cached.get(entity.id) == entity
+            assert await cached.get_many([entity.id]) == {entity.id: entity}
+            assert await cached.as_list(query) == [entity]
+            assert len(cache) == 0
+
+        async with cached:
+            assert (await cached.get(entity.id)).foo == "blah"
+            assert [result.foo for result in await cached.as_list(cached.objects.filter(num=0))] == ["blah"]
+            assert len(cache) == 2
+
+    async def test_it_should_merge_concurrent_writes_to_different_rows(self, repo, other_repo, stored_entities):
+        new_entity = EntityFactory.build()
+        async with repo, other_repo:
+            await repo.update_attrs(stored_entities[0].id, foo="mine")
+            await repo.delete(stored_entities[1].id)
+            await other_repo.update_attrs(stored_entities[2].id, foo="theirs")
+            await other_repo.insert(new_entity)
+            await other_repo.delete(new_entity.id)
+
+            await repo.commit()
+            await other_repo.commit()
+
+            # Committing takes a fresh snapshot, with both sessions' writes:
+            assert {entity.foo async for entity in other_repo.objects.filter(foo__in=("mine", "theirs"))} == {
+                "mine",
+                "theirs",
+            }
+
+        async with repo:
+            assert await repo.objects.filter(foo="mine").count() == 1
+            assert await repo.objects.filter(foo="theirs").count() == 1
+            assert await repo.objects.count() == 5
+            assert InMemoryDatabase.versions["entities"] == 3
+
+    @pytest.mark.parametrize("delete", [False, True])
+    async def test_it_should_fail_to_commit_conflicting_writes(self, repo, other_repo, stored_entities, delete):
+        entity = stored_entities[0]
+        async with repo, other_repo:
+            await repo.update_attrs(entity.id, foo="mine")
+            await other_repo.update_attrs(stored_entities[1].id, foo="theirs")
+            if delete:
+                await other_repo.delete(entity.id)
+            else:
+                await other_repo.update_attrs(entity.id, foo="theirs")
+            await other_repo.commit()
+
+            with pytest.raises(repo.WriteConflict) as exc_info:
+                await repo.commit()
+            assert exc_info.value.args == (str(entity.id),)
+
+            await repo.rollback()
+            assert await repo.objects.filter(foo="mine").count() == 0
+
+    async def test_it_should_fail_to_commit_conflicting_inserts(self, repo, other_repo, entity):
+        async with repo, other_repo:
+            await repo.insert(entity)
+            await other_repo.insert(entity)
+            await other_repo.commit()
+
+            with pytest.raises(repo.WriteConflict):
+                await repo.commit()
+
+
+class TestInMemorySnapshots:
+    @pytest.fixture
+    async def repo(self, request):
+        builder = get_memdb_test_repo_builder(InMemoryEntityRepository)
+        async with builder(request) as repo_inst:
+            yield repo_inst
+
+    async def test_it_should_dump_and_load_tables(self, repo, stored_entities, tmp_path):
+        InMemoryDatabase.dump(tmp_path / "snapshot")
+        tables = InMemoryDatabase.tables
+        indexes = InMemoryDatabase.indexes
+        InMemoryDatabase.clear()
+
+        InMemoryDatabase.load(tmp_path / "snapshot")
+
+        assert InMemoryDatabase.tables == tables
+        assert InMemoryDatabase.indexes == indexes
+        async with repo:
+            assert await repo.objects.filter(foo=stored_entities[1].foo).first() == stored_entities[1]
+            assert await alist(repo.objects.order_by("num")) == stored_entities
+
+    async def test_it_should_replay_logged_commits(self, repo, stored_entities, tmp_path):
+        InMemoryDatabase.dump(tmp_path / "snapshot")
+        InMemoryDatabase.load(tmp_path / "snapshot", changelog_path=tmp_path / "changelog")
+        async with repo:
+            await repo.update_attrs(stored_entities[0].id, foo="blah")
+            await repo.delete(stored_entities[1].id)
+            await repo.commit()
+            await repo.commit()  # Nothing to log
+
+            InMemoryDatabase.dump(tmp_path / "snapshot")
+            assert (tmp_path / "changelog").read_bytes() == b""
+
+            await repo.update_attrs(stored_entities[2].id, foo="blah")
+            await repo.commit()
+        tables = InMemoryDatabase.tables
+        InMemoryDatabase.clear()
+
+        InMemoryDatabase.load(tmp_path / "snapshot", changelog_path=tmp_path / "changelog")
+
+        assert InMemoryDatabase.tables == tables
+        async with repo:
+            assert await repo.objects.filter(foo="blah").count() == 2
+            assert await repo.objects.count() == 5
+
+    async def test_it_should_cut_a_torn_commit_off_the_log_before_appending(self, repo, stored_entities, tmp_path):
+        changelog = tmp_path / "changelog"
+        InMemoryDatabase.dump(tmp_path / "snapshot")
+        InMemoryDatabase.load(tmp_path / "snapshot", changelog_path=changelog)
+        async with repo:
+            await repo.update_attrs(stored_entities[0].id, foo="kept")
+            await repo.commit()
+            end = changelog.stat().st_size
+            await repo.update_attrs(stored_entities[1].id, foo="torn")
+            await repo.commit()
+        changelog.write_bytes(changelog.read_bytes()[:-3])
+
+        InMemoryDatabase.load(tmp_path / "snapshot", changelog_path=changelog)
+        assert changelog.stat().st_size == end
+        async with repo:
+            await repo.update_attrs(stored_entities[2].id, foo="appended")
+            await repo.commit()
+
+        InMemoryDatabase.load(tmp_path / "snapshot", changelog_path=changelog)
+        async with repo:
+            assert await repo.objects.order_by("num").values_list("foo", flat=True).as_list() == [
+                "kept",
+                stored_entities[1].foo,
+                "appended",
+                *(entity.foo for entity in stored_entities[3:]),
+            ]
+
+    async def test_it_should_conflict_with_sessions_from_before_a_load(self, repo, stored_entities, tmp_path):
+        InMemoryDatabase.dump(tmp_path / "snapshot")
+        async with repo:
+            await repo.update_attrs(stored_entities[0].id, foo="blah")
+            InMemoryDatabase.load(tmp_path / "snapshot")
+
+            with pytest.raises(repo.WriteConflict):
+                await repo.commit()
+
+
+class TestColumnarInMemoryQuery:
+    @pytest.fixture
+    async def repo(self, request):
+        pytest.importorskip("numpy")
+        builder = get_memdb_test_repo_builder(ColumnarInMemoryEntityRepository)
+        async with builder(request) as repo_inst:
+            yield repo_inst
+
+    async def test_it_should_rebuild_the_snapshot_after_commit(self, repo, stored_entities):
+        async with repo:
+            snapshot = InMemoryDatabase.get_columnar_snapshot("columnar_entities")
+            assert await alist(repo.objects.order_by("num").slice(0, 1)) == [stored_entities[0]]
+            assert InMemoryDatabase.get_columnar_snapshot("columnar_entities") is snapshot
+
+            await repo.update_attrs(stored_entities[0].id, num=99)
+            await repo.commit()
+
+            assert InMemoryDatabase.get_columnar_snapshot("columnar_entities") is not snapshot
+            assert await alist(repo.objects.order_by("num").slice(0, 1)) == [stored_entities[1]]
+
+    async def test_it_should_filter_unvectorizable_values_row_by_row(self, repo, stored_entities):
+        async with repo:
+            entity = stored_entities[1]
+            query = repo.objects.filter(sub=entity.sub.model_dump(), num=entity.num).order_by("sub")
+            assert await alist(query) == [entity]
+
+    def test_it_should_not_snapshot_other_tables(self):
+        assert InMemoryDatabase.get_columnar_snapshot("entities") is None
+
+
+class TestSQLQuery:
+    @pytest.fixture
+    async def repo(self, request):
+        builder = get_sqldb_test_repo_builder(SQLEntityRepository)
+        async with builder(request) as repo_inst:
+            yield repo_inst
+
+    @pytest.fixture
+    def statement_cache(self, monkeypatch):
+        cache = OrderedDict()
+        monkeypatch.setattr(AbstractSQLQuery, "_statement_cache", cache)
+        return cache
+
+    async def test_it_should_reject_projecting_a_field_without_a_column(self, repo, stored_entities):
+        async with repo:
+            for project in (repo.objects.only, repo.objects.values, repo.objects.values_list, repo.objects.group_by):
+                with pytest.raises(ValueError):
+                    project("sub")
+            assert await repo.objects.filter(num=0).values_list("foo", flat=True).as_list() == ["bar0"]
+
+    async def test_it_should_reuse_statements_for_queries_of_the_same_shape(
+        self, repo, stored_entities, statement_cache
+    ):
+        async with repo:
+            assert await repo.objects.filter(num__gte=4).as_list() == stored_entities[4:]
+            assert await repo.objects.filter(num__gte=5).as_list() == stored_entities[5:]
+            assert len(statement_cache) == 1
+
+            assert await repo.objects.filter(oddish=None).count() == 3
+            assert await repo.objects.filter(oddish=True).count() == 3
+            assert await repo.objects.filter(oddish__isnull=False).count() == 3
+            assert len(statement_cache) == 4
+
+            assert await repo.objects.filter(Q(num__lt=1) | ~Q(foo="bar2", oddish=None)).count() == 5
+            assert await repo.objects.filter(Q(num__lt=2) | ~Q(foo="bar4", oddish=None)).count() == 5
+            assert len(statement_cache) == 5
+
+            assert await repo.objects.filter(num__in=[1, 2]).update(foo="blah") == 2
+            assert await repo.objects.filter(num__in=[3]).update(foo="bleh") == 1
+            query = repo.objects.filter(foo="blah").order_by("num").slice(1, 2).values_list("num", flat=True)
+            assert await query.as_list() == [2]
+            assert len(statement_cache) == 7
+
+    async def test_it_should_bound_the_statement_cache(self, repo, stored_entities, statement_cache, monkeypatch):
+        monkeypatch.setattr(AbstractSQLQuery, "statement_cache_size", 1)
+        async with repo:
+            await repo.objects.filter(num=1).as_list()
+            await repo.objects.filter(foo="bar2").delete()
+            assert len(statement_cache) == 1
+            assert await repo.objects.filter(num=1).count() == 1
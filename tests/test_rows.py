@@ -0,0 +1,104 @@
+# ruff: noqa: D100, D101, D102, D103
+import random
+
+import pytest
+
+from steerage.repositories import rows
+from steerage.repositories.base import CMP_OPERATORS, OrderBy
+from steerage.repositories.predicates import OR, Q
+
+ORDERINGS = [
+    (OrderBy("a", True),),
+    (OrderBy("a", False), OrderBy("b", False)),
+    (OrderBy("a", True), OrderBy("b", False)),
+    (OrderBy("b", False), OrderBy("a", True), OrderBy("c", True)),
+]
+
+
+@pytest.fixture
+def data():
+    rng = random.Random(42)
+    return [{"a": rng.randint(0, 5), "b": rng.randint(0, 5), "c": n} for n in range(200)]
+
+
+@pytest.mark.parametrize("ordering", ORDERINGS)
+def test_it_should_select_the_same_top_rows_as_a_full_sort(data, ordering):
+    assert rows.top_rows(data, ordering, 25) == rows.sort_rows(data, ordering)[:25]
+
+
+@pytest.mark.parametrize("ordering", ORDERINGS)
+def test_it_should_sort_nulls_first_ascending_and_strings_in_either_direction(ordering):
+    rng = random.Random(42)
+    data = [{"a": rng.choice([None, 1, 2]), "b": rng.choice([None, "x", "y"]), "c": n} for n in range(200)]
+    expected = list(data)
+    for key, ascending in reversed(ordering):
+        expected.sort(key=lambda row: (row[key] is not None, row[key]), reverse=not ascending)
+
+    assert rows.sort_rows(data, ordering) == expected
+    assert rows.top_rows(data, ordering, 25) == expected[:25]
+
+
+@pytest.mark.parametrize("ordering", ORDERINGS)
+def test_it_should_sort_and_truncate_beyond_the_top_k_limit(data, ordering, monkeypatch):
+    monkeypatch.setattr(rows, "MAX_TOP_K", 10)
+    assert rows.sort_rows(data, ordering, 25) == rows.top_rows(data, ordering, 25)
+
+
+@pytest.mark.parametrize("ordering", ORDERINGS)
+def test_it_should_select_no_top_rows_from_no_rows(ordering):
+    assert rows.top_rows([], ordering, 25) == []
+
+
+@pytest.mark.parametrize("ordering", ORDERINGS)
+def test_it_should_select_the_rows_after_a_keyset(data, ordering):
+    ordered = rows.sort_rows(data, ordering)
+    keyset = [ordered[99][key] for key, _ in ordering]
+    keys = [tuple(row[key] for key, _ in ordering) for row in ordered]
+    expected = ordered[max(index for index, key in enumerate(keys) if list(key) == keyset) + 1 :]
+
+    assert rows.sort_rows(rows.rows_after(data, ordering, keyset), ordering) == expected
+
+
+FILTERS = [
+    [("a", None, 3)],
+    [("a", "ne", 3), ("b", "gte", 2), ("c", "lt", 100)],
+    [("a", "in", (1, 2)), ("b", "isnull", False), ("c", "lte", 50)],
+    [("a", "gt", 4), ("a", "eq", 5)],
+]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_it_should_compile_filters_to_a_single_predicate(data, filters):
+    expected = [row for row in data if all(CMP_OPERATORS[op](row[key], value) for key, op, value in filters)]
+    assert list(rows.filter_rows(data, filters)) == expected
+
+
+def test_it_should_test_the_cheapest_filters_first():
+    tested = []
+
+    def spy(value, _):
+        tested.append(value)
+        return True
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setitem(CMP_OPERATORS, "spy", spy)
+        predicate = rows.compile_filters([("c", "ne", 0), ("b", "spy", None), ("a", "gt", 0), ("d", None, 1)])
+
+    assert predicate({"a": 1, "b": "b", "c": 1, "d": 1})
+    assert tested == ["b"]
+    assert not predicate({"a": 1, "b": "b", "c": 1, "d": 2})
+    assert tested == ["b"]
+
+
+def test_it_should_compile_filters_with_empty_predicates():
+    always = Q.build(())
+    never = Q.build((), OR)
+
+    assert rows.compile_filters([], [always])({})
+    assert not rows.compile_filters([], [never])({})
+    assert not rows.compile_filters([], [~always])({})
+    assert rows.compile_filters([], [never | always])({})
+
+
+def test_it_should_not_filter_rows_without_filters(data):
+    assert rows.filter_rows(data, []) is data
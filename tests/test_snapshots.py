@@ -0,0 +1,154 @@
+# ruff: noqa: D100, D101, D102, D103
+import struct
+import zlib
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+from pyrsistent import freeze
+
+from steerage.repositories.snapshots import (
+    FORMAT_VERSION,
+    FRAME,
+    HEADER,
+    MAGIC,
+    CorruptChangeLogError,
+    SnapshotFormatError,
+    SnapshotReader,
+    append_changes,
+    read_changes,
+    truncate_changes,
+    write_snapshot,
+)
+
+
+@pytest.fixture
+def tables():
+    id = uuid4()
+    return freeze(
+        {
+            "entities": {str(id): {"id": id, "created_at": datetime.now(timezone.utc), "sub": {"bar": "baz"}}},
+            "empty": {},
+            "ünicode": {"key": {"id": 1}},
+        }
+    )
+
+
+def test_it_should_write_and_read_a_snapshot(tmp_path, tables):
+    path = tmp_path / "snapshot"
+    write_snapshot(path, tables)
+
+    with SnapshotReader(path) as snapshot:
+        assert set(snapshot.sections) == set(tables)
+        for name, table in tables.items():
+            assert snapshot.read_table(name) == table
+
+    assert [file.name for file in tmp_path.iterdir()] == ["snapshot"]
+
+
+def test_it_should_replace_a_snapshot(tmp_path, tables):
+    path = tmp_path / "snapshot"
+    write_snapshot(path, tables)
+    write_snapshot(path, tables.discard("entities"))
+
+    with SnapshotReader(path) as snapshot:
+        assert set(snapshot.sections) == {"empty", "ünicode"}
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        b"",
+        b"STEERAGE",
+        b"NOTASNAPSHOT" + bytes(HEADER.size),
+        HEADER.pack(MAGIC, FORMAT_VERSION + 1, 0),
+    ],
+)
+def test_it_should_fail_to_read_something_else(tmp_path, content):
+    path = tmp_path / "snapshot"
+    path.write_bytes(content)
+
+    with pytest.raises(SnapshotFormatError):
+        SnapshotReader(path)
+
+
+def test_it_should_fail_to_read_a_truncated_directory(tmp_path):
+    path = tmp_path / "snapshot"
+    path.write_bytes(HEADER.pack(MAGIC, FORMAT_VERSION, 1))
+
+    with pytest.raises(struct.error):
+        SnapshotReader(path)
+
+
+def test_it_should_append_and_read_changes(tmp_path, tables):
+    path = tmp_path / "changelog"
+    row = tables["ünicode"]["key"]
+    append_changes(path, [("ünicode", "key", row)])
+    first_end = path.stat().st_size
+    append_changes(path, [("ünicode", "key", None), ("empty", "key", row)])
+
+    assert list(read_changes(path)) == [
+        (first_end, [("ünicode", "key", row)]),
+        (path.stat().st_size, [("ünicode", "key", None), ("empty", "key", row)]),
+    ]
+
+
+@pytest.mark.parametrize(
+    "tear",
+    [
+        lambda frame: frame[:-3],  # Part of the record
+        lambda frame: frame[:3],  # Part of the frame header
+        lambda frame: frame[:-1] + bytes([frame[-1] ^ 0xFF]),  # A bad checksum
+    ],
+)
+def test_it_should_ignore_a_torn_change(tmp_path, tables, tear):
+    path = tmp_path / "changelog"
+    append_changes(path, [("ünicode", "key", None)])
+    end = path.stat().st_size
+    append_changes(path, [("ünicode", "key", tables["ünicode"]["key"])])
+    content = path.read_bytes()
+    path.write_bytes(content[:end] + tear(content[end:]))
+
+    assert list(read_changes(path)) == [(end, [("ünicode", "key", None)])]
+
+
+def test_it_should_fail_to_read_a_corrupt_change_before_the_last(tmp_path):
+    path = tmp_path / "changelog"
+    append_changes(path, [("ünicode", "key", None)])
+    append_changes(path, [("empty", "key", None)])
+    content = bytearray(path.read_bytes())
+    content[FRAME.size] ^= 0xFF
+    path.write_bytes(content)
+
+    with pytest.raises(CorruptChangeLogError):
+        list(read_changes(path))
+
+
+def test_it_should_fail_to_decode_a_whole_change(tmp_path):
+    # e.g. a pickled class that has since been renamed:
+    record = b"\x80\x05cbuiltins\nnope\n."
+    path = tmp_path / "changelog"
+    path.write_bytes(FRAME.pack(len(record), zlib.crc32(record)) + record)
+    append_changes(path, [("empty", "key", None)])
+
+    with pytest.raises(AttributeError):
+        list(read_changes(path))
+
+
+def test_it_should_truncate_a_torn_change(tmp_path, tables):
+    path = tmp_path / "changelog"
+    append_changes(path, [("ünicode", "key", None)])
+    end = path.stat().st_size
+    path.write_bytes(path.read_bytes() + FRAME.pack(100, 0) + b"torn")
+
+    truncate_changes(path, end)
+    truncate_changes(path, end)  # Nothing more to cut
+    append_changes(path, [("empty", "key", None)])
+
+    assert [changes for _, changes in read_changes(path)] == [[("ünicode", "key", None)], [("empty", "key", None)]]
+
+
+def test_it_should_read_no_changes_without_a_changelog(tmp_path):
+    assert list(read_changes(tmp_path / "changelog")) == []
+    truncate_changes(tmp_path / "changelog", 0)
+    assert not (tmp_path / "changelog").exists()
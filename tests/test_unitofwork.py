@@ -0,0 +1,107 @@
+# ruff: noqa: D100, D101, D102, D103
+from uuid import uuid4
+
+import pytest
+from pydantic import BaseModel, ConfigDict
+
+from steerage.exceptions import AlreadyExists, NotFound
+from steerage.repositories.unitofwork import (
+    DELETE,
+    INSERT,
+    UPDATE,
+    UPDATE_ATTRS,
+    UPSERT,
+    UnitOfWork,
+    merge_writes,
+)
+
+
+class Thing(BaseModel):
+    name: str
+    size: int = 0
+
+    model_config = ConfigDict(frozen=True)
+
+
+OLD = Thing(name="old")
+NEW = Thing(name="new")
+ATTRS = {"size": 3}
+OLD_WITH_ATTRS = Thing(name="old", size=3)
+
+
+@pytest.mark.parametrize(
+    "previous, operation, value, expected",
+    [
+        (None, INSERT, NEW, (INSERT, NEW)),
+        ((INSERT, OLD), INSERT, NEW, AlreadyExists),
+        ((INSERT, OLD), UPSERT, NEW, (INSERT, NEW)),
+        ((INSERT, OLD), UPDATE, NEW, (INSERT, NEW)),
+        ((INSERT, OLD), UPDATE_ATTRS, ATTRS, (INSERT, OLD_WITH_ATTRS)),
+        ((INSERT, OLD), DELETE, None, None),
+        ((UPSERT, OLD), INSERT, NEW, AlreadyExists),
+        ((UPSERT, OLD), UPSERT, NEW, (UPSERT, NEW)),
+        ((UPSERT, OLD), UPDATE, NEW, (UPSERT, NEW)),
+        ((UPSERT, OLD), UPDATE_ATTRS, ATTRS, (UPSERT, OLD_WITH_ATTRS)),
+        ((UPSERT, OLD), DELETE, None, (DELETE, None)),
+        ((UPDATE, OLD), INSERT, NEW, AlreadyExists),
+        ((UPDATE, OLD), UPSERT, NEW, (UPSERT, NEW)),
+        ((UPDATE, OLD), UPDATE, NEW, (UPDATE, NEW)),
+        ((UPDATE, OLD), UPDATE_ATTRS, ATTRS, (UPDATE, OLD_WITH_ATTRS)),
+        ((UPDATE, OLD), DELETE, None, (DELETE, None)),
+        ((UPDATE_ATTRS, {"name": "x"}), INSERT, NEW, AlreadyExists),
+        ((UPDATE_ATTRS, {"name": "x"}), UPSERT, NEW, (UPSERT, NEW)),
+        ((UPDATE_ATTRS, {"name": "x"}), UPDATE, NEW, (UPDATE, NEW)),
+        ((UPDATE_ATTRS, {"name": "x"}), UPDATE_ATTRS, ATTRS, (UPDATE_ATTRS, {"name": "x", "size": 3})),
+        ((UPDATE_ATTRS, {"name": "x"}), DELETE, None, (DELETE, None)),
+        ((DELETE, None), INSERT, NEW, (UPSERT, NEW)),
+        ((DELETE, None), UPSERT, NEW, (UPSERT, NEW)),
+        ((DELETE, None), UPDATE, NEW, NotFound),
+        ((DELETE, None), UPDATE_ATTRS, ATTRS, NotFound),
+        ((DELETE, None), DELETE, None, (DELETE, None)),
+    ],
+)
+def test_it_should_merge_writes(previous, operation, value, expected):
+    if isinstance(expected, type):
+        with pytest.raises(expected):
+            merge_writes(previous, operation, value)
+    else:
+        assert merge_writes(previous, operation, value) == expected
+
+
+def test_it_should_queue_writes_by_primary_key():
+    first, second, third = uuid4(), uuid4(), uuid4()
+    unit = UnitOfWork()
+    unit.add(first, INSERT, OLD)
+    unit.add(second, DELETE)
+    unit.add(third, UPDATE, OLD)
+    unit.add(first, UPDATE, NEW)
+    unit.add(third, DELETE)
+
+    assert len(unit) == 3
+    assert unit.get(first) == (INSERT, NEW)
+    assert unit.take() == {INSERT: [(first, NEW)], DELETE: [(second, None), (third, None)]}
+    assert len(unit) == 0
+
+
+def test_it_should_cancel_an_insert_and_a_delete():
+    id = uuid4()
+    unit = UnitOfWork()
+    unit.add(id, INSERT, OLD)
+    unit.add(id, DELETE)
+
+    assert unit.get(id) is None
+    assert len(unit) == 0
+
+
+def test_it_should_not_queue_conflicting_inserts():
+    first, second, third = uuid4(), uuid4(), uuid4()
+    unit = UnitOfWork()
+    unit.add(first, UPDATE, OLD)
+
+    with pytest.raises(AlreadyExists) as exc_info:
+        unit.add_many([(first, NEW), (second, NEW), (third, NEW), (third, NEW)], INSERT)
+
+    assert exc_info.value.args == (first, third)
+    assert unit.pending == {first: (UPDATE, OLD)}
+    unit.clear()
+    assert len(unit) == 0